@@ -0,0 +1,388 @@
+"""
+Offline benchmarks of the recommendation pipeline on synthetic data.
+
+For every scale a synthetic model directory is generated (see
+data/Synthetic.py) and each pipeline stage is timed in a fresh subprocess, so
+that module-level state and peak memory of one scale don't leak into the next.
+Every stage reports latency percentiles (milliseconds) and the peak resident
+memory of the process while it ran. Results are written as JSON; `compare`
+prints the change between two result files.
+
+Usage (from the project root):
+    python -m backend.benchmark run --items 1000 10000 100000 --output bench.json
+    python -m backend.benchmark compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+BENCHMARK_FORMAT_VERSION = 1
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _current_rss():
+    """Resident set size of this process in bytes, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _max_rss():
+    """Peak resident set size of this process so far, in bytes"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakMemory:
+    """Samples the process RSS on a background thread and keeps the peak"""
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.start_rss = None
+        self.peak_rss = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_rss = _current_rss()
+        if self.start_rss is None:
+            # No /proc: fall back to the process-wide peak
+            self.start_rss = _max_rss()
+            self.peak_rss = self.start_rss
+            return self
+        self.peak_rss = self.start_rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, _current_rss())
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc_info):
+        if self._thread is None:
+            self.peak_rss = _max_rss()
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, _current_rss())
+
+
+def measure(fn, args_list):
+    """
+    Time fn over a list of argument tuples.
+
+    Args:
+        fn: Callable to benchmark
+        args_list: One argument tuple per call
+
+    Returns:
+        Dictionary with the call count, latency statistics in milliseconds,
+        the peak RSS while the calls ran and its increase over the start (MB)
+    """
+    latencies = []
+    with PeakMemory() as memory:
+        for args in args_list:
+            start_time = time.perf_counter()
+            fn(*args)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+
+    latencies = np.array(latencies)
+    result = {"count": len(latencies), "mean_ms": float(latencies.mean()), "min_ms": float(latencies.min()),
+              "max_ms": float(latencies.max())}
+    for percentile in PERCENTILES:
+        result[f"p{percentile}_ms"] = float(np.percentile(latencies, percentile))
+    result["peak_rss_mb"] = memory.peak_rss / 1e6
+    result["rss_increase_mb"] = (memory.peak_rss - memory.start_rss) / 1e6
+    return result
+
+
+def run_scale(root, num_items, queries=50, train_pairs=1024, train_runs=1, seed=0, verbose=True):
+    """
+    Generate synthetic data under root and benchmark every pipeline stage on it.
+
+    Must run in a fresh process: the repository module loads its state from
+    the working directory when it is first imported.
+
+    Args:
+        root: Directory for the synthetic data (becomes the working directory)
+        num_items: Number of synthetic articles
+        queries: Number of query items for the per-request stages
+        train_pairs: Positive and negative pairs for the training stage
+        train_runs: Number of timed one-epoch training runs
+        seed: Random seed of the data and the query sample
+        verbose: Whether to print the pipeline's own progress output
+
+    Returns:
+        Dictionary with the dataset description and the per-stage results
+    """
+    import contextlib
+
+    import torch
+    from .data.Synthetic import MODEL_KWARGS, generate_training_pairs, write_synthetic_model_dir
+
+    stages = {}
+
+    def log(name):
+        stage = stages[name]
+        print(f"  {num_items:>7} items  {name:<38} p50 {stage['p50_ms']:>10.2f} ms  "
+              f"p95 {stage['p95_ms']:>10.2f} ms  peak {stage['peak_rss_mb']:>8.1f} MB", file=sys.stderr)
+
+    # The pipeline prints a lot; keep it out of the benchmark output unless asked
+    devnull = open(os.devnull, "w")
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)
+    with devnull, quiet:
+        info = {}
+        stages["generate_synthetic_data"] = measure(
+            lambda: info.update(write_synthetic_model_dir(root, num_items, seed=seed, verbose=verbose)), [()]
+        )
+        log("generate_synthetic_data")
+        os.chdir(root)
+        model_dir = info["model_dir"]
+
+        from .data.Enhancement import load_model_and_data, get_enhanced_recommendations, rank_compatible_items
+        from .data.Recommender import EnhancedFashionGAT, train_gat_model
+        from .data.Sampling import DEFAULT_NUM_NEIGHBORS
+        from .data.Serving import compute_node_embeddings
+
+        loaded = {}
+        stages["load_model_and_data"] = measure(
+            lambda: loaded.update(zip(
+                ("model", "fashion_graph", "pyg_graph", "node_mapping", "fashion_data"),
+                load_model_and_data(EnhancedFashionGAT, model_dir, **MODEL_KWARGS)
+            )), [()]
+        )
+        log("load_model_and_data")
+
+        # Server startup: the repository loads the catalog and the model on import
+        os.environ["MODEL_BUNDLE_PATH"] = ""
+
+        def start_repository():
+            from . import repository
+
+            if repository.model_thread is not None:
+                repository.model_thread.join()
+            loaded["repository"] = repository
+
+        stages["repository_startup"] = measure(start_repository, [()])
+        log("repository_startup")
+        repository = loaded["repository"]
+        repo = repository.Repository()
+
+        rng = random.Random(seed)
+        article_ids = repository.item_rules.article_ids.tolist()
+        query_ids = [rng.choice(article_ids) for _ in range(queries)]
+
+        stages["repository_get_metadata"] = measure(
+            repo.get_metadata, [(rng.choice(article_ids),) for _ in range(max(queries, 1000))]
+        )
+        log("repository_get_metadata")
+
+        model, pyg_graph = loaded["model"], loaded["pyg_graph"]
+        stages["compute_node_embeddings"] = measure(
+            lambda: compute_node_embeddings(model, pyg_graph), [()] * 3
+        )
+        log("compute_node_embeddings")
+
+        scorer = repository.embedding_store.scorer
+        stages["rank_compatible_items"] = measure(
+            lambda article_id: rank_compatible_items(
+                repository.item_index.get(article_id), repository.item_rules, scorer, 50, with_importance=False
+            ), [(article_id,) for article_id in query_ids]
+        )
+        log("rank_compatible_items")
+
+        # Full recommendation call with explanations, with the serving caches
+        stages["get_enhanced_recommendations"] = measure(
+            lambda article_id: get_enhanced_recommendations(
+                model, pyg_graph, loaded["fashion_graph"], article_id, loaded["node_mapping"], repository.catalog,
+                top_k=5, verbose=False, item_embeddings=repository.embedding_store.item_embeddings,
+                item_rules=repository.item_rules, scorer=scorer, attribute_table=repository.item_attributes
+            ), [(article_id,) for article_id in query_ids]
+        )
+        log("get_enhanced_recommendations")
+
+        # ... and without them (forward pass, rule arrays and graph walks per call)
+        stages["get_enhanced_recommendations_uncached"] = measure(
+            lambda article_id: get_enhanced_recommendations(
+                model, pyg_graph, loaded["fashion_graph"], article_id, loaded["node_mapping"], repository.catalog,
+                top_k=5, verbose=False
+            ), [(article_id,) for article_id in query_ids[:5]]
+        )
+        log("get_enhanced_recommendations_uncached")
+
+        # API path: ranking plus the first page of RecItems
+        stages["repository_recommendations"] = measure(
+            lambda article_id: repo._materialize_recommendations(
+                article_id, repo._build_recommendations(article_id, 50), 0, 10
+            ), [(article_id,) for article_id in query_ids]
+        )
+        log("repository_recommendations")
+
+        positive_pairs, negative_pairs = generate_training_pairs(loaded["fashion_data"], train_pairs, seed=seed)
+
+        def train_epoch():
+            torch.manual_seed(seed)
+            train_gat_model(EnhancedFashionGAT(pyg_graph, **MODEL_KWARGS), pyg_graph, positive_pairs,
+                            negative_pairs, epochs=1, verbose=False)
+
+        stages["train_gat_model_epoch"] = measure(train_epoch, [()] * train_runs)
+        log("train_gat_model_epoch")
+
+        # Same epoch with neighbor-sampled mini-batches instead of full-graph passes
+        def train_epoch_sampled():
+            torch.manual_seed(seed)
+            train_gat_model(EnhancedFashionGAT(pyg_graph, **MODEL_KWARGS), pyg_graph, positive_pairs,
+                            negative_pairs, epochs=1, verbose=False, num_neighbors=DEFAULT_NUM_NEIGHBORS, seed=seed)
+
+        stages["train_gat_model_epoch_sampled"] = measure(train_epoch_sampled, [()] * train_runs)
+        log("train_gat_model_epoch_sampled")
+
+    return {
+        "num_items": num_items,
+        "dataset": {key: value for key, value in info.items() if key not in ("root", "model_dir", "catalog_path")},
+        "train_pairs": 2 * train_pairs,
+        "stages": stages,
+    }
+
+
+def environment():
+    """Interpreter, library and machine details recorded with the results"""
+    import torch
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "numpy": np.__version__,
+    }
+
+
+def run_command(args):
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {
+        "benchmark_format_version": BENCHMARK_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "label": args.label,
+        "environment": environment(),
+        "config": {"queries": args.queries, "train_pairs": args.train_pairs, "train_runs": args.train_runs,
+                   "seed": args.seed},
+        "scales": [],
+    }
+
+    for num_items in args.items:
+        root = tempfile.mkdtemp(prefix=f"fashion-bench-{num_items}-", dir=args.data_dir)
+        output = os.path.join(root, "result.json")
+        print(f"Benchmarking {num_items} items in {root}", file=sys.stderr)
+        command = [
+            sys.executable, "-m", "backend.benchmark", "scale", root, str(num_items), output,
+            "--queries", str(args.queries), "--train-pairs", str(args.train_pairs),
+            "--train-runs", str(args.train_runs), "--seed", str(args.seed),
+        ]
+        if args.verbose:
+            command.append("--verbose")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [project_root, os.environ.get("PYTHONPATH")])))
+        completed = subprocess.run(command, env=env)
+        try:
+            if completed.returncode != 0:
+                sys.exit(f"❌ Benchmark of {num_items} items failed (exit code {completed.returncode})")
+            with open(output) as f:
+                results["scales"].append(json.load(f))
+        finally:
+            if not args.keep_data:
+                shutil.rmtree(root, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📊 Results written to {args.output}", file=sys.stderr)
+
+
+def scale_command(args):
+    result = run_scale(args.root, args.num_items, queries=args.queries, train_pairs=args.train_pairs,
+                       train_runs=args.train_runs, seed=args.seed, verbose=args.verbose)
+    with open(args.output, "w") as f:
+        json.dump(result, f)
+
+
+def compare_command(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    before_scales = {scale["num_items"]: scale for scale in before["scales"]}
+    for scale in after["scales"]:
+        old = before_scales.get(scale["num_items"])
+        if old is None:
+            continue
+        print(f"{scale['num_items']} items")
+        for name, stage in scale["stages"].items():
+            old_stage = old["stages"].get(name)
+            if old_stage is None:
+                continue
+            changes = "  ".join(
+                f"{metric} {old_stage[metric]:.2f} -> {stage[metric]:.2f} ({stage[metric] / old_stage[metric]:.2f}x)"
+                if old_stage[metric] else f"{metric} {old_stage[metric]:.2f} -> {stage[metric]:.2f}"
+                for metric in ("p50_ms", "p95_ms", "peak_rss_mb")
+            )
+            print(f"  {name:<38} {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline on synthetic data")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Benchmark one or more catalog sizes")
+    run_parser.add_argument("--items", type=int, nargs="+", default=[1000, 10000], help="Catalog sizes")
+    run_parser.add_argument("--output", default="benchmark.json", help="Results file")
+    run_parser.add_argument("--label", default=None, help="Free-form label stored with the results")
+    run_parser.add_argument("--queries", type=int, default=50, help="Query items per request-level stage")
+    run_parser.add_argument("--train-pairs", type=int, default=1024, help="Positive and negative training pairs")
+    run_parser.add_argument("--train-runs", type=int, default=1, help="Timed one-epoch training runs")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--data-dir", default=None, help="Parent directory for the synthetic data")
+    run_parser.add_argument("--keep-data", action="store_true", help="Keep the synthetic data after the run")
+    run_parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    run_parser.set_defaults(func=run_command)
+
+    # Internal: one scale in a fresh process (used by run)
+    scale_parser = commands.add_parser("scale")
+    scale_parser.add_argument("root")
+    scale_parser.add_argument("num_items", type=int)
+    scale_parser.add_argument("output")
+    scale_parser.add_argument("--queries", type=int, default=50)
+    scale_parser.add_argument("--train-pairs", type=int, default=1024)
+    scale_parser.add_argument("--train-runs", type=int, default=1)
+    scale_parser.add_argument("--seed", type=int, default=0)
+    scale_parser.add_argument("--verbose", action="store_true")
+    scale_parser.set_defaults(func=scale_command)
+
+    compare_parser = commands.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.set_defaults(func=compare_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
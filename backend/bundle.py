@@ -0,0 +1,94 @@
+"""
+Compile, verify and inspect model bundles (see data/Bundle.py).
+
+Usage (from the project root):
+    python -m backend.bundle compile [--output PATH] [--no-ann-index]
+    python -m backend.bundle verify PATH
+    python -m backend.bundle info PATH
+    python -m backend.bundle recall PATH [--top-k K] [--candidates N] [--sample N]
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def compile_command(args):
+    # Compiling needs the model itself, so don't let the repository attach an existing bundle
+    os.environ["MODEL_BUNDLE_PATH"] = ""
+    from . import repository
+
+    if repository.model_thread is not None:
+        repository.model_thread.join()
+    if not repository.model_loaded:
+        sys.exit("❌ Model could not be loaded, nothing to compile")
+    path = repository.Repository().compile_model_bundle(args.output, with_ann_index=args.ann_index)
+    print(f"📦 Compiled {path}")
+
+
+def verify_command(args):
+    from .data.Bundle import BundleFile
+
+    try:
+        bundle = BundleFile(args.path, verify=True)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    print(f"✅ {args.path}: {len(bundle.names)} arrays, all checksums match")
+
+
+def info_command(args):
+    from .data.Bundle import BundleFile
+
+    bundle = BundleFile(args.path)
+    meta = {key: value for key, value in bundle.meta.items() if key not in ("attribute_vocab", "state_keys")}
+    print(json.dumps(meta, indent=2))
+    total = sum(entry["nbytes"] for entry in bundle.entries.values())
+    print(f"{len(bundle.names)} arrays, {total / 1e6:.1f} MB")
+
+
+def recall_command(args):
+    from .data.Bundle import load_bundle
+    from .data.Retrieval import build_ivf_index, recall_at_k
+
+    bundle = load_bundle(args.path)
+    index = bundle.ann_index
+    if index is None:
+        print("Bundle has no ANN index, building one for the check")
+        index = build_ivf_index(bundle.scorer)
+    report = recall_at_k(index, bundle.item_rules, bundle.scorer, top_k=args.top_k,
+                         num_candidates=args.candidates, sample_size=args.sample)
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model bundle tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser("compile", help="Compile the saved model directory into a bundle")
+    compile_parser.add_argument("--output", default=None, help="Bundle path (default: <model dir>/model.bundle)")
+    compile_parser.add_argument("--no-ann-index", dest="ann_index", action="store_false",
+                                help="Don't build an ANN index for candidate retrieval into the bundle")
+    compile_parser.set_defaults(func=compile_command)
+
+    verify_parser = commands.add_parser("verify", help="Check a bundle's checksums")
+    verify_parser.add_argument("path")
+    verify_parser.set_defaults(func=verify_command)
+
+    info_parser = commands.add_parser("info", help="Print a bundle's metadata")
+    info_parser.add_argument("path")
+    info_parser.set_defaults(func=info_command)
+
+    recall_parser = commands.add_parser("recall", help="Check ANN retrieval recall@k against exhaustive scoring")
+    recall_parser.add_argument("path")
+    recall_parser.add_argument("--top-k", type=int, default=50, help="Recommendations compared per query")
+    recall_parser.add_argument("--candidates", type=int, default=int(os.environ.get("REC_ANN_CANDIDATES", "2000")),
+                               help="Candidates retrieved per query")
+    recall_parser.add_argument("--sample", type=int, default=200, help="Number of sampled query items")
+    recall_parser.set_defaults(func=recall_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
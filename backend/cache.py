@@ -0,0 +1,176 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import threading
+import time
+
+class RecommendationCache:
+    """
+    Size-bounded LRU cache with optional TTL for computed recommendation results.
+
+    Concurrent requests for the same key are deduplicated (single-flight): the
+    first caller computes the value while the others wait for its result.
+    Failed computations are not cached.
+    """
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def _lookup(self, key: Hashable) -> tuple:
+        """(found, value) for a live entry; expired entries are dropped. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+            self.expirations += 1
+        return False, None
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        """Insert a computed value and evict the oldest entries. Caller holds the lock."""
+        expires_at = time.monotonic() + self._ttl_seconds if self._ttl_seconds else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, computing it at most once if missing.
+
+        Args:
+            key: Cache key, e.g. (article_id, top_k, bundle_version)
+            compute: Zero-argument function producing the value
+
+        Returns:
+            The cached or freshly computed value
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self._inflight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def get_or_compute_many(self, keys: List[Hashable],
+                            compute_many: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """
+        Return values for several keys, computing all missing ones in a single call.
+
+        Keys already being computed by another caller are waited for instead
+        of recomputed, as in get_or_compute.
+
+        Args:
+            keys: Cache keys
+            compute_many: Function taking the list of missing keys and returning
+                {key: value}; a value may be an Exception for a key that failed,
+                which is returned but not cached
+
+        Returns:
+            Dictionary of {key: value or Exception} for every key
+        """
+        results = {}
+        owned = []
+        waiting = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                found, value = self._lookup(key)
+                if found:
+                    results[key] = value
+                elif key in self._inflight:
+                    self.coalesced += 1
+                    waiting[key] = self._inflight[key]
+                else:
+                    self.misses += 1
+                    self._inflight[key] = Future()
+                    owned.append(key)
+
+        if owned:
+            try:
+                values = compute_many(owned)
+            except BaseException as e:
+                with self._lock:
+                    futures = [self._inflight.pop(key) for key in owned]
+                for future in futures:
+                    future.set_exception(e)
+                raise
+
+            with self._lock:
+                futures = [self._inflight.pop(key) for key in owned]
+                for key in owned:
+                    value = values.get(key, KeyError(key))
+                    if not isinstance(value, Exception):
+                        self._store(key, value)
+            for key, future in zip(owned, futures):
+                value = values.get(key, KeyError(key))
+                if isinstance(value, Exception):
+                    future.set_exception(value)
+                else:
+                    future.set_result(value)
+                results[key] = value
+
+        for key, future in waiting.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = e
+        return results
+
+    def clear(self) -> None:
+        """Drop all cached entries (in-flight computations are unaffected)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self._max_entries,
+                "ttl_seconds": self._ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+            }
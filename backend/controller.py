@@ -1,11 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from .service import Service
-from .models import Item, Session, RecItem
+from .models import Item, Session, RecItem, RecommendationStatus, BatchRecommendationRequest, BatchRecommendationResponse, MAX_TOP_K
 from .dependencies import get_service
-from typing import List, Dict, Any
+from .metrics import REGISTRY, CONTENT_TYPE
+from .profiling import PROFILER, PROFILING_ENABLED
+from typing import List, Dict, Any, Optional
+import asyncio
+import json
+import time
 
 router = APIRouter()
 
+# Media types of the streaming recommendations endpoint
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+# Longest a streaming request waits for the ranking job, in seconds
+MAX_STREAM_WAIT = 120.0
+
 @router.get("/")
 async def root():
     return {"message": "Hello World"}
@@ -15,6 +28,40 @@ async def health_check():
     """Simple health check that doesn't depend on repository"""
     return {"status": "ok", "message": "Server is responsive"}
 
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request latencies per route, pipeline stage timings and load durations"""
+    if not REGISTRY.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@router.post("/debug/profile")
+async def start_profile(requests: int = Query(10, ge=1, le=1000), torch: bool = False):
+    """Profile the next `requests` query items (debug only, needs PROFILING_ENABLED=1)"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    try:
+        return PROFILER.start(requests, use_torch=torch)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/debug/profile")
+async def get_profile_status():
+    """State of the running capture and the files written by finished ones"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return PROFILER.status()
+
+@router.delete("/debug/profile")
+async def stop_profile():
+    """Stop the running capture early and write what it collected"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    result = PROFILER.stop()
+    if result is None:
+        raise HTTPException(status_code=404, detail="No capture is running")
+    return result
+
 @router.get("/api/test")
 async def test_endpoint():
     return {"status": "success", "message": "Backend is connected!"}
@@ -57,14 +104,19 @@ async def get_item_metadata(article_id: str, service: Service = Depends(get_serv
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Plain def: the metadata lookup and the session store write run in the threadpool, not on the event loop
 @router.post("/session/{session_id}/query-item/{article_id}")
-async def set_query_item(session_id: str, article_id: str, service: Service = Depends(get_service)):
-    """Set the query item for a session"""
+def set_query_item(session_id: str, article_id: str, top_k: Optional[int] = None,
+                   service: Service = Depends(get_service)):
+    """Set the query item for a session; the top_k ranking is computed in the background"""
+    if top_k is not None and not 1 <= top_k <= MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {MAX_TOP_K}")
     try:
-        success = service.set_query_item(session_id, int(article_id))
+        success = service.set_query_item(session_id, int(article_id), top_k)
         if not success:
             raise HTTPException(status_code=404, detail="Session not found or item not found")
-        return {"message": "Query item set successfully"}
+        status = service.get_recommendation_status(session_id)
+        return {"message": "Query item set successfully", "status": status.status if status else None}
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid article ID format")
     except Exception as e:
@@ -78,15 +130,117 @@ async def get_query_item(session_id: str, service: Service = Depends(get_service
         raise HTTPException(status_code=404, detail="Query item not found for this session")
     return query_item
 
+# Plain def: building a page (importance lookup and RecItems) runs in the threadpool, not on the event loop
 @router.get("/session/{session_id}/recommendations", response_model=List[RecItem])
-async def get_recommendations(session_id: str, service: Service = Depends(get_service)):
-    """Get recommendations for a session"""
+def get_recommendations(session_id: str, response: Response, top_k: Optional[int] = None, offset: int = 0,
+                        limit: Optional[int] = None, service: Service = Depends(get_service)):
+    """
+    Get a page of recommendations for a session: items offset to offset + limit of the top_k.
+    X-Recommendation-Status reports the job state and X-Total-Count the number of items in the top_k.
+    """
+    if (top_k is not None and top_k < 0) or offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="top_k, offset and limit must not be negative")
     try:
-        recommendations = service.get_recommendations(session_id)
+        status = service.get_recommendation_status(session_id)
+        if status is not None:
+            response.headers["X-Recommendation-Status"] = status.status
+            if status.total is not None:
+                response.headers["X-Total-Count"] = str(status.total if top_k is None else min(top_k, status.total))
+        recommendations = service.get_recommendations(session_id, top_k, offset, limit)
         return recommendations
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def wait_for_recommendations(service: Service, session_id: str, timeout: float) -> Optional[RecommendationStatus]:
+    """Poll the recommendation job of a session until it leaves "pending" or timeout seconds pass"""
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    status = service.get_recommendation_status(session_id)
+    while status is not None and status.status == "pending" and time.monotonic() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.2)
+        status = service.get_recommendation_status(session_id)
+    return status
+
+@router.get("/session/{session_id}/recommendations/stream")
+async def stream_recommendations(session_id: str, request: Request, top_k: Optional[int] = None, offset: int = 0,
+                                 limit: Optional[int] = None, chunk_size: int = 10, wait: float = 30.0,
+                                 stream_format: Optional[str] = Query(None, alias="format"),
+                                 service: Service = Depends(get_service)):
+    """
+    Stream a page of recommendations as they are built, one RecItem per line
+    (format=ndjson) or per "recommendation" event (format=sse, ended by a
+    "done" event). The format defaults to sse for clients that accept
+    text/event-stream. Waits up to wait seconds for a pending ranking job.
+    """
+    if stream_format is None:
+        stream_format = "sse" if "text/event-stream" in request.headers.get("accept", "") else "ndjson"
+    if stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be ndjson or sse")
+    if (top_k is not None and top_k < 0) or offset < 0 or (limit is not None and limit < 0) or chunk_size < 1:
+        raise HTTPException(status_code=400, detail="top_k, offset and limit must not be negative, chunk_size must be positive")
+    
+    status = await wait_for_recommendations(service, session_id, min(max(wait, 0.0), MAX_STREAM_WAIT))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if status.status != "ready":
+        raise HTTPException(status_code=409, detail=status.error or f"Recommendations not ready (status: {status.status})")
+    
+    def encode(event: str, payload: str) -> str:
+        if stream_format == "sse":
+            return f"event: {event}\ndata: {payload}\n\n"
+        return payload + "\n"
+    
+    def lines():
+        count = 0
+        try:
+            # One write per chunk: each item of the generator is a threadpool round trip
+            for chunk in service.iter_recommendations(session_id, top_k, offset, limit, chunk_size):
+                yield "".join(encode("recommendation", rec_item.model_dump_json()) for rec_item in chunk)
+                count += len(chunk)
+        except Exception as e:
+            yield encode("error", json.dumps({"error": str(e)}))
+            return
+        if stream_format == "sse":
+            yield encode("done", json.dumps({"count": count}))
+    
+    total = status.total if top_k is None else min(top_k, status.total)
+    # Sync generators are run in the threadpool by StreamingResponse
+    return StreamingResponse(lines(), media_type=STREAM_MEDIA_TYPES[stream_format], headers={
+        "Cache-Control": "no-cache",
+        "X-Recommendation-Status": status.status,
+        "X-Total-Count": str(total),
+    })
+
+@router.get("/session/{session_id}/recommendations/status", response_model=RecommendationStatus)
+async def get_recommendation_status(session_id: str, service: Service = Depends(get_service)):
+    """Get the state of the recommendation job for a session: none, pending, ready or failed"""
+    status = service.get_recommendation_status(session_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return status
+
+@router.post("/recommendations/batch", response_model=BatchRecommendationResponse)
+async def get_batch_recommendations(request: BatchRecommendationRequest, service: Service = Depends(get_service)):
+    """Get recommendations for many query articles in one request (no session needed), keyed by article id"""
+    try:
+        # Scoring a batch is CPU-bound, keep it off the event loop
+        return await run_in_threadpool(service.get_batch_recommendations, request.article_ids, request.top_k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/cache/recommendations")
+async def get_recommendation_cache_stats(service: Service = Depends(get_service)):
+    """Hit/miss/eviction counters of the shared recommendation cache"""
+    return service.get_cache_stats()
+
+@router.get("/sessions/stats")
+async def get_session_stats(service: Service = Depends(get_service)):
+    """Live session count, approximate bytes held and eviction counters"""
+    return service.get_session_stats()
+
 @router.put("/session/{session_id}", response_model=Session)
 async def update_session(session_id: str, update_data: Dict[str, Any], service: Service = Depends(get_service)):
     """Update a session with new data"""
@@ -0,0 +1,293 @@
+"""
+Compiled model bundle: everything needed to serve recommendations in one file.
+
+A bundle holds the model state dict, the PyG graph tensors, the node mappings
+(as arrays), the item embeddings and factorized scorer projections, the
+pairing-rule arrays, the item attribute table, the catalog columns and,
+optionally, an ANN index for candidate retrieval (see data/Retrieval.py). Arrays
+are stored raw and 64-byte aligned after a JSON header, so opening a bundle
+only parses the header and maps the file; arrays are views of the mapping and
+are built on first use. Processes that open the same bundle share its pages
+through the OS page cache.
+
+The file uses the columnar container of data/Columnar.py.
+"""
+import time
+from collections import OrderedDict
+from functools import cached_property
+
+import torch
+
+from ..log import get_logger
+from .Catalog import ItemCatalog, encode_column, open_column
+from .Columnar import ArticleIndex, ColumnarFile, StringColumn, write_columnar_file
+from .Recommender import FactorizedScorer
+from .Retrieval import IVFIndex
+from .Serving import ItemRuleArrays, ItemAttributeTable
+
+log = get_logger(__name__)
+
+BUNDLE_MAGIC = b"FPBNDL01"
+BUNDLE_FORMAT_VERSION = 2
+DEFAULT_BUNDLE_NAME = "model.bundle"
+
+
+def write_bundle(path, arrays, meta):
+    """
+    Write named arrays and metadata to a bundle file (see write_columnar_file).
+
+    Args:
+        path: Bundle file to write
+        arrays: Dictionary of {name: numpy array} (no object dtypes)
+        meta: JSON-serializable metadata
+
+    Returns:
+        path
+    """
+    return write_columnar_file(path, arrays, meta, BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION)
+
+
+class BundleFile(ColumnarFile):
+    """Read-only, memory-mapped view of a bundle file"""
+    def __init__(self, path, verify=False):
+        super().__init__(path, BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, verify=verify)
+
+
+class ModelBundle:
+    """
+    Serving state loaded lazily from a bundle file.
+
+    Every attribute is built from the mapped arrays the first time it is
+    used; the model itself is only reconstructed by load_model().
+    """
+    def __init__(self, path, verify=False):
+        self.file = BundleFile(path, verify=verify)
+        self.meta = self.file.meta
+
+    @property
+    def path(self):
+        return self.file.path
+
+    @property
+    def version(self):
+        """Version token of the model directory the bundle was compiled from"""
+        return self.meta["bundle_version"]
+
+    @property
+    def catalog_source(self):
+        """Size and mtime of the catalog CSV the bundle was compiled from"""
+        return self.meta.get("catalog_source")
+
+    @cached_property
+    def item_embeddings(self):
+        return torch.from_numpy(self.file.array("item_embeddings"))
+
+    @cached_property
+    def scorer(self):
+        return FactorizedScorer.from_tensors(self.meta["attr_types"], {
+            name: torch.from_numpy(self.file.array(f"scorer.{name}")) for name in FactorizedScorer.TENSOR_NAMES
+        })
+
+    @cached_property
+    def item_index(self):
+        """ArticleIndex of article_id -> item node index"""
+        return ArticleIndex(self.file.array("items.sorted_ids"), self.file.array("items.positions"))
+
+    @cached_property
+    def item_rules(self):
+        return ItemRuleArrays(
+            article_ids=self.file.array("items.article_ids"),
+            gender_groups=self.file.array("rules.gender_groups"),
+            product_group_codes=self.file.array("rules.product_group_codes"),
+            product_groups=self.meta["product_groups"]
+        )
+
+    @cached_property
+    def item_attributes(self):
+        return ItemAttributeTable(
+            self.file.array("items.article_ids"),
+            {attr: self.file.array(f"attributes.codes.{attr}") for attr in ItemAttributeTable.CATEGORICAL},
+            self.meta["attribute_vocab"],
+            self.file.array("attributes.fabric_offsets"),
+            self.file.array("attributes.fabric_codes"),
+            self.meta["fabric_vocab"],
+            index=self.item_index
+        )
+
+    @cached_property
+    def catalog(self):
+        """ItemCatalog compiled into the bundle"""
+        columns = {
+            column: open_column(self.file, f"catalog.{idx}", self.meta["catalog_encodings"][column])
+            for idx, column in enumerate(self.meta["catalog_columns"])
+        }
+        return ItemCatalog(
+            ArticleIndex(self.file.array("catalog.sorted_ids"), self.file.array("catalog.positions")),
+            columns,
+            self.meta["catalog_rows"]
+        )
+
+    @cached_property
+    def ann_index(self):
+        """IVFIndex compiled into the bundle, or None"""
+        if self.meta.get("ann_index") is None:
+            return None
+        return IVFIndex.from_arrays({name: self.file.array(f"ann.{name}") for name in IVFIndex.ARRAY_NAMES})
+
+    @property
+    def ann_report(self):
+        """Index parameters and the recall check measured at compile time, or None"""
+        return self.meta.get("ann_index")
+
+    def node_mapping(self):
+        """Rebuild the {node_type: {node_name: index}} mapping"""
+        mapping = {}
+        for node_type in self.meta["node_types"]:
+            names = StringColumn(
+                self.file.array(f"nodes.{node_type}.offsets"), self.file.array(f"nodes.{node_type}.data")
+            )
+            mapping[node_type] = {name: idx for idx, name in enumerate(names)}
+        return mapping
+
+    def pyg_graph(self):
+        """Rebuild the PyG HeteroData graph the model was trained on"""
+        from torch_geometric.data import HeteroData
+
+        graph = HeteroData()
+        for node_type in self.meta["graph_node_types"]:
+            graph[node_type].x = torch.from_numpy(self.file.array(f"graph.x.{node_type}"))
+        for idx, edge_type in enumerate(self.meta["graph_edge_types"]):
+            graph[tuple(edge_type)].edge_index = torch.from_numpy(self.file.array(f"graph.edge_index.{idx}"))
+        return graph
+
+    def state_dict(self):
+        return OrderedDict(
+            (key, torch.from_numpy(self.file.array(f"state.{key}"))) for key in self.meta["state_keys"]
+        )
+
+    def load_model(self, model_class, **model_kwargs):
+        """
+        Reconstruct the trained model.
+
+        Args:
+            model_class: Model class, e.g. EnhancedFashionGAT
+            **model_kwargs: Overrides for the constructor arguments stored at compile time
+
+        Returns:
+            Model in eval mode
+        """
+        model = model_class(self.pyg_graph(), **dict(self.meta.get("model_kwargs", {}), **model_kwargs))
+        model.load_state_dict(self.state_dict())
+        model.eval()
+        return model
+
+
+def compile_bundle(output_path, version, model, pyg_graph, node_mapping, item_embeddings, scorer,
+                   item_rules, item_attributes, catalog, model_kwargs=None, catalog_source=None,
+                   ann_index=None, ann_report=None):
+    """
+    Write the serving state of a loaded model to a bundle file.
+
+    Args:
+        output_path: Bundle file to write
+        version: Bundle version token (see model_bundle_version)
+        model: Trained EnhancedFashionGAT model
+        pyg_graph: PyG graph the model was trained on
+        node_mapping: Mapping between node names and indices
+        item_embeddings: Item embedding tensor
+        scorer: FactorizedScorer for item_embeddings
+        item_rules: ItemRuleArrays
+        item_attributes: ItemAttributeTable
+        catalog: ItemCatalog
+        model_kwargs: Constructor arguments of the model
+        catalog_source: Metadata identifying the catalog file (e.g. size and mtime)
+        ann_index: Optional IVFIndex over the scorer's candidate projections
+        ann_report: Metadata stored with ann_index (e.g. its recall check)
+
+    Returns:
+        output_path
+    """
+    start_time = time.time()
+    arrays = {}
+
+    # Model weights and the graph they were trained on
+    state_dict = model.state_dict()
+    for key, tensor in state_dict.items():
+        arrays[f"state.{key}"] = tensor.detach().cpu().numpy()
+    for node_type in pyg_graph.node_types:
+        arrays[f"graph.x.{node_type}"] = pyg_graph[node_type].x.cpu().numpy()
+    for idx, edge_type in enumerate(pyg_graph.edge_types):
+        arrays[f"graph.edge_index.{idx}"] = pyg_graph[edge_type].edge_index.cpu().numpy()
+
+    # Node names ordered by index
+    for node_type, mapping in node_mapping.items():
+        names = [None] * len(mapping)
+        for name, idx in mapping.items():
+            names[idx] = name
+        column = StringColumn.from_values(names)
+        arrays[f"nodes.{node_type}.offsets"] = column.offsets
+        arrays[f"nodes.{node_type}.data"] = column.data
+
+    # Serving arrays
+    arrays["item_embeddings"] = item_embeddings.numpy()
+    for name, tensor in scorer.tensors().items():
+        arrays[f"scorer.{name}"] = tensor.numpy()
+    item_index = ArticleIndex.from_ids(item_rules.article_ids)
+    arrays.update({
+        "items.article_ids": item_rules.article_ids,
+        "items.sorted_ids": item_index.sorted_ids,
+        "items.positions": item_index.positions,
+        "rules.gender_groups": item_rules.gender_groups,
+        "rules.product_group_codes": item_rules.product_group_codes,
+        "attributes.fabric_offsets": item_attributes.fabric_offsets,
+        "attributes.fabric_codes": item_attributes.fabric_codes,
+    })
+    for attr, codes in item_attributes.codes.items():
+        arrays[f"attributes.codes.{attr}"] = codes
+
+    # Catalog
+    arrays["catalog.sorted_ids"] = catalog.article_index.sorted_ids
+    arrays["catalog.positions"] = catalog.article_index.positions
+    catalog_encodings = {}
+    for idx, (column, values) in enumerate(catalog.columns.items()):
+        catalog_encodings[column] = encode_column(f"catalog.{idx}", values, arrays)
+
+    # Candidate retrieval index
+    if ann_index is not None:
+        for name, values in ann_index.arrays().items():
+            arrays[f"ann.{name}"] = values
+
+    write_bundle(output_path, arrays, {
+        "bundle_version": version,
+        "model_kwargs": model_kwargs or {},
+        "state_keys": list(state_dict),
+        "graph_node_types": list(pyg_graph.node_types),
+        "graph_edge_types": [list(edge_type) for edge_type in pyg_graph.edge_types],
+        "node_types": list(node_mapping),
+        "attr_types": scorer.attr_types,
+        "product_groups": item_rules.product_groups,
+        "attribute_vocab": item_attributes.vocab,
+        "fabric_vocab": item_attributes.fabric_vocab,
+        "catalog_columns": list(catalog.columns),
+        "catalog_encodings": catalog_encodings,
+        "catalog_rows": catalog.num_rows,
+        "catalog_source": catalog_source,
+        "ann_index": dict(ann_report or {}, num_lists=ann_index.num_lists) if ann_index is not None else None,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    log.info("📦 Model bundle written to %s in %.2f seconds", output_path, time.time() - start_time)
+    return output_path
+
+
+def load_bundle(path, verify=False):
+    """
+    Open a compiled model bundle.
+
+    Args:
+        path: Bundle file
+        verify: Check every array against its checksum while opening
+
+    Returns:
+        ModelBundle
+    """
+    return ModelBundle(path, verify=verify)
@@ -0,0 +1,429 @@
+"""
+Item catalog shared by the API and the recommender, and its columnar cache.
+
+Parsing item_metadata.csv with pandas on every start is slow and keeps every
+text cell as a Python object. The first load instead writes a columnar file
+next to the CSV (see data/Columnar.py) holding only the requested columns:
+low-cardinality columns are dictionary encoded (integer codes plus the
+distinct values), the others are stored as UTF-8 blobs. Later loads map that
+file, which takes milliseconds and keeps the catalog out of the Python heap.
+
+The cache is reused while the CSV's size and mtime are unchanged; if only the
+mtime changed, the CSV's content hash decides.
+
+ItemCatalog wraps the loaded columns with lookups by article_id and by item
+node index, so the metadata endpoints, the pairing rules and the explanations
+all read the same single copy of the catalog.
+"""
+import hashlib
+import os
+import time
+import weakref
+
+import numpy as np
+
+from ..log import get_logger
+from .Columnar import ArticleIndex, ColumnarFile, StringColumn, write_columnar_file
+
+log = get_logger(__name__)
+
+CATALOG_CACHE_MAGIC = b"FPCATL01"
+CATALOG_CACHE_FORMAT_VERSION = 1
+CATALOG_CACHE_SUFFIX = ".columns"
+CATALOG_FILE_NAME = "item_metadata.csv"
+
+# Columns with at most this many distinct values per row are dictionary encoded
+DICTIONARY_MAX_RATIO = 0.5
+
+
+class DictionaryColumn:
+    """Dictionary-encoded string column: integer codes into a list of distinct values"""
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, idx):
+        return self.values[self.codes[idx]]
+
+    def __iter__(self):
+        for code in self.codes.tolist():
+            yield self.values[code]
+
+    def take(self, rows):
+        """Values at rows, as a list"""
+        values = self.values
+        return [values[code] for code in self.codes[rows].tolist()]
+
+
+def default_catalog_path(model_dir):
+    """The item_metadata.csv next to a model directory, else the directory's full_data.csv"""
+    path = os.path.join(os.path.dirname(os.path.normpath(model_dir)), CATALOG_FILE_NAME)
+    if os.path.exists(path):
+        return path
+    return os.path.join(model_dir, "full_data.csv")
+
+
+def file_signature(path):
+    """Size and modification time of a file"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_column(name, values, arrays):
+    """
+    Add the arrays of a string column to arrays, under keys starting with name.
+
+    Args:
+        name: Key prefix of the column's arrays
+        values: Sequence of strings
+        arrays: Dictionary of arrays to add to
+
+    Returns:
+        The encoding used ("dictionary" or "string"), needed by open_column
+    """
+    import pandas as pd
+
+    values = pd.Series(list(values), dtype=object)
+    codes, uniques = pd.factorize(values)
+    if len(uniques) <= DICTIONARY_MAX_RATIO * len(values):
+        dtype = np.int16 if len(uniques) <= np.iinfo(np.int16).max else np.int32
+        vocab = StringColumn.from_values(list(uniques))
+        arrays[f"{name}.codes"] = codes.astype(dtype)
+        arrays[f"{name}.vocab.offsets"] = vocab.offsets
+        arrays[f"{name}.vocab.data"] = vocab.data
+        return "dictionary"
+    column = StringColumn.from_values(values.tolist())
+    arrays[f"{name}.offsets"] = column.offsets
+    arrays[f"{name}.data"] = column.data
+    return "string"
+
+
+def open_column(columnar_file, name, encoding):
+    """Column written by encode_column, as a view of a ColumnarFile"""
+    if encoding == "dictionary":
+        vocab = StringColumn(columnar_file.array(f"{name}.vocab.offsets"), columnar_file.array(f"{name}.vocab.data"))
+        return DictionaryColumn(columnar_file.array(f"{name}.codes"), list(vocab))
+    return StringColumn(columnar_file.array(f"{name}.offsets"), columnar_file.array(f"{name}.data"))
+
+
+def build_catalog_cache(csv_path, cache_path, columns, source=None):
+    """
+    Parse the catalog CSV once and write its columnar cache.
+
+    Missing values become empty strings.
+
+    Args:
+        csv_path: Catalog CSV with an article_id column
+        cache_path: Columnar file to write
+        columns: Names of the string columns to keep (missing ones are skipped)
+        source: Signature and hash of the CSV (computed if not given)
+
+    Returns:
+        cache_path
+    """
+    import pandas as pd
+
+    start_time = time.time()
+    available = set(pd.read_csv(csv_path, nrows=0).columns)
+    present = [column for column in columns if column in available]
+    df = pd.read_csv(
+        csv_path,
+        usecols=["article_id"] + present,
+        dtype={column: str for column in present}
+    )
+
+    arrays = {}
+    article_index = ArticleIndex.from_ids(df["article_id"].to_numpy(dtype=np.int64))
+    arrays["article_index.sorted_ids"] = article_index.sorted_ids
+    arrays["article_index.positions"] = article_index.positions
+
+    encodings = {}
+    for idx, column in enumerate(present):
+        encodings[column] = encode_column(f"column{idx}", df[column].fillna(""), arrays)
+
+    if source is None:
+        source = dict(file_signature(csv_path), sha1=file_hash(csv_path))
+    write_columnar_file(cache_path, arrays, {
+        "source": source,
+        "num_rows": len(df),
+        "requested_columns": list(columns),
+        "columns": present,
+        "encodings": encodings,
+    }, CATALOG_CACHE_MAGIC, CATALOG_CACHE_FORMAT_VERSION)
+    log.info("🗂️  Catalog cache written to %s in %.2f seconds", cache_path, time.time() - start_time)
+    return cache_path
+
+
+def open_catalog_cache(cache_path):
+    """
+    Map a catalog cache written by build_catalog_cache.
+
+    Returns:
+        Tuple of (ArticleIndex of article_id -> row, {column: column}, metadata)
+    """
+    cache = ColumnarFile(cache_path, CATALOG_CACHE_MAGIC, CATALOG_CACHE_FORMAT_VERSION)
+    columns = {
+        column: open_column(cache, f"column{idx}", cache.meta["encodings"][column])
+        for idx, column in enumerate(cache.meta["columns"])
+    }
+    article_index = ArticleIndex(cache.array("article_index.sorted_ids"), cache.array("article_index.positions"))
+    return article_index, columns, cache.meta
+
+
+def _cache_is_current(cache_path, csv_path, columns):
+    """Whether the cache was built from the CSV as it is now, with (at least) the given columns"""
+    try:
+        cache = ColumnarFile(cache_path, CATALOG_CACHE_MAGIC, CATALOG_CACHE_FORMAT_VERSION)
+    except (OSError, ValueError):
+        return False
+    meta = cache.meta
+    if not set(columns) <= set(meta["requested_columns"]):
+        return False
+
+    signature = file_signature(csv_path)
+    source = meta["source"]
+    if source["size"] != signature["size"]:
+        return False
+    if source["mtime_ns"] == signature["mtime_ns"]:
+        return True
+
+    # Touched but possibly unchanged: compare contents, and remember the new mtime
+    if source["sha1"] != file_hash(csv_path):
+        return False
+    arrays = {name: cache.array(name) for name in cache.names}
+    try:
+        write_columnar_file(cache_path, arrays, dict(meta, source=dict(source, **signature)),
+                            CATALOG_CACHE_MAGIC, CATALOG_CACHE_FORMAT_VERSION)
+    except OSError:
+        pass
+    return True
+
+
+def load_catalog_columns(csv_path, columns, cache_path=None):
+    """
+    Load string columns of the catalog CSV through its columnar cache.
+
+    The cache is (re)built when it is missing or stale; a rebuild keeps the
+    columns the previous cache was built for, so callers loading different
+    columns share one cache file. If it can't be written (e.g. read-only directory) the columns are served from a
+    temporary in-memory encoding instead.
+
+    Args:
+        csv_path: Catalog CSV with an article_id column
+        columns: Names of the columns to load
+        cache_path: Cache file (defaults to the CSV path plus CATALOG_CACHE_SUFFIX)
+
+    Returns:
+        Tuple of (ArticleIndex of article_id -> first row, {column: column}, number of rows).
+        Columns missing from the CSV are left out.
+    """
+    cache_path = cache_path or csv_path + CATALOG_CACHE_SUFFIX
+    if not _cache_is_current(cache_path, csv_path, columns):
+        try:
+            build_catalog_cache(csv_path, cache_path, _merge_columns(cache_path, columns))
+        except OSError as e:
+            import tempfile
+
+            log.warning("⚠️  Could not write catalog cache %s, using a temporary one", cache_path, error=str(e))
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                tmp_path = build_catalog_cache(csv_path, os.path.join(tmp_dir, "catalog.columns"), columns)
+                article_index, loaded, meta = open_catalog_cache(tmp_path)
+            return article_index, loaded, meta["num_rows"]
+
+    article_index, loaded, meta = open_catalog_cache(cache_path)
+    return article_index, {column: loaded[column] for column in columns if column in loaded}, meta["num_rows"]
+
+
+def _merge_columns(cache_path, columns):
+    """Columns to rebuild a cache with: those requested plus those of the existing cache"""
+    try:
+        previous = ColumnarFile(cache_path, CATALOG_CACHE_MAGIC, CATALOG_CACHE_FORMAT_VERSION).meta["requested_columns"]
+    except (OSError, ValueError):
+        return list(columns)
+    return list(columns) + [column for column in previous if column not in columns]
+
+
+def _frame_values(series):
+    """
+    Values of a DataFrame column as strings ("" for missing values).
+
+    List-valued columns (e.g. parsed_fabrics) keep their lists, as str() of a
+    list would turn them into their repr.
+    """
+    if series.dtype == object and series.map(lambda value: isinstance(value, (list, tuple))).any():
+        import pandas as pd
+
+        return [
+            list(value) if isinstance(value, (list, tuple)) else "" if pd.isna(value) else str(value)
+            for value in series.tolist()
+        ]
+    return series.fillna("").astype(str).tolist()
+
+
+class ItemCatalog:
+    """
+    Item catalog indexed by article_id and, once linked, by item node index.
+
+    Columns are keyed by CSV column name and hold strings ("" for missing
+    values, lists for list-valued DataFrame columns); columns absent from the
+    CSV are simply not present. Indexing with an article id returns the
+    item's record as a dict, like a row of the catalog DataFrame, but through
+    a binary search instead of a scan.
+    """
+    def __init__(self, article_index, columns, num_rows):
+        self.article_index = article_index
+        self.columns = columns
+        self.num_rows = num_rows
+        # Catalog row of every item node index (-1 if missing), set by link_graph
+        self.node_rows = None
+
+    def __len__(self):
+        return len(self.article_index)
+
+    def __contains__(self, article_id):
+        return self.row(article_id) is not None
+
+    def __getitem__(self, article_id):
+        row = self.row(article_id)
+        if row is None:
+            raise KeyError(f"Article {article_id} not in catalog")
+        return self.record(row)
+
+    @classmethod
+    def empty(cls):
+        return cls(ArticleIndex.from_ids([]), {}, 0)
+
+    @classmethod
+    def from_csv(cls, csv_path, columns, cache_path=None):
+        """Load columns of a catalog CSV through its columnar cache (see load_catalog_columns)"""
+        article_index, loaded, num_rows = load_catalog_columns(csv_path, columns, cache_path=cache_path)
+        return cls(article_index, loaded, num_rows)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """
+        Build an in-memory catalog from a DataFrame with an article_id column.
+
+        Args:
+            df: Catalog DataFrame, e.g. fashion_data
+            columns: Columns to keep (defaults to all of them)
+
+        Returns:
+            ItemCatalog
+        """
+        if columns is None:
+            columns = [column for column in df.columns if column != "article_id"]
+        return cls(
+            ArticleIndex.from_ids(df["article_id"].to_numpy(dtype=np.int64)),
+            {column: _frame_values(df[column]) for column in columns if column in df},
+            len(df)
+        )
+
+    def row(self, article_id):
+        """Catalog row of an article, or None"""
+        return self.article_index.get(int(article_id))
+
+    def rows(self, article_ids):
+        """Catalog rows of several articles (-1 where missing)"""
+        return self.article_index.get_many(article_ids)
+
+    def node_row(self, item_idx):
+        """Catalog row of an item node index, or None (requires link_graph)"""
+        row = int(self.node_rows[item_idx])
+        return row if row >= 0 else None
+
+    def record(self, row, columns=None):
+        """Dictionary of {column: value} for a catalog row"""
+        if columns is None:
+            return {column: values[row] for column, values in self.columns.items()}
+        return {column: self.columns[column][row] for column in columns}
+
+    def get(self, article_id, column, default=None):
+        """Value of one column for an article, or default if either is missing"""
+        row = self.row(article_id)
+        if row is None or column not in self.columns:
+            return default
+        return self.columns[column][row]
+
+    def take(self, column, rows):
+        """
+        Values of a column at several rows.
+
+        Args:
+            column: Column name
+            rows: Array of catalog rows, -1 for missing items
+
+        Returns:
+            List of values, None for missing rows
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        found = rows >= 0
+        values = [None] * len(rows)
+        column_values = self.columns[column]
+        found_values = (
+            column_values.take(rows[found]) if hasattr(column_values, "take")
+            else [column_values[row] for row in rows[found].tolist()]
+        )
+        for idx, value in zip(np.flatnonzero(found).tolist(), found_values):
+            values[idx] = value
+        return values
+
+    def link_graph(self, article_ids):
+        """
+        Index the catalog by item node index and check it against the graph.
+
+        Args:
+            article_ids: Article id of every item node, in node index order
+
+        Returns:
+            Dictionary with the number of graph items missing from the catalog
+            and of catalog items missing from the graph, plus a few examples
+        """
+        article_ids = np.asarray(article_ids, dtype=np.int64)
+        self.node_rows = self.rows(article_ids)
+        missing_from_catalog = article_ids[self.node_rows < 0]
+        missing_from_graph = self.article_index.sorted_ids[~np.isin(self.article_index.sorted_ids, article_ids)]
+        return {
+            "graph_items": len(article_ids),
+            "catalog_items": len(self),
+            "missing_from_catalog": len(missing_from_catalog),
+            "missing_from_graph": len(missing_from_graph),
+            "missing_from_catalog_examples": missing_from_catalog[:5].tolist(),
+            "missing_from_graph_examples": missing_from_graph[:5].tolist(),
+        }
+
+
+# ItemCatalogs converted from DataFrames: id(frame) -> (weak reference to the frame, catalog)
+_frame_catalogs = {}
+
+
+def as_item_catalog(catalog):
+    """
+    Return catalog as an ItemCatalog, converting a catalog DataFrame if needed.
+
+    The conversion of a DataFrame is cached for as long as the frame is alive,
+    so callers passing the same fashion_data on every call only pay for it
+    once. A frame modified in place after its first conversion isn't
+    converted again.
+    """
+    if isinstance(catalog, ItemCatalog):
+        return catalog
+    key = id(catalog)
+    cached = _frame_catalogs.get(key)
+    if cached is not None and cached[0]() is catalog:
+        return cached[1]
+    item_catalog = ItemCatalog.from_frame(catalog)
+    _frame_catalogs[key] = (weakref.ref(catalog, lambda _, key=key: _frame_catalogs.pop(key, None)), item_catalog)
+    return item_catalog
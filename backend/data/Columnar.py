@@ -0,0 +1,215 @@
+"""
+Columnar file container shared by the model bundle and the catalog cache.
+
+A columnar file stores named numpy arrays raw, each aligned to ALIGNMENT
+bytes, after a JSON header. Opening one only parses the header and maps
+the file copy-on-write; arrays are views of the mapping, so pages are read
+on demand and shared between processes.
+
+File layout:
+    magic (8 bytes) | header length (uint64) | sha256 of header (32 bytes) |
+    header JSON | padding | arrays (each aligned to ALIGNMENT)
+
+The header records the caller's format version, free-form metadata and the
+dtype, shape, offset and CRC32 of every array.
+"""
+import hashlib
+import json
+import mmap
+import os
+import zlib
+
+import numpy as np
+
+ALIGNMENT = 64
+MAGIC_SIZE = 8
+_PREAMBLE_SIZE = MAGIC_SIZE + 8 + 32
+
+
+class StringColumn:
+    """
+    Column of strings stored as UTF-8 bytes plus offsets.
+
+    Indexing returns a str, so the column can stand in for a list of strings
+    while its storage stays in two (mappable) numpy arrays.
+    """
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        return self.data[self.offsets[idx]:self.offsets[idx + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def take(self, rows):
+        """Values at rows, as a list"""
+        return [self[row] for row in rows.tolist()]
+
+    @classmethod
+    def from_values(cls, values):
+        """Encode a sequence of strings (other values are converted with str)"""
+        encoded = [value.encode("utf-8") if isinstance(value, str) else str(value).encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(offsets, data)
+
+
+class ArticleIndex:
+    """
+    Article ID -> position lookup backed by two sorted arrays.
+
+    Behaves like a {article_id: position} dict for get(), but uses binary
+    search over arrays that can live in shared memory, so attaching a worker
+    to an index does not rebuild a Python dict per process. The first
+    position wins for duplicated article ids.
+    """
+    def __init__(self, sorted_ids, positions):
+        self.sorted_ids = sorted_ids
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.sorted_ids)
+
+    @classmethod
+    def from_ids(cls, article_ids):
+        """Index the positions of article_ids"""
+        sorted_ids, positions = np.unique(np.asarray(article_ids, dtype=np.int64), return_index=True)
+        return cls(sorted_ids, positions.astype(np.int64))
+
+    def get(self, article_id, default=None):
+        pos = np.searchsorted(self.sorted_ids, article_id)
+        if pos < len(self.sorted_ids) and self.sorted_ids[pos] == article_id:
+            return int(self.positions[pos])
+        return default
+
+    def get_many(self, article_ids, default=-1):
+        """Positions of several article ids at once (default where missing)"""
+        article_ids = np.asarray(article_ids, dtype=np.int64)
+        if len(self.sorted_ids) == 0:
+            return np.full(len(article_ids), default, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.sorted_ids, article_ids), len(self.sorted_ids) - 1)
+        found = self.sorted_ids[pos] == article_ids
+        return np.where(found, self.positions[pos], default)
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_columnar_file(path, arrays, meta, magic, format_version):
+    """
+    Write named arrays and metadata to a columnar file.
+
+    The file is written next to path and moved into place at the end, so
+    readers never see a partially written file.
+
+    Args:
+        path: File to write
+        arrays: Dictionary of {name: numpy array} (no object dtypes)
+        meta: JSON-serializable metadata
+        magic: 8-byte file type marker
+        format_version: Version of the caller's format, checked on open
+
+    Returns:
+        path
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f"Cannot store object array {name} in a columnar file")
+        offset = _aligned(offset)
+        entries[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+            "nbytes": array.nbytes,
+            "crc32": zlib.crc32(memoryview(array).cast("B")),
+        }
+        offset += array.nbytes
+
+    header = json.dumps({"format_version": format_version, "meta": meta, "arrays": entries}).encode()
+    data_start = _aligned(_PREAMBLE_SIZE + len(header))
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(magic)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(hashlib.sha256(header).digest())
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + entries[name]["offset"])
+            f.write(memoryview(array).cast("B"))
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+class ColumnarFile:
+    """
+    Read-only, memory-mapped view of a columnar file.
+
+    Only the header is read when the file is opened; array() returns views of
+    a copy-on-write mapping, so pages are loaded on demand and shared between
+    processes.
+    """
+    def __init__(self, path, magic, format_version, verify=False):
+        self.path = path
+        with open(path, "rb") as f:
+            preamble = f.read(_PREAMBLE_SIZE)
+            if len(preamble) < _PREAMBLE_SIZE or preamble[:MAGIC_SIZE] != magic:
+                raise ValueError(f"{path} is not a {magic.decode(errors='replace')} file")
+            header_length = int.from_bytes(preamble[MAGIC_SIZE:MAGIC_SIZE + 8], "little")
+            header = f.read(header_length)
+            if hashlib.sha256(header).digest() != preamble[MAGIC_SIZE + 8:]:
+                raise ValueError(f"{path}: header checksum mismatch")
+            header = json.loads(header)
+            if header["format_version"] != format_version:
+                raise ValueError(f"{path}: unsupported format version {header['format_version']}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        self.meta = header["meta"]
+        self.entries = header["arrays"]
+        self._data_start = _aligned(_PREAMBLE_SIZE + header_length)
+        if verify:
+            self.verify()
+
+    @property
+    def names(self):
+        return list(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def array(self, name):
+        """View of a stored array (no copy)"""
+        entry = self.entries[name]
+        dtype = np.dtype(entry["dtype"])
+        count = entry["nbytes"] // dtype.itemsize
+        return np.frombuffer(
+            self._mmap, dtype=dtype, count=count, offset=self._data_start + entry["offset"]
+        ).reshape(entry["shape"])
+
+    def verify(self, names=None):
+        """
+        Check the CRC32 of stored arrays.
+
+        Args:
+            names: Arrays to check (defaults to all)
+
+        Raises:
+            ValueError: If an array does not match its checksum
+        """
+        for name in names or self.entries:
+            if zlib.crc32(memoryview(self.array(name)).cast("B")) != self.entries[name]["crc32"]:
+                raise ValueError(f"{self.path}: checksum mismatch for {name}")
+
+
@@ -1,8 +1,20 @@
+import numpy as np
 import torch
 import random
 from collections import defaultdict
+from contextlib import nullcontext
+from .Serving import compute_node_embeddings, ItemRuleArrays, ItemAttributeTable
+from .Catalog import as_item_catalog
+from ..log import get_logger
 
-def get_enhanced_recommendations(model, pyg_graph, fashion_graph, item_id, node_mapping, fashion_data, top_k=5, verbose=True):
+log = get_logger(__name__)
+
+def _untimed(stage):
+    """Default stage timer: records nothing"""
+    return nullcontext()
+
+def get_enhanced_recommendations(model, pyg_graph, fashion_graph, item_id, node_mapping, catalog, top_k=5, verbose=False,
+                                 item_embeddings=None, item_rules=None, scorer=None, attribute_table=None, timer=None):
     """
     Get top-k fashion item recommendations for a given item,
     following gender and product group compatibility rules:
@@ -16,18 +28,30 @@ def get_enhanced_recommendations(model, pyg_graph, fashion_graph, item_id, node_
         fashion_graph: NetworkX graph
         item_id: ID of the item to get recommendations for
         node_mapping: Mapping between node names and indices
-        fashion_data: Original fashion dataframe
+        catalog: ItemCatalog with the item details (a fashion dataframe is converted)
         top_k: Number of recommendations to return
         verbose: Whether to print progress
+        item_embeddings: Precomputed item embeddings (e.g. from an EmbeddingStore).
+            If None, a full-graph forward pass is run for this call.
+        item_rules: Precomputed ItemRuleArrays for candidate filtering.
+            If None, they are built from the catalog for this call.
+        scorer: FactorizedScorer matching item_embeddings, used instead of the
+            model's scorer when given
+        attribute_table: Precomputed ItemAttributeTable used for explanations
+            instead of walking fashion_graph
+        timer: Optional stage timer, a callable mapping a stage name to a
+            context manager (e.g. metrics.stage_timer("enhanced"))
         
     Returns:
         List of (item_id, score, explanation) tuples
     """
+    timer = timer or _untimed
     if verbose:
         print(f"Finding recommendations for item ID {item_id}...")
     
     device = torch.device('cpu')
     model = model.to(device)
+    catalog = as_item_catalog(catalog)
     
     # Get item node and index
     item_node = f"item_{item_id}"
@@ -38,169 +62,345 @@ def get_enhanced_recommendations(model, pyg_graph, fashion_graph, item_id, node_
     
     # Get query item details
     try:
-        item_row = fashion_data[fashion_data['article_id'] == item_id].iloc[0]
+        item_row = catalog[item_id]
         item_name = item_row['prod_name']
         item_product_group = item_row['product_group_name']
-        item_gender_group = item_row['index_group_no']
+        item_gender_group = item_row.get('index_group_no', 0)
         item_gender_name = item_row['index_group_name']
     except Exception as e:
-        print(f"Error getting item details: {str(e)}")
-        print("Attempting to get details from graph...")
+        log.debug("Item details not in the catalog, reading them from the graph", item_id=item_id, error=str(e))
         try:
             item_name = fashion_graph.nodes[item_node].get('name', 'Unknown')
             item_product_group = fashion_graph.nodes[item_node].get('product_group', 'Unknown')
             item_gender_group = fashion_graph.nodes[item_node].get('gender_group', 0)
             item_gender_name = fashion_graph.nodes[item_node].get('gender_name', 'Unknown')
         except Exception as e:
-            print(f"Error getting details from graph: {str(e)}")
+            log.debug("Item details not in the graph either", item_id=item_id, error=str(e))
             raise ValueError(f"Could not find details for item ID {item_id} in either dataset or graph")
     
     if verbose:
         print(f"Finding recommendations for: {item_name} (Group: {item_product_group}, Gender: {item_gender_name})")
     
     # Pre-filter items based on gender and product group compatibility
-    filtered_indices = []
-    filtered_ids = []
-    
-    # Track filtered items for statistics
-    filtered_gender = 0
-    filtered_product_group = 0
-    filtered_same_group = 0
-    
-    incompatible_groups = [
-        ("Garment Full body", "Garment Upper body"),
-        ("Garment Full body", "Garment Lower body"),
-        ("Garment Upper body", "Garment Full body"),
-        ("Garment Lower body", "Garment Full body")
-    ]
-    
-    # Create a mask for compatible items
-    all_items = list(node_mapping['item'].keys())
-    for other_node in all_items:
-        if other_node == item_node:
-            continue
-            
-        other_idx = node_mapping['item'][other_node]
-        other_id = int(other_node.split('_')[1])
-        
-        try:
-            other_row = fashion_data[fashion_data['article_id'] == other_id].iloc[0]
-            other_product_group = other_row['product_group_name']
-            other_gender_group = other_row['index_group_no']
-        except:
-            other_product_group = fashion_graph.nodes[other_node].get('product_group', 'Unknown')
-            other_gender_group = fashion_graph.nodes[other_node].get('gender_group', 0)
-        
-        # Check gender compatibility
-        if item_gender_group != other_gender_group:
-            if (item_gender_group in [1, 2] and other_gender_group in [1, 2] and 
-                item_gender_group != other_gender_group):
-                filtered_gender += 1
-                continue
-        
-        # Check product group compatibility
-        if (item_product_group, other_product_group) in incompatible_groups:
-            filtered_product_group += 1
-            continue
-        
-        # Filter same product group
-        if other_product_group == item_product_group:
-            filtered_same_group += 1
-            continue
-            
-        filtered_indices.append(other_idx)
-        filtered_ids.append(other_id)
-    
-    if not filtered_indices:
+    with timer("candidate_filtering"):
+        if item_rules is None:
+            item_rules = ItemRuleArrays.from_catalog(node_mapping, catalog, fashion_graph)
+        compatible, filter_stats = item_rules.compatible_mask(item_idx)
+        filtered_indices = np.flatnonzero(compatible)
+    filtered_gender = filter_stats['gender']
+    filtered_product_group = filter_stats['product_group']
+    filtered_same_group = filter_stats['same_group']
+    
+    if len(filtered_indices) == 0:
         if verbose:
             print("No compatible items found after filtering.")
         return []
     
-    # Convert to tensors
-    filtered_indices = torch.tensor(filtered_indices, device=device)
-    
-    # Forward pass to get embeddings (only once)
+    # Forward pass to get embeddings, unless the caller already has them cached
     model.eval()
-    with torch.no_grad():
-        x_dict = {node_type: data.x.to(device) for node_type, data in pyg_graph.items()}
-        edge_index_dict = {
-            edge_type: data.edge_index.to(device) 
-            for edge_type, data in pyg_graph.items() 
-            if hasattr(data, 'edge_index')
-        }
-        node_embeddings = model(x_dict, edge_index_dict)
-        item_embeddings = node_embeddings['item']
+    if item_embeddings is None:
+        with timer("forward_pass"):
+            item_embeddings = compute_node_embeddings(model, pyg_graph, device)['item']
+    
+    # Compute compatibility scores in batches into one preallocated tensor
+    with timer("scoring"), torch.no_grad():
+        scores = score_candidates(
+            model, item_idx, torch.from_numpy(filtered_indices).to(device), item_embeddings, scorer=scorer
+        ).cpu().numpy()
+    
+    # Select the top-k without sorting the full candidate list; ids only for the winners
+    with timer("top_k"):
+        top_positions = select_top_k(scores, top_k)
+        top_indices = filtered_indices[top_positions]
+        top_items = list(zip(item_rules.article_ids[top_indices].tolist(), scores[top_positions].tolist()))
+    
+    # Compute attribute importance for all top-k items in one batch
+    with timer("attribute_importance"), torch.no_grad():
+        importance = attribute_importance_matrix(model, item_idx, top_indices, item_embeddings, scorer=scorer)
+    
+    # Create final recommendations with explanations
+    final_recommendations = []
+    with timer("explanations"):
+        for (item_id, score), item_importance in zip(top_items, importance):
+            attr_importance = importance_to_dict(item_importance, model.attr_types)
+            
+            # Get explanation
+            explanation = explain_enhanced_compatibility(
+                fashion_graph, item_node, f"item_{item_id}", 
+                score, attr_importance, catalog,
+                attribute_table=attribute_table
+            )
+            
+            final_recommendations.append((item_id, score, explanation))
+    
+    if verbose:
+        print(f"Found {len(final_recommendations)} recommendations.")
+        print(f"Filtered {filtered_gender} items due to gender incompatibility.")
+        print(f"Filtered {filtered_product_group} items due to product group incompatibility.")
+        print(f"Filtered {filtered_same_group} items from the same product group.")
     
-    # Compute compatibility scores in batches
-    batch_size = 512
-    all_scores = []
+    return final_recommendations
+
+def score_candidates(model, item_idx, candidate_indices, item_embeddings, batch_size=512, scorer=None):
+    """
+    Score one query item against a set of candidate items in batches.
     
-    for i in range(0, len(filtered_indices), batch_size):
-        batch_indices = filtered_indices[i:i + batch_size]
+    Args:
+        model: Trained FashionGAT model (unused when scorer is given)
+        item_idx: Node index of the query item
+        candidate_indices: 1-D tensor of candidate item node indices
+        item_embeddings: Embeddings of all items (unused when scorer is given)
+        batch_size: Number of pairs scored per scorer call
+        scorer: Optional FactorizedScorer; larger batches are used with it since
+            no pair tensors are materialized
+        
+    Returns:
+        1-D tensor of compatibility scores, aligned with candidate_indices
+    """
+    if scorer is not None:
+        scores = torch.empty(len(candidate_indices), dtype=scorer.query_proj.dtype, device=scorer.query_proj.device)
+        batch_size = max(batch_size, 8192)
+        for i in range(0, len(candidate_indices), batch_size):
+            scores[i:i + batch_size] = scorer.score(item_idx, candidate_indices[i:i + batch_size])
+        return scores
+    
+    scores = torch.empty(len(candidate_indices), dtype=item_embeddings.dtype, device=item_embeddings.device)
+    for i in range(0, len(candidate_indices), batch_size):
+        batch_indices = candidate_indices[i:i + batch_size]
         batch_scores = model.batch_predict_compatibility(
-            torch.full((len(batch_indices),), item_idx, device=device),
+            torch.full((len(batch_indices),), item_idx, device=item_embeddings.device),
             batch_indices,
             item_embeddings
         )
-        all_scores.extend(list(zip(filtered_ids[i:i + batch_size], batch_scores.tolist())))
+        scores[i:i + batch_size] = batch_scores.reshape(-1)
+    return scores
+
+def select_top_k(scores, k):
+    """
+    Positions of the k highest scores, in descending score order.
     
-    # Sort by score and get top-k
-    top_items = sorted(all_scores, key=lambda x: x[1], reverse=True)[:top_k]
+    Uses a partial selection instead of a full sort. Ties are broken by
+    position (earlier candidates first), which matches a stable
+    sorted(..., reverse=True) over the same scores.
     
-    # Create final recommendations with explanations
-    final_recommendations = []
-    for item_id, score in top_items:
-        # Compute attribute importance for top-k items
-        attr_importance = model.compute_attribute_importance(
-            item_idx, 
-            node_mapping['item'][f"item_{item_id}"], 
-            item_embeddings
-        )
+    Args:
+        scores: 1-D numpy array of scores
+        k: Number of positions to select
         
-        # Get explanation
-        explanation = explain_enhanced_compatibility(
-            fashion_graph, item_node, f"item_{item_id}", 
-            score, attr_importance, fashion_data
-        )
+    Returns:
+        Numpy array of at most k positions into scores
+    """
+    num_scores = len(scores)
+    k = min(k, num_scores)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    
+    if k < num_scores:
+        # k-th largest score; keep everything above it and the earliest ties
+        threshold = np.partition(scores, num_scores - k)[num_scores - k]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+        positions = np.concatenate([above, ties])
+    else:
+        positions = np.arange(num_scores)
+    
+    order = np.lexsort((positions, -scores[positions]))
+    return positions[order]
+
+def attribute_importance_matrix(model, item_idx, candidate_indices, item_embeddings, scorer=None):
+    """
+    Attribute importance between one query item and a set of candidates.
+    
+    Shared by the API path and the top-K precompute job; callers convert rows
+    to dictionaries (see importance_to_dict) only where they are needed.
+    
+    Args:
+        model: Trained FashionGAT model (unused when scorer is given)
+        item_idx: Node index of the query item
+        candidate_indices: Candidate item node indices (list, array or tensor)
+        item_embeddings: Embeddings of all items (unused when scorer is given)
+        scorer: Optional FactorizedScorer matching item_embeddings
         
-        final_recommendations.append((item_id, score, explanation))
+    Returns:
+        Numpy array of shape (N, len(model.attr_types)), in attr_types order
+    """
+    candidate_indices = torch.as_tensor(candidate_indices, dtype=torch.long)
+    if len(candidate_indices) == 0:
+        attr_types = scorer.attr_types if scorer is not None else model.attr_types
+        return np.zeros((0, len(attr_types)), dtype=np.float32)
+    if scorer is not None:
+        importance = scorer.attribute_importance(item_idx, candidate_indices)
+    else:
+        importance = model.batch_compute_attribute_importance(item_idx, candidate_indices, item_embeddings)
+    return importance.cpu().numpy()
+
+def retrieve_candidates(item_idx, item_rules, scorer, ann_index=None, num_candidates=2000):
+    """
+    Sorted node indices of the items to score for a query item.
     
-    if verbose:
-        print(f"Found {len(final_recommendations)} recommendations.")
-        print(f"Filtered {filtered_gender} items due to gender incompatibility.")
-        print(f"Filtered {filtered_product_group} items due to product group incompatibility.")
-        print(f"Filtered {filtered_same_group} items from the same product group.")
+    Every compatible item without ann_index; otherwise the compatible items
+    from the best-scoring clusters of the index.
+    """
+    if ann_index is None:
+        return np.flatnonzero(item_rules.compatible_mask(item_idx)[0])
+    return ann_index.candidates(scorer, item_idx, item_rules, num_candidates)
+
+def rank_compatible_items(item_idx, item_rules, scorer, top_k, with_importance=True, ann_index=None,
+                          num_candidates=2000, timer=None):
+    """
+    Top-k compatible items for a query item using only precomputed arrays.
     
-    return final_recommendations
+    Applies the same pairing rules, scoring and tie-breaking as
+    get_enhanced_recommendations, but needs neither the model nor the graphs
+    and builds no explanations.
+    
+    With an ann_index (see data/Retrieval.py), only the compatible items of
+    the best-scoring index clusters are scored, so the result is approximate.
+    
+    Args:
+        item_idx: Node index of the query item
+        item_rules: ItemRuleArrays for candidate filtering
+        scorer: FactorizedScorer for the item embeddings
+        top_k: Number of items to return
+        with_importance: Whether to compute attribute importance for the winners
+        ann_index: Optional IVFIndex for candidate retrieval
+        num_candidates: Number of candidates retrieved from ann_index
+        timer: Optional stage timer (see get_enhanced_recommendations)
+        
+    Returns:
+        Tuple of (item node indices, scores, importance matrix in scorer.attr_types order
+        or None without with_importance)
+    """
+    timer = timer or _untimed
+    with timer("candidate_filtering"):
+        candidates = retrieve_candidates(item_idx, item_rules, scorer, ann_index, num_candidates)
+    if len(candidates) == 0:
+        importance = np.zeros((0, len(scorer.attr_types)), dtype=np.float32) if with_importance else None
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), importance
+    
+    with torch.no_grad():
+        with timer("scoring"):
+            scores = score_candidates(None, item_idx, torch.from_numpy(candidates), None, scorer=scorer).numpy()
+        with timer("top_k"):
+            order = select_top_k(scores, top_k)
+            winners = candidates[order]
+        importance = None
+        if with_importance:
+            with timer("attribute_importance"):
+                importance = attribute_importance_matrix(None, item_idx, winners, None, scorer=scorer)
+    return winners, scores[order], importance
 
-def explain_enhanced_compatibility(fashion_graph, item1_node, item2_node, score, attr_importance, fashion_data):
+def rank_compatible_items_batch(item_indices, item_rules, scorer, top_k, max_block_elements=1 << 24,
+                                ann_index=None, num_candidates=2000):
+    """
+    Top-k compatible items for several query items at once.
+    
+    Scores every query against every item as one (queries x items) matrix,
+    computed in blocks of items so that the intermediate hidden activations
+    stay below max_block_elements values. Each query's pairing rules are then
+    applied to its row and the top-k are selected with the same tie-breaking
+    as rank_compatible_items. Attribute importance is computed for all
+    winners of all queries in one call.
+    
+    With an ann_index, the matrix only covers the union of the candidates
+    retrieved for the queries, and each query ranks its own candidates.
+    
+    Args:
+        item_indices: Node indices of the query items
+        item_rules: ItemRuleArrays for candidate filtering
+        scorer: FactorizedScorer for the item embeddings
+        top_k: Number of items to return per query
+        max_block_elements: Bound on the size of the per-block hidden tensor
+        ann_index: Optional IVFIndex for candidate retrieval
+        num_candidates: Number of candidates retrieved from ann_index per query
+        
+    Returns:
+        List of (item node indices, scores, importance matrix in scorer.attr_types order),
+        one per query item
+    """
+    item_indices = np.asarray(item_indices, dtype=np.int64)
+    if len(item_indices) == 0:
+        return []
+    
+    candidates_per_query = [
+        retrieve_candidates(item_idx, item_rules, scorer, ann_index, num_candidates)
+        for item_idx in item_indices.tolist()
+    ]
+    if ann_index is None:
+        columns = np.arange(len(item_rules))
+    else:
+        columns = np.unique(np.concatenate(candidates_per_query))
+    
+    queries = torch.from_numpy(item_indices)
+    block_size = max(1, max_block_elements // (len(item_indices) * scorer.query_proj.size(1)))
+    with torch.no_grad():
+        scores = np.empty((len(item_indices), len(columns)), dtype=np.float32)
+        for start in range(0, len(columns), block_size):
+            block = torch.from_numpy(columns[start:start + block_size])
+            scores[:, start:start + len(block)] = scorer.score_matrix(queries, block).numpy()
+    
+    winners_per_query = []
+    scores_per_query = []
+    for row, candidates in enumerate(candidates_per_query):
+        positions = candidates if ann_index is None else np.searchsorted(columns, candidates)
+        candidate_scores = scores[row, positions]
+        order = select_top_k(candidate_scores, top_k)
+        winners_per_query.append(candidates[order])
+        scores_per_query.append(candidate_scores[order])
+    
+    counts = [len(winners) for winners in winners_per_query]
+    with torch.no_grad():
+        importance = scorer.pair_attribute_importance(
+            torch.from_numpy(np.repeat(item_indices, counts)),
+            torch.from_numpy(np.concatenate(winners_per_query).astype(np.int64))
+        ).numpy()
+    importance_per_query = np.split(importance, np.cumsum(counts)[:-1])
+    return list(zip(winners_per_query, scores_per_query, importance_per_query))
+
+def importance_to_dict(importance_row, attr_types):
+    """Convert one row of an attribute importance matrix to {attr_type: score}"""
+    return {attr_type: float(score) for attr_type, score in zip(attr_types, importance_row)}
+
+def explain_enhanced_compatibility(fashion_graph, item1_node, item2_node, score, attr_importance, catalog,
+                                   attribute_table=None):
     """
     Generate a natural and meaningful explanation for why two items are compatible.
     Now uses normalized attribute importance scores that represent percentages of influence.
+    
+    Item names and product groups are read from catalog (an ItemCatalog; a
+    fashion dataframe is converted), and item attributes from attribute_table
+    (an ItemAttributeTable) when given; fashion_graph is then only consulted
+    for items missing from them.
     """
+    catalog = as_item_catalog(catalog)
+    
     # Get item details
     item1_id = int(item1_node.split('_')[1])
     item2_id = int(item2_node.split('_')[1])
     
     try:
-        item1_row = fashion_data[fashion_data['article_id'] == item1_id].iloc[0]
+        item1_row = catalog[item1_id]
         item1_name = item1_row['prod_name']
         item1_product_group = item1_row['product_group_name']
-    except:
+    except KeyError:
         item1_name = fashion_graph.nodes[item1_node].get('name', 'Unknown')
         item1_product_group = fashion_graph.nodes[item1_node].get('product_group', 'Unknown')
     
     try:
-        item2_row = fashion_data[fashion_data['article_id'] == item2_id].iloc[0]
+        item2_row = catalog[item2_id]
         item2_name = item2_row['prod_name']
         item2_product_group = item2_row['product_group_name']
-    except:
+    except KeyError:
         item2_name = fashion_graph.nodes[item2_node].get('name', 'Unknown')
         item2_product_group = fashion_graph.nodes[item2_node].get('product_group', 'Unknown')
     
     # Get attributes
-    item1_attrs = get_item_attributes(fashion_graph, item1_node)
-    item2_attrs = get_item_attributes(fashion_graph, item2_node)
+    item1_attrs = attribute_table.get(item1_id) if attribute_table is not None else None
+    item2_attrs = attribute_table.get(item2_id) if attribute_table is not None else None
+    if item1_attrs is None:
+        item1_attrs = get_item_attributes(fashion_graph, item1_node)
+    if item2_attrs is None:
+        item2_attrs = get_item_attributes(fashion_graph, item2_node)
     
     # Create base explanation structure
     explanation = {
@@ -411,14 +611,15 @@ def get_item_attributes(graph, item_node):
     
     return attrs
 
-def format_enhanced_recommendations(recommendations, fashion_data):
+def format_enhanced_recommendations(recommendations, catalog):
     """Format recommendation results for display"""
+    catalog = as_item_catalog(catalog)
     results = []
     
     for rec_id, score, explanation in recommendations:
         # Get item details from the dataset
         try:
-            item_data = fashion_data[fashion_data['article_id'] == rec_id].iloc[0]
+            item_data = catalog[rec_id]
             name = item_data['prod_name']
             product_group = item_data['product_group_name']
         except:
@@ -440,10 +641,12 @@ def format_enhanced_recommendations(recommendations, fashion_data):
     
     return results
 
-def display_recommendations(item_id, recommendations, fashion_data):
+def display_recommendations(item_id, recommendations, catalog):
     """Display formatted recommendations for a query item"""
+    catalog = as_item_catalog(catalog)
+    
     # Get query item details
-    query_item = fashion_data[fashion_data['article_id'] == item_id].iloc[0]
+    query_item = catalog[item_id]
     print(f"\nQuery Item:")
     print(f"ID: {item_id}")
     print(f"Name: {query_item['prod_name']}")
@@ -452,8 +655,10 @@ def display_recommendations(item_id, recommendations, fashion_data):
     print(f"  - Color: {query_item['perceived_colour_value_name']}")
     print(f"  - Luminance: {query_item['perceived_colour_master_name']}")
     print(f"  - Appearance: {query_item['graphical_appearance_name']}")
-    if query_item['parsed_fabrics']:
-        print(f"  - Fabric: {', '.join(query_item['parsed_fabrics'])}")
+    fabrics = query_item.get('parsed_fabrics')
+    if fabrics:
+        # A list for DataFrame catalogs, already a string when read from the CSV
+        print(f"  - Fabric: {fabrics if isinstance(fabrics, str) else ', '.join(fabrics)}")
     if query_item['Sleeve_prediction']:
         print(f"  - Sleeve: {query_item['Sleeve_prediction']}")
     if query_item['Length_prediction']:
@@ -468,7 +673,7 @@ def display_recommendations(item_id, recommendations, fashion_data):
             rec_id, score, explanation = rec
             # Get item details from the dataset
             try:
-                item_data = fashion_data[fashion_data['article_id'] == rec_id].iloc[0]
+                item_data = catalog[rec_id]
                 name = item_data['prod_name']
                 product_group = item_data['product_group_name']
             except:
@@ -631,8 +836,13 @@ def save_model_and_data(model, fashion_graph, pyg_graph, node_mapping, fashion_d
     
     print(f"Model and data saved to {output_dir}/")
 
-def load_model_and_data(model_class, output_dir="fashion_model", **model_kwargs):
-    """Load saved model and graph data"""
+def load_model_and_data(model_class, output_dir="fashion_model", load_data=True, **model_kwargs):
+    """
+    Load saved model and graph data.
+    
+    With load_data=False, full_data.csv is not read and None is returned in
+    place of fashion_data (for callers that use a shared ItemCatalog instead).
+    """
     import os
     import pickle
     import torch
@@ -662,6 +872,10 @@ def load_model_and_data(model_class, output_dir="fashion_model", **model_kwargs)
     with open(os.path.join(output_dir, "node_mapping.pkl"), "rb") as f:
         node_mapping = pickle.load(f)
     
+    if not load_data:
+        print(f"Model and graph loaded from {output_dir}/")
+        return model, fashion_graph, pyg_graph, node_mapping, None
+    
     # Load fashion data sample
     fashion_data = pd.read_csv(os.path.join(output_dir, "full_data.csv"))
     
@@ -0,0 +1,317 @@
+"""
+Offline top-K precompute job.
+
+Scores every item in node_mapping['item'] against the catalog with the same
+rules and scorer as get_enhanced_recommendations and writes the results to a
+fixed-width binary table that can be served through np.memmap without torch.
+
+Usage (from the project root):
+    python -m backend.data.Precompute --model-dir backend/data/model_data --workers 4
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from .Columnar import ArticleIndex
+
+# File layout: HEADER_SIZE bytes of header (magic + JSON), then one int64
+# article id per item, then one fixed-width record per item.
+TABLE_MAGIC = b"FPTOPK01"
+TABLE_FORMAT_VERSION = 1
+HEADER_SIZE = 4096
+DEFAULT_TABLE_NAME = "topk_table.bin"
+
+# Catalog columns read by the pairing rules (see ItemRuleArrays.from_catalog)
+RULE_COLUMNS = ['product_group_name', 'index_group_no']
+
+# Attribute order of EnhancedFashionGAT.attr_types; also the importance column
+# order of CompactRecommendations (sessions.py), whose byte layout depends on it
+ATTR_TYPES = ['color_value', 'color_master', 'appearance', 'fabric', 'sleeve', 'length', 'neckline']
+
+
+def record_dtype(top_k, num_attrs=len(ATTR_TYPES)):
+    """
+    Numpy dtype of one table record.
+
+    count is -1 until the item has been computed; unused neighbor slots are
+    padded with -1 indices and NaN scores.
+    """
+    return np.dtype([
+        ('count', np.int32),
+        ('neighbors', np.int32, (top_k,)),
+        ('scores', np.float32, (top_k,)),
+        ('importance', np.float32, (top_k, num_attrs)),
+    ])
+
+
+def _write_header(path, header):
+    payload = json.dumps(header).encode()
+    if len(TABLE_MAGIC) + 4 + len(payload) > HEADER_SIZE:
+        raise ValueError("Top-K table header is too large")
+    with open(path, "r+b") as f:
+        f.write(TABLE_MAGIC)
+        f.write(len(payload).to_bytes(4, "little"))
+        f.write(payload)
+
+
+def read_table_header(path):
+    """Read the JSON header of a top-K table file"""
+    with open(path, "rb") as f:
+        if f.read(len(TABLE_MAGIC)) != TABLE_MAGIC:
+            raise ValueError(f"{path} is not a top-K table")
+        length = int.from_bytes(f.read(4), "little")
+        return json.loads(f.read(length))
+
+
+class TopKTable:
+    """
+    Memory-mapped view of a precomputed top-K table.
+
+    Only numpy is needed to serve from the table, and since the file is
+    mapped read-only its pages are shared by every process that opens it.
+    """
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.header = read_table_header(path)
+        if self.header.get("format_version") != TABLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported top-K table format: {self.header.get('format_version')}")
+
+        self.num_items = self.header["num_items"]
+        self.top_k = self.header["top_k"]
+        self.attr_types = self.header["attr_types"]
+        self.bundle_version = self.header.get("bundle_version")
+        # Signature of the catalog CSV the pairing rules were read from (see Catalog.file_signature)
+        self.catalog_source = self.header.get("catalog_source")
+
+        self.article_ids = np.memmap(path, dtype=np.int64, mode=mode, offset=HEADER_SIZE, shape=(self.num_items,))
+        self.records = np.memmap(
+            path, dtype=record_dtype(self.top_k, len(self.attr_types)), mode=mode,
+            offset=HEADER_SIZE + self.article_ids.nbytes, shape=(self.num_items,)
+        )
+        # Sorted-array lookup instead of a per-process dict over all article ids
+        self._index = ArticleIndex.from_ids(self.article_ids)
+
+    @classmethod
+    def create(cls, path, article_ids, top_k, bundle_version=None, attr_types=ATTR_TYPES, catalog_source=None):
+        """Allocate an empty table for the given items (all records marked pending)"""
+        num_items = len(article_ids)
+        dtype = record_dtype(top_k, len(attr_types))
+        with open(path, "wb") as f:
+            f.truncate(HEADER_SIZE + num_items * (8 + dtype.itemsize))
+        _write_header(path, {
+            "format_version": TABLE_FORMAT_VERSION,
+            "num_items": num_items,
+            "top_k": top_k,
+            "attr_types": list(attr_types),
+            "bundle_version": bundle_version,
+            "catalog_source": catalog_source,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        table = cls(path, mode="r+")
+        table.article_ids[:] = article_ids
+        table._index = ArticleIndex.from_ids(table.article_ids)
+        table.records['count'] = -1
+        table.records['neighbors'] = -1
+        table.records['scores'] = np.nan
+        table.flush()
+        return table
+
+    def flush(self):
+        self.article_ids.flush()
+        self.records.flush()
+
+    def pending_items(self):
+        """Indices of items that have not been computed yet"""
+        return np.flatnonzero(self.records['count'] < 0)
+
+    def lookup(self, article_id, top_k=None):
+        """
+        Get the precomputed recommendations for an article.
+
+        Args:
+            article_id: Query article ID
+            top_k: Number of results wanted (defaults to the table's K)
+
+        Returns:
+            Tuple of (article ids, scores, importance matrix) or None if the
+            item is not in the table, not computed yet, or top_k exceeds K
+        """
+        idx = self._index.get(int(article_id))
+        if idx is None:
+            return None
+        top_k = self.top_k if top_k is None else top_k
+        if top_k > self.top_k:
+            return None
+        record = self.records[idx]
+        count = int(record['count'])
+        if count < 0:
+            return None
+        count = min(count, top_k)
+        neighbors = record['neighbors'][:count]
+        return self.article_ids[neighbors], record['scores'][:count], record['importance'][:count]
+
+
+# Per-process state for pool workers
+_worker = {}
+
+
+def _init_worker(model_dir, catalog_path, catalog_columns, top_k, table_path, model_kwargs, num_threads):
+    import torch
+    from .Catalog import ItemCatalog
+    from .Enhancement import load_model_and_data
+    from .Recommender import EnhancedFashionGAT
+    from .Serving import EmbeddingStore, ItemRuleArrays, model_bundle_version
+
+    torch.set_num_threads(num_threads)
+    model, fashion_graph, pyg_graph, node_mapping, _ = load_model_and_data(
+        EnhancedFashionGAT, model_dir, load_data=False, **model_kwargs
+    )
+    catalog = ItemCatalog.from_csv(catalog_path, catalog_columns)
+    store = EmbeddingStore()
+    store.refresh(model, pyg_graph, model_bundle_version(model_dir))
+    _worker.update(
+        scorer=store.scorer,
+        item_rules=ItemRuleArrays.from_catalog(node_mapping, catalog, fashion_graph),
+        table=TopKTable(table_path, mode="r+"),
+        top_k=top_k,
+    )
+
+
+def _compute_chunk(item_indices):
+    """Compute and store the top-K records for a chunk of item indices"""
+    from .Enhancement import rank_compatible_items
+
+    scorer = _worker['scorer']
+    item_rules = _worker['item_rules']
+    table = _worker['table']
+    top_k = _worker['top_k']
+
+    counts = np.zeros(len(item_indices), dtype=np.int32)
+    for pos, item_idx in enumerate(item_indices):
+        winners, scores, importance = rank_compatible_items(int(item_idx), item_rules, scorer, top_k)
+        record = table.records[item_idx]
+        record['neighbors'][:len(winners)] = winners
+        record['scores'][:len(winners)] = scores
+        record['importance'][:len(winners)] = importance
+        counts[pos] = len(winners)
+
+    # Mark the chunk as done only after all of its records are written
+    table.records.flush()
+    table.records['count'][item_indices] = counts
+    table.records.flush()
+    return len(item_indices)
+
+
+def precompute_topk_table(model_dir, output_path=None, top_k=50, chunk_size=256, workers=1,
+                          model_kwargs=None, overwrite=False, verbose=True, catalog_path=None):
+    """
+    Precompute top-K recommendations for every item and write them to a table.
+
+    The job is resumable: when output_path already holds a table for the same
+    bundle version, catalog and K, only items that are still pending are computed.
+
+    Args:
+        model_dir: Directory produced by save_model_and_data
+        output_path: Table file to write (defaults to model_dir/topk_table.bin)
+        top_k: Number of neighbors stored per item
+        chunk_size: Number of items per work unit
+        workers: Number of worker processes
+        model_kwargs: Keyword arguments for EnhancedFashionGAT
+        overwrite: Discard an existing table instead of resuming it
+        verbose: Whether to print progress
+        catalog_path: Catalog CSV for the pairing rules (defaults to default_catalog_path(model_dir),
+            the catalog the server uses)
+
+    Returns:
+        Path of the written table
+    """
+    import multiprocessing
+    import pickle
+    from .Catalog import ItemCatalog, default_catalog_path, file_signature
+    from .Serving import model_bundle_version
+
+    catalog_path = catalog_path or default_catalog_path(model_dir)
+    output_path = output_path or os.path.join(model_dir, DEFAULT_TABLE_NAME)
+    model_kwargs = model_kwargs or {}
+    bundle_version = model_bundle_version(model_dir)
+    catalog_source = file_signature(catalog_path)
+
+    with open(os.path.join(model_dir, "node_mapping.pkl"), "rb") as f:
+        node_mapping = pickle.load(f)
+    article_ids = np.zeros(len(node_mapping['item']), dtype=np.int64)
+    for node_name, idx in node_mapping['item'].items():
+        article_ids[idx] = int(node_name.split('_')[1])
+
+    table = None
+    if os.path.exists(output_path) and not overwrite:
+        table = TopKTable(output_path, mode="r+")
+        if (table.bundle_version != bundle_version or table.catalog_source != catalog_source
+                or table.top_k != top_k or not np.array_equal(table.article_ids, article_ids)):
+            raise ValueError(
+                f"{output_path} was built for a different bundle, catalog or top_k; pass overwrite=True to rebuild it"
+            )
+    if table is None:
+        table = TopKTable.create(output_path, article_ids, top_k, bundle_version, catalog_source=catalog_source)
+
+    pending = table.pending_items()
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    if verbose:
+        print(f"Precomputing top-{top_k} for {len(pending)}/{table.num_items} items "
+              f"in {len(chunks)} chunks with {workers} worker(s)...")
+
+    start_time = time.time()
+    done = 0
+    # Build the catalog cache once here instead of in every worker
+    ItemCatalog.from_csv(catalog_path, RULE_COLUMNS)
+    init_args = (model_dir, catalog_path, RULE_COLUMNS, top_k, output_path, model_kwargs,
+                 1 if workers > 1 else os.cpu_count() or 1)
+    if workers > 1:
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            for n in pool.imap_unordered(_compute_chunk, chunks):
+                done += n
+                if verbose:
+                    print(f"  {done}/{len(pending)} items ({time.time() - start_time:.1f}s)")
+    else:
+        _init_worker(*init_args)
+        for chunk in chunks:
+            done += _compute_chunk(chunk)
+            if verbose:
+                print(f"  {done}/{len(pending)} items ({time.time() - start_time:.1f}s)")
+        _worker.clear()
+
+    if verbose:
+        print(f"Top-K table written to {output_path} in {time.time() - start_time:.2f} seconds")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute top-K recommendations for all items")
+    parser.add_argument("--model-dir", default="backend/data/model_data")
+    parser.add_argument("--output", default=None, help=f"Table path (default: <model-dir>/{DEFAULT_TABLE_NAME})")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--hidden-channels", type=int, default=128)
+    parser.add_argument("--out-channels", type=int, default=64)
+    parser.add_argument("--overwrite", action="store_true", help="Rebuild instead of resuming an existing table")
+    parser.add_argument("--catalog", default=None,
+                        help="Catalog CSV for the pairing rules (default: item_metadata.csv next to --model-dir)")
+    args = parser.parse_args()
+
+    precompute_topk_table(
+        args.model_dir, args.output,
+        top_k=args.top_k,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        model_kwargs={"hidden_channels": args.hidden_channels, "out_channels": args.out_channels},
+        overwrite=args.overwrite,
+        catalog_path=args.catalog,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -81,21 +81,28 @@ class EnhancedFashionGAT(nn.Module):
         # Single attention layer for all attributes
         self.attr_attention = nn.Linear(hidden_channels, len(self.attr_types))
     
-    def forward(self, x_dict, edge_index_dict):
+    def forward(self, x_dict, edge_index_dict, node_ids=None):
         """
         Forward pass through the model
         
         Args:
             x_dict: Dictionary of node features for each node type
             edge_index_dict: Dictionary of edge indices for each edge type
+            node_ids: Optional dictionary of the full-graph indices of the nodes
+                of a sampled subgraph (see Sampling.py); edge_index_dict then
+                indexes into these nodes
             
         Returns:
-            Dictionary of node embeddings for each node type
+            Dictionary of node embeddings for each node type (for the subgraph's
+            nodes, in node_ids order, when node_ids is given)
         """
         # Initialize embeddings for each node type
         h_dict = {}
         for node_type in self.node_types:
-            h_dict[node_type] = self.node_embeddings[node_type].weight
+            if node_ids is None:
+                h_dict[node_type] = self.node_embeddings[node_type].weight
+            else:
+                h_dict[node_type] = self.node_embeddings[node_type](node_ids[node_type])
         
         # First GAT layer
         h_dict1 = {}
@@ -187,12 +194,37 @@ class EnhancedFashionGAT(nn.Module):
         Returns:
             Dictionary of importance scores for each attribute type, summing to 1
         """
-        # Get embeddings for items
-        emb1 = item_embeddings[item1_idx]
-        emb2 = item_embeddings[item2_idx]
+        normalized_scores = self.batch_compute_attribute_importance(
+            item1_idx, torch.tensor([item2_idx]), item_embeddings
+        )
         
-        # Concatenate embeddings
-        pair_emb = torch.cat([emb1, emb2], dim=0).unsqueeze(0)
+        # Convert to dictionary
+        attribute_scores = {
+            attr_type: score.item()
+            for attr_type, score in zip(self.attr_types, normalized_scores[0])
+        }
+        
+        return attribute_scores
+    
+    def batch_compute_attribute_importance(self, item_idx, candidate_indices, item_embeddings):
+        """
+        Compute attribute importance between one query item and many candidates at once.
+        
+        Args:
+            item_idx: Index of the query item
+            candidate_indices: 1-D tensor or list of candidate item indices
+            item_embeddings: Embeddings of all items
+            
+        Returns:
+            Tensor of shape (N, len(attr_types)) whose rows sum to 1, in attr_types order
+        """
+        if isinstance(candidate_indices, list):
+            candidate_indices = torch.tensor(candidate_indices, dtype=torch.long)
+        
+        # Pair the query embedding with every candidate embedding
+        emb2 = item_embeddings[candidate_indices]
+        emb1 = item_embeddings[item_idx].expand_as(emb2)
+        pair_emb = torch.cat([emb1, emb2], dim=1)
         
         # Pass through shared layer
         shared_features = self.attr_shared_layer(pair_emb)
@@ -201,20 +233,164 @@ class EnhancedFashionGAT(nn.Module):
         raw_scores = self.attr_attention(shared_features)
         
         # Apply softmax to get normalized scores
-        normalized_scores = F.softmax(raw_scores, dim=1)
+        return F.softmax(raw_scores, dim=1)
+
+class FactorizedScorer:
+    """
+    Fast path for EnhancedFashionGAT's scorer and attribute attention.
+    
+    The first Linear layer of both heads acts on cat([emb1, emb2]), so it splits
+    into W_a·emb1 + W_b·emb2. Both halves are projected for every item once, after
+    which scoring a query against N candidates is a broadcast add, the
+    non-linearity and a dot product, without building (N, 2*hidden) pair tensors.
+    Results match batch_predict_compatibility / compute_attribute_importance of
+    the model in eval mode up to float rounding.
+    """
+    def __init__(self, model, item_embeddings):
+        self.attr_types = list(model.attr_types)
+        dim = item_embeddings.size(1)
+        
+        with torch.no_grad():
+            first, last = [layer for layer in model.scorer if isinstance(layer, nn.Linear)]
+            self.query_proj = (item_embeddings @ first.weight[:, :dim].T + first.bias).contiguous()
+            self.candidate_proj = (item_embeddings @ first.weight[:, dim:].T).contiguous()
+            self.out_weight = last.weight[0].detach().clone()
+            self.out_bias = last.bias.detach().clone()
+            
+            shared = model.attr_shared_layer[0]
+            self.attr_query_proj = (item_embeddings @ shared.weight[:, :dim].T + shared.bias).contiguous()
+            self.attr_candidate_proj = (item_embeddings @ shared.weight[:, dim:].T).contiguous()
+            self.attr_weight = model.attr_attention.weight.detach().T.contiguous()
+            self.attr_bias = model.attr_attention.bias.detach().clone()
+    
+    # Tensors that fully describe the scorer (see tensors / from_tensors)
+    TENSOR_NAMES = (
+        'query_proj', 'candidate_proj', 'out_weight', 'out_bias',
+        'attr_query_proj', 'attr_candidate_proj', 'attr_weight', 'attr_bias'
+    )
+    
+    def tensors(self):
+        """Scorer state as a {name: tensor} dictionary"""
+        return {name: getattr(self, name) for name in self.TENSOR_NAMES}
+    
+    @classmethod
+    def from_tensors(cls, attr_types, tensors):
+        """
+        Rebuild a scorer from the output of tensors() without the model
         
-        # Convert to dictionary
-        attribute_scores = {
-            attr_type: score.item()
-            for attr_type, score in zip(self.attr_types, normalized_scores[0])
-        }
+        Args:
+            attr_types: Attribute types of the importance columns
+            tensors: Dictionary of {name: tensor} for every name in TENSOR_NAMES
+            
+        Returns:
+            FactorizedScorer instance
+        """
+        scorer = cls.__new__(cls)
+        scorer.attr_types = list(attr_types)
+        for name in cls.TENSOR_NAMES:
+            setattr(scorer, name, tensors[name])
+        return scorer
+    
+    def score(self, item_idx, candidate_indices):
+        """
+        Compatibility scores between one query item and a set of candidates
         
-        return attribute_scores
+        Args:
+            item_idx: Index of the query item
+            candidate_indices: 1-D tensor of candidate item indices
+            
+        Returns:
+            1-D tensor of scores between 0 and 1
+        """
+        hidden = torch.relu(self.query_proj[item_idx] + self.candidate_proj[candidate_indices])
+        return torch.sigmoid(hidden @ self.out_weight + self.out_bias)
+    
+    def score_matrix(self, item_indices, candidate_indices):
+        """
+        Compatibility scores between several query items and a set of candidates
+        
+        Args:
+            item_indices: 1-D tensor of query item indices
+            candidate_indices: 1-D tensor of candidate item indices
+            
+        Returns:
+            Tensor of shape (len(item_indices), len(candidate_indices)) with scores between 0 and 1
+        """
+        hidden = torch.relu(self.query_proj[item_indices][:, None, :] + self.candidate_proj[candidate_indices][None, :, :])
+        return torch.sigmoid(hidden @ self.out_weight + self.out_bias)
+    
+    def score_projections(self, item_idx, candidate_projections):
+        """
+        Compatibility logits between one query item and arbitrary points of the
+        candidate projection space (e.g. ANN cluster centroids)
+        
+        Args:
+            item_idx: Index of the query item
+            candidate_projections: Tensor of shape (N, hidden) in candidate_proj space
+        
+        Returns:
+            1-D tensor of logits (scores before the sigmoid)
+        """
+        hidden = torch.relu(self.query_proj[item_idx] + candidate_projections)
+        return hidden @ self.out_weight + self.out_bias
+    
+    def pair_attribute_importance(self, item_indices, candidate_indices):
+        """
+        Normalized attribute importance for pairs (item_indices[i], candidate_indices[i])
+        
+        Args:
+            item_indices: 1-D tensor of query item indices, or a single index
+                paired with every candidate
+            candidate_indices: 1-D tensor of candidate item indices, same length
+            
+        Returns:
+            Tensor of shape (N, len(attr_types)) whose rows sum to 1
+        """
+        shared_features = torch.tanh(self.attr_query_proj[item_indices] + self.attr_candidate_proj[candidate_indices])
+        return F.softmax(shared_features @ self.attr_weight + self.attr_bias, dim=1)
+    
+    def attribute_importance(self, item_idx, candidate_indices):
+        """
+        Normalized attribute importance between one query item and a set of candidates
+        
+        Args:
+            item_idx: Index of the query item
+            candidate_indices: 1-D tensor of candidate item indices
+            
+        Returns:
+            Tensor of shape (N, len(attr_types)) whose rows sum to 1
+        """
+        return self.pair_attribute_importance(item_idx, candidate_indices)
 
-def train_gat_model(model, pyg_graph, positive_pairs, negative_pairs, epochs=50, batch_size=128, verbose=True):
-    """Train the GAT model using positive and negative pairs"""
+def train_gat_model(model, pyg_graph, positive_pairs, negative_pairs, epochs=50, batch_size=128, verbose=True,
+                    num_neighbors=None, seed=None):
+    """
+    Train the GAT model using positive and negative pairs
+    
+    By default every batch runs the forward pass over the full graph. With
+    num_neighbors, each batch only runs it over the sampled incoming
+    neighborhoods of its items (see Sampling.py), so a batch costs time
+    proportional to its neighborhood instead of to the graph.
+    
+    Args:
+        model: EnhancedFashionGAT
+        pyg_graph: HeteroData graph
+        positive_pairs: Tensor of (item1_idx, item2_idx, score) rows
+        negative_pairs: Tensor of (item1_idx, item2_idx, score) rows
+        epochs: Maximum number of epochs (training stops early on a loss plateau)
+        batch_size: Number of pairs per optimizer step
+        verbose: Whether to print progress
+        num_neighbors: Incoming edges sampled per node at each hop, one entry per
+            GAT layer (-1 keeps all), e.g. Sampling.DEFAULT_NUM_NEIGHBORS;
+            None trains on the full graph
+        seed: Optional random seed of the neighbor sampling
+        
+    Returns:
+        The trained model
+    """
     import torch.optim as optim
     import time
+    from .Sampling import HeteroNeighborSampler
     
     device = torch.device('cpu')
     model = model.to(device)
@@ -234,8 +410,32 @@ def train_gat_model(model, pyg_graph, positive_pairs, negative_pairs, epochs=50,
     # Extract just the indices (first two columns)
     all_pairs = all_pairs[:, :2].long()
     
-    # Create optimizer
-    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    # Mini-batch mode: the neighbor sampler indexes the edges by destination once
+    sampler = None
+    generator = None
+    if num_neighbors is not None:
+        sampler = HeteroNeighborSampler(
+            edge_index_dict, {node_type: pyg_graph[node_type].num_nodes for node_type in pyg_graph.node_types},
+            num_neighbors
+        )
+        if seed is not None:
+            generator = torch.Generator().manual_seed(seed)
+    
+    # Create optimizer. Sampled batches only look up a few embedding rows, so in
+    # mini-batch mode the embedding tables get sparse gradients and SparseAdam
+    # updates just those rows instead of every row of every table
+    if sampler is None:
+        optimizers = [optim.Adam(model.parameters(), lr=0.001)]
+    else:
+        embedding_params = []
+        for embedding in model.node_embeddings.values():
+            embedding.sparse = True
+            embedding_params.append(embedding.weight)
+        embedding_param_ids = {id(param) for param in embedding_params}
+        optimizers = [
+            optim.SparseAdam(embedding_params, lr=0.001),
+            optim.Adam([param for param in model.parameters() if id(param) not in embedding_param_ids], lr=0.001)
+        ]
     
     # Training loop
     model.train()
@@ -247,65 +447,80 @@ def train_gat_model(model, pyg_graph, positive_pairs, negative_pairs, epochs=50,
         print("\nTraining GAT model...")
         print(f"Total pairs: {len(all_pairs)}")
         print(f"Batch size: {batch_size}")
+        if sampler is not None:
+            print(f"Neighbor sampling: {list(num_neighbors)} per hop")
         print(f"Number of epochs: {epochs}\n")
     
-    for epoch in range(epochs):
-        start_time = time.time()
-        total_loss = 0
-        num_batches = 0
-        
-        # Shuffle pairs for each epoch
-        indices = torch.randperm(len(all_pairs))
-        all_pairs_shuffled = all_pairs[indices]
-        all_scores_shuffled = all_scores[indices]
-        
-        # Process in batches
-        for i in range(0, len(all_pairs), batch_size):
-            batch_pairs = all_pairs_shuffled[i:i+batch_size]
-            batch_scores = all_scores_shuffled[i:i+batch_size]
-            
-            # Zero gradients
-            optimizer.zero_grad()
+    try:
+        for epoch in range(epochs):
+            start_time = time.time()
+            total_loss = 0
+            num_batches = 0
             
-            # Forward pass
-            node_embeddings = model(x_dict, edge_index_dict)
-            item_embeddings = node_embeddings['item']
+            # Shuffle pairs for each epoch
+            indices = torch.randperm(len(all_pairs))
+            all_pairs_shuffled = all_pairs[indices]
+            all_scores_shuffled = all_scores[indices]
             
-            # Get predictions for batch
-            pred_scores = model.batch_predict_compatibility(
-                batch_pairs[:, 0],
-                batch_pairs[:, 1],
-                item_embeddings
-            )
+            # Process in batches
+            for i in range(0, len(all_pairs), batch_size):
+                batch_pairs = all_pairs_shuffled[i:i+batch_size]
+                batch_scores = all_scores_shuffled[i:i+batch_size]
+                
+                # Zero gradients
+                for optimizer in optimizers:
+                    optimizer.zero_grad()
+                
+                # Forward pass, over the batch items' sampled neighborhoods in mini-batch mode
+                if sampler is None:
+                    node_embeddings = model(x_dict, edge_index_dict)
+                else:
+                    subgraph = sampler.sample({'item': batch_pairs.reshape(-1)}, generator=generator)
+                    node_embeddings = model(x_dict, subgraph.edge_index_dict, node_ids=subgraph.node_ids)
+                    batch_pairs = subgraph.local_index('item', batch_pairs)
+                item_embeddings = node_embeddings['item']
+                
+                # Get predictions for batch
+                pred_scores = model.batch_predict_compatibility(
+                    batch_pairs[:, 0],
+                    batch_pairs[:, 1],
+                    item_embeddings
+                )
+                
+                # Compute loss using MSE since we now have continuous scores
+                loss = torch.nn.functional.mse_loss(pred_scores, batch_scores)
+                
+                # Backward pass
+                loss.backward()
+                for optimizer in optimizers:
+                    optimizer.step()
+                
+                total_loss += loss.item()
+                num_batches += 1
             
-            # Compute loss using MSE since we now have continuous scores
-            loss = torch.nn.functional.mse_loss(pred_scores, batch_scores)
+            # Compute average loss for epoch
+            avg_loss = total_loss / num_batches
+            epoch_time = time.time() - start_time
             
-            # Backward pass
-            loss.backward()
-            optimizer.step()
+            if verbose and (epoch + 1) % 5 == 0:
+                print(f"Epoch {epoch+1}/{epochs}, Loss: {avg_loss:.4f}, Time: {epoch_time:.2f}s")
             
-            total_loss += loss.item()
-            num_batches += 1
-        
-        # Compute average loss for epoch
-        avg_loss = total_loss / num_batches
-        epoch_time = time.time() - start_time
-        
-        if verbose and (epoch + 1) % 5 == 0:
-            print(f"Epoch {epoch+1}/{epochs}, Loss: {avg_loss:.4f}, Time: {epoch_time:.2f}s")
-        
-        # Early stopping
-        if avg_loss < best_loss:
-            best_loss = avg_loss
-            patience_counter = 0
-        else:
-            patience_counter += 1
-            
-        if patience_counter >= patience:
-            if verbose:
-                print(f"\nEarly stopping at epoch {epoch+1}")
-            break
+            # Early stopping
+            if avg_loss < best_loss:
+                best_loss = avg_loss
+                patience_counter = 0
+            else:
+                patience_counter += 1
+                
+            if patience_counter >= patience:
+                if verbose:
+                    print(f"\nEarly stopping at epoch {epoch+1}")
+                break
+    finally:
+        # Later full-graph use reads the tables directly; lookups go back to dense
+        # gradients, also when training stops with an exception
+        for embedding in model.node_embeddings.values():
+            embedding.sparse = False
     
     if verbose:
         print("\nTraining completed!")
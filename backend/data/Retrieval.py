@@ -0,0 +1,232 @@
+"""
+Approximate candidate retrieval in front of the exact scorer.
+
+The compatibility scorer is an MLP over query_proj[q] + candidate_proj[c]
+(see FactorizedScorer), so it can't be searched with an inner-product index.
+Instead, IVFIndex clusters the items' candidate projections (a linear map of
+the GAT item embeddings) with k-means. Since the score is smooth in the
+candidate projection, items in a cluster score close to its centroid. A query
+therefore scores every centroid with the exact MLP, probes clusters from the
+best centroid down until enough rule-compatible items are collected, and only
+those candidates are reranked exactly. The pairing rules are only evaluated
+for the items of the probed clusters, so query cost depends on the number of
+centroids and probed items rather than on the catalog size.
+
+recall_at_k measures the overlap of the approximate top-k with exhaustive
+scoring on a sample of query items.
+"""
+import time
+
+import numpy as np
+import torch
+
+from .Enhancement import rank_compatible_items, retrieve_candidates
+
+
+class IVFIndex:
+    """
+    Inverted-file index over item candidate projections.
+
+    Item node indices are stored grouped by cluster (item_order), with
+    CSR-style offsets per cluster, so the index is three plain arrays that
+    can be stored in and mapped from a model bundle.
+    """
+    # Arrays that fully describe the index (see arrays / from_arrays)
+    ARRAY_NAMES = ("centroids", "offsets", "item_order")
+
+    def __init__(self, centroids, offsets, item_order):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.item_order = item_order
+        self._centroid_tensor = torch.from_numpy(np.ascontiguousarray(centroids))
+
+    @property
+    def num_lists(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.item_order)
+
+    @classmethod
+    def build(cls, vectors, num_lists=None, iterations=20, max_training_points=256, seed=0):
+        """
+        Cluster vectors with k-means and index them.
+
+        Args:
+            vectors: Array of shape (num_items, dim), row i for item node index i
+            num_lists: Number of clusters (default: about sqrt(num_items))
+            iterations: Number of k-means iterations
+            max_training_points: Cap on training points per cluster (the rest
+                are only assigned to their nearest centroid)
+            seed: Random seed of the initialization and the training sample
+
+        Returns:
+            IVFIndex
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        num_items = len(vectors)
+        num_lists = max(1, min(num_items, num_lists or int(round(np.sqrt(num_items)))))
+        rng = np.random.default_rng(seed)
+
+        training = vectors
+        if num_items > num_lists * max_training_points:
+            training = vectors[rng.choice(num_items, num_lists * max_training_points, replace=False)]
+        centroids = training[rng.choice(len(training), num_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = _nearest_centroids(training, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, training)
+            counts = np.bincount(assignments, minlength=num_lists)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Restart empty clusters on random training points
+            if not filled.all():
+                centroids[~filled] = training[rng.choice(len(training), int((~filled).sum()), replace=False)]
+
+        assignments = _nearest_centroids(vectors, centroids)
+        item_order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.zeros(num_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignments, minlength=num_lists))
+        return cls(centroids, offsets, item_order)
+
+    def arrays(self):
+        """Index state as a {name: array} dictionary (see from_arrays)"""
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(*(arrays[name] for name in cls.ARRAY_NAMES))
+
+    def candidates(self, scorer, item_idx, item_rules, num_candidates):
+        """
+        Rule-compatible candidates for a query item from the best-scoring clusters.
+
+        Clusters are probed from the best centroid down, in blocks of doubling
+        size, and the pairing rules are only evaluated for the items of probed
+        clusters. Probing stops at the first cluster that brings the number of
+        compatible items to num_candidates.
+
+        Args:
+            scorer: FactorizedScorer whose candidate projections were indexed
+            item_idx: Node index of the query item
+            item_rules: ItemRuleArrays for candidate filtering
+            num_candidates: Number of compatible candidates to collect (at least)
+
+        Returns:
+            Sorted array of candidate item node indices
+        """
+        with torch.no_grad():
+            centroid_scores = scorer.score_projections(item_idx, self._centroid_tensor).numpy()
+        cluster_order = np.argsort(-centroid_scores, kind="stable")
+
+        found = []
+        num_found = 0
+        start, block = 0, 1
+        while start < len(cluster_order):
+            clusters = cluster_order[start:start + block]
+            sizes = self.offsets[clusters + 1] - self.offsets[clusters]
+            items = self.item_order[_concat_ranges(self.offsets[clusters], sizes)]
+            compatible = item_rules.compatible(item_idx, items)
+
+            # Keep the clusters of this block up to the one reaching num_candidates
+            counts = np.bincount(np.repeat(np.arange(len(clusters)), sizes)[compatible], minlength=len(clusters))
+            kept = np.searchsorted(np.cumsum(counts), num_candidates - num_found) + 1
+            if kept < len(clusters):
+                end = int(sizes[:kept].sum())
+                items, compatible = items[:end], compatible[:end]
+            found.append(items[compatible])
+            num_found += int(np.count_nonzero(compatible))
+            if kept <= len(clusters):
+                break
+            start += block
+            block *= 2
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(found))
+
+
+def _concat_ranges(starts, sizes):
+    """Concatenation of arange(start, start + size) for every start and size"""
+    ends = np.cumsum(sizes)
+    return np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - sizes), sizes)
+
+
+def _nearest_centroids(vectors, centroids, batch_size=8192):
+    """Index of the nearest centroid (squared L2) of every vector"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        distances = centroid_norms[None, :] - 2.0 * (batch @ centroids.T)
+        assignments[start:start + batch_size] = distances.argmin(axis=1)
+    return assignments
+
+
+def build_ivf_index(scorer, num_lists=None, iterations=20, seed=0, verbose=True):
+    """
+    Build an IVFIndex over a scorer's candidate projections.
+
+    Args:
+        scorer: FactorizedScorer
+        num_lists: Number of clusters (default: about sqrt(num_items))
+        iterations: Number of k-means iterations
+        seed: Random seed
+        verbose: Whether to print progress
+
+    Returns:
+        IVFIndex
+    """
+    start_time = time.time()
+    index = IVFIndex.build(scorer.candidate_proj.numpy(), num_lists=num_lists, iterations=iterations, seed=seed)
+    if verbose:
+        print(f"ANN index with {index.num_lists} lists over {len(index)} items built in "
+              f"{time.time() - start_time:.2f} seconds")
+    return index
+
+
+def recall_at_k(index, item_rules, scorer, top_k=50, num_candidates=2000, sample_size=200, seed=0):
+    """
+    Recall@k of two-stage retrieval against exhaustive scoring.
+
+    Args:
+        index: IVFIndex
+        item_rules: ItemRuleArrays for candidate filtering
+        scorer: FactorizedScorer
+        top_k: Number of recommendations compared per query
+        num_candidates: Candidates retrieved per query
+        sample_size: Number of random query items
+        seed: Random seed of the query sample
+
+    Returns:
+        Dictionary with the mean recall, the mean number of reranked candidates
+        and the per-query timings of both stages
+    """
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(item_rules), min(sample_size, len(item_rules)), replace=False)
+    recalls = []
+    exact_time = approximate_time = 0.0
+    reranked = 0
+    for item_idx in queries.tolist():
+        start_time = time.perf_counter()
+        exact, _, _ = rank_compatible_items(item_idx, item_rules, scorer, top_k, with_importance=False)
+        exact_time += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        approximate, _, _ = rank_compatible_items(item_idx, item_rules, scorer, top_k, with_importance=False,
+                                                  ann_index=index, num_candidates=num_candidates)
+        approximate_time += time.perf_counter() - start_time
+
+        reranked += len(retrieve_candidates(item_idx, item_rules, scorer, index, num_candidates))
+        if len(exact):
+            recalls.append(len(np.intersect1d(exact, approximate)) / len(exact))
+
+    return {
+        "top_k": top_k,
+        "num_candidates": num_candidates,
+        "queries": len(queries),
+        "recall_at_k": float(np.mean(recalls)) if recalls else 1.0,
+        "mean_reranked": reranked / max(len(queries), 1),
+        "exact_ms_per_query": 1000 * exact_time / max(len(queries), 1),
+        "ann_ms_per_query": 1000 * approximate_time / max(len(queries), 1),
+    }
@@ -0,0 +1,143 @@
+"""
+Neighbor sampling over the heterogeneous fashion graph for mini-batch training.
+
+Each GAT layer of EnhancedFashionGAT aggregates messages along edges into
+their destination nodes, so the embedding of a node after k layers depends
+only on its k-hop incoming neighborhood. HeteroNeighborSampler collects that
+neighborhood for the items of a training batch, keeping at most a fixed
+number of incoming edges per node and hop, and relabels it into a small
+subgraph the model can run on (see EnhancedFashionGAT.forward's node_ids).
+
+The sampler only needs the edge indices. PyG's NeighborLoader does the same
+but requires the pyg-lib or torch-sparse extensions.
+"""
+import torch
+
+# Incoming edges kept per node at each hop, one entry per GAT layer (-1 keeps all)
+DEFAULT_NUM_NEIGHBORS = (10, 10)
+
+
+class SampledSubgraph:
+    """
+    Relabelled k-hop neighborhood of a set of seed nodes.
+
+    node_ids[node_type] holds the sorted global indices of the sampled nodes;
+    position i of a node type's embeddings in the subgraph is node
+    node_ids[node_type][i] of the full graph.
+    """
+    def __init__(self, node_ids, edge_index_dict):
+        self.node_ids = node_ids
+        self.edge_index_dict = edge_index_dict
+
+    def local_index(self, node_type, global_ids):
+        """Subgraph positions of sampled nodes given their full-graph indices"""
+        return torch.searchsorted(self.node_ids[node_type], global_ids)
+
+    def num_nodes(self):
+        return sum(len(ids) for ids in self.node_ids.values())
+
+    def num_edges(self):
+        return sum(edge_index.size(1) for edge_index in self.edge_index_dict.values())
+
+
+class HeteroNeighborSampler:
+    """
+    Samples k-hop incoming neighborhoods from a heterogeneous edge index dictionary.
+
+    Edges are sorted by destination once (CSC), so sampling a batch costs time
+    proportional to the sampled neighborhood rather than to the graph.
+    """
+    def __init__(self, edge_index_dict, num_nodes_dict, num_neighbors=DEFAULT_NUM_NEIGHBORS):
+        """
+        Args:
+            edge_index_dict: {(src, relation, dst): edge_index of shape (2, num_edges)}
+            num_nodes_dict: {node_type: number of nodes}
+            num_neighbors: Incoming edges kept per node at each hop (-1 keeps all);
+                its length is the number of hops
+        """
+        self.num_neighbors = list(num_neighbors)
+        self.node_types = list(num_nodes_dict)
+        self._csc = {}
+        for edge_type, edge_index in edge_index_dict.items():
+            dst_type = edge_type[2]
+            order = torch.argsort(edge_index[1], stable=True)
+            counts = torch.bincount(edge_index[1], minlength=num_nodes_dict[dst_type])
+            rowptr = torch.zeros(len(counts) + 1, dtype=torch.long)
+            rowptr[1:] = torch.cumsum(counts, dim=0)
+            self._csc[edge_type] = (rowptr, edge_index[0, order], edge_index[1, order])
+
+    def _sample_edges(self, edge_type, frontier, fanout, generator):
+        """Positions (in CSC order) of up to fanout incoming edges of each frontier node"""
+        rowptr = self._csc[edge_type][0]
+        starts = rowptr[frontier]
+        counts = rowptr[frontier + 1] - starts
+        if counts.sum() == 0:
+            return torch.zeros(0, dtype=torch.long)
+
+        group = torch.repeat_interleave(torch.arange(len(frontier)), counts)
+        group_starts = torch.cumsum(counts, dim=0) - counts
+        offsets = torch.arange(len(group)) - group_starts[group]
+        if fanout >= 0 and bool((counts > fanout).any()):
+            # Random order within each node's edges, then keep the first fanout
+            keys = torch.rand(len(group), generator=generator) + group.to(torch.float64)
+            shuffled = torch.argsort(keys)
+            group = group[shuffled]
+            offsets = offsets[shuffled]
+            keep = (torch.arange(len(group)) - group_starts[group]) < fanout
+            group = group[keep]
+            offsets = offsets[keep]
+        return starts[group] + offsets
+
+    def sample(self, seeds, generator=None):
+        """
+        Sample the neighborhood of seed nodes.
+
+        Args:
+            seeds: {node_type: tensor of full-graph node indices} (duplicates allowed)
+            generator: Optional torch.Generator for the neighbor choice
+
+        Returns:
+            SampledSubgraph with an edge index (possibly empty) for every edge type
+        """
+        visited = {node_type: ids.unique() for node_type, ids in seeds.items()}
+        frontier = dict(visited)
+        sampled = {edge_type: [] for edge_type in self._csc}
+
+        for fanout in self.num_neighbors:
+            reached = {}
+            for edge_type, (_, src, dst) in self._csc.items():
+                src_type, _, dst_type = edge_type
+                if dst_type not in frontier or len(frontier[dst_type]) == 0:
+                    continue
+                positions = self._sample_edges(edge_type, frontier[dst_type], fanout, generator)
+                if len(positions) == 0:
+                    continue
+                sampled[edge_type].append(torch.stack([src[positions], dst[positions]]))
+                reached.setdefault(src_type, []).append(src[positions])
+
+            # Only nodes seen for the first time are expanded at the next hop
+            frontier = {}
+            for node_type, parts in reached.items():
+                nodes = torch.cat(parts).unique()
+                if node_type in visited:
+                    nodes = nodes[~torch.isin(nodes, visited[node_type])]
+                    visited[node_type] = torch.cat([visited[node_type], nodes]).sort().values
+                else:
+                    visited[node_type] = nodes
+                frontier[node_type] = nodes
+
+        node_ids = {
+            node_type: visited.get(node_type, torch.zeros(0, dtype=torch.long)) for node_type in self.node_types
+        }
+        edge_index_dict = {}
+        for edge_type, parts in sampled.items():
+            src_type, _, dst_type = edge_type
+            if not parts:
+                edge_index_dict[edge_type] = torch.zeros((2, 0), dtype=torch.long)
+                continue
+            edges = torch.cat(parts, dim=1)
+            edge_index_dict[edge_type] = torch.stack([
+                torch.searchsorted(node_ids[src_type], edges[0]),
+                torch.searchsorted(node_ids[dst_type], edges[1]),
+            ])
+        return SampledSubgraph(node_ids, edge_index_dict)
@@ -0,0 +1,467 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import torch
+
+from .Recommender import FactorizedScorer
+
+
+# Files whose contents determine the served embeddings
+BUNDLE_FILES = ("gat_model.pt", "pyg_graph.pt", "node_mapping.pkl")
+
+# Gender groups that must not be paired with each other (ladies and men);
+# any other group (e.g. divided) pairs with everything
+EXCLUSIVE_GENDER_GROUPS = (1, 2)
+
+# Product group pairs that are never recommended together
+INCOMPATIBLE_GROUPS = [
+    ("Garment Full body", "Garment Upper body"),
+    ("Garment Full body", "Garment Lower body"),
+    ("Garment Upper body", "Garment Full body"),
+    ("Garment Lower body", "Garment Full body")
+]
+
+
+def model_bundle_version(model_dir):
+    """
+    Compute a cheap version token for a saved model directory.
+
+    The token is derived from the size and modification time of the bundle
+    files, so it changes whenever the model or graph is re-saved.
+
+    Args:
+        model_dir: Directory produced by save_model_and_data
+
+    Returns:
+        Hex digest identifying the current bundle contents
+    """
+    digest = hashlib.sha1()
+    for name in BUNDLE_FILES:
+        path = os.path.join(model_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            digest.update(f"{name}:missing".encode())
+            continue
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def compute_node_embeddings(model, pyg_graph, device=None):
+    """
+    Run a single full-graph forward pass and return the node embeddings.
+
+    Args:
+        model: Trained EnhancedFashionGAT model
+        pyg_graph: PyTorch Geometric heterogeneous graph
+        device: Device to run on (defaults to CPU)
+
+    Returns:
+        Dictionary of node embeddings for each node type
+    """
+    device = device or torch.device('cpu')
+    model = model.to(device)
+    model.eval()
+    with torch.no_grad():
+        x_dict = {node_type: data.x.to(device) for node_type, data in pyg_graph.items()}
+        edge_index_dict = {
+            edge_type: data.edge_index.to(device)
+            for edge_type, data in pyg_graph.items()
+            if hasattr(data, 'edge_index')
+        }
+        return model(x_dict, edge_index_dict)
+
+
+class EmbeddingStore:
+    """
+    Item embeddings computed once per model bundle and shared by all requests.
+
+    The GAT output depends only on the model weights and the graph, so the
+    forward pass is run when the bundle is loaded and the resulting matrix is
+    kept as a contiguous, detached tensor, together with the per-item scorer
+    projections derived from it. The store is only recomputed when it is
+    refreshed with a different bundle version.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._item_embeddings = None
+        self._scorer = None
+        self._version = None
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def is_ready(self):
+        return self._item_embeddings is not None
+
+    @property
+    def item_embeddings(self):
+        """Item embedding matrix of shape (num_items, dim). Treat as read-only."""
+        return self._item_embeddings
+
+    @property
+    def scorer(self):
+        """FactorizedScorer for the cached embeddings"""
+        return self._scorer
+
+    def refresh(self, model, pyg_graph, version):
+        """
+        Fill the store for the given bundle version.
+
+        Args:
+            model: Trained EnhancedFashionGAT model
+            pyg_graph: PyTorch Geometric graph the model was trained on
+            version: Bundle version token (see model_bundle_version)
+
+        Returns:
+            True if embeddings were recomputed, False if the cached ones were kept
+        """
+        with self._lock:
+            if self._item_embeddings is not None and self._version == version:
+                return False
+            node_embeddings = compute_node_embeddings(model, pyg_graph)
+            item_embeddings = node_embeddings['item'].detach().contiguous()
+            item_embeddings.requires_grad_(False)
+            self._item_embeddings = item_embeddings
+            self._scorer = FactorizedScorer(model, item_embeddings)
+            self._version = version
+            return True
+
+    def attach(self, item_embeddings, scorer, version):
+        """
+        Serve precomputed embeddings and scorer (e.g. mapped from shared artifacts)
+        instead of running the forward pass.
+
+        Args:
+            item_embeddings: Item embedding matrix of shape (num_items, dim)
+            scorer: FactorizedScorer matching item_embeddings
+            version: Bundle version token the arrays were computed for
+        """
+        with self._lock:
+            self._item_embeddings = item_embeddings
+            self._scorer = scorer
+            self._version = version
+
+    def invalidate(self):
+        """Drop the cached embeddings (e.g. when the model bundle is unloaded)"""
+        with self._lock:
+            self._item_embeddings = None
+            self._scorer = None
+            self._version = None
+
+
+def item_article_ids(node_mapping):
+    """Article id of every item node, in node index order"""
+    item_mapping = node_mapping['item']
+    article_ids = np.zeros(len(item_mapping), dtype=np.int64)
+    for node_name, idx in item_mapping.items():
+        article_ids[idx] = int(node_name.split('_')[1])
+    return article_ids
+
+
+class ItemRuleArrays:
+    """
+    Columnar item attributes used by the pairing rules, indexed by item node index.
+
+    Product groups are integer coded (-1 for unknown/NaN) so that the gender,
+    incompatible product group and same group rules can be evaluated for the
+    whole catalog as boolean masks instead of per-item DataFrame lookups.
+    """
+    def __init__(self, article_ids, gender_groups, product_group_codes, product_groups):
+        self.article_ids = article_ids
+        self.gender_groups = gender_groups
+        self.product_group_codes = product_group_codes
+        self.product_groups = product_groups
+        self._group_lookup = {name: code for code, name in enumerate(product_groups)}
+
+        # incompatible[a, b] is True when group a must not be paired with group b
+        num_groups = len(product_groups)
+        self._incompatible = np.zeros((num_groups + 1, num_groups + 1), dtype=bool)
+        for group1, group2 in INCOMPATIBLE_GROUPS:
+            if group1 in self._group_lookup and group2 in self._group_lookup:
+                self._incompatible[self._group_lookup[group1], self._group_lookup[group2]] = True
+
+    def __len__(self):
+        return len(self.article_ids)
+
+    @classmethod
+    def from_data(cls, node_mapping, fashion_data, fashion_graph=None):
+        """
+        Build the rule arrays from the node mapping and a fashion dataframe.
+
+        Args:
+            node_mapping: Mapping between node names and indices
+            fashion_data: Original fashion dataframe
+            fashion_graph: NetworkX graph used as fallback (optional)
+
+        Returns:
+            ItemRuleArrays instance
+        """
+        from .Catalog import as_item_catalog
+
+        return cls.from_catalog(node_mapping, as_item_catalog(fashion_data), fashion_graph)
+
+    @classmethod
+    def from_catalog(cls, node_mapping, catalog, fashion_graph=None):
+        """
+        Build the rule arrays once from the node mapping and item catalog.
+
+        Items missing from the catalog (and every item, for a rule column the
+        catalog doesn't have) fall back to the attributes stored on the
+        corresponding fashion_graph node, as in get_enhanced_recommendations.
+
+        Args:
+            node_mapping: Mapping between node names and indices
+            catalog: ItemCatalog with product_group_name and index_group_no columns
+            fashion_graph: NetworkX graph used as fallback (optional)
+
+        Returns:
+            ItemRuleArrays instance
+        """
+        import pandas as pd
+
+        article_ids = item_article_ids(node_mapping)
+        num_items = len(article_ids)
+        rows = catalog.rows(article_ids)
+        found = rows >= 0
+
+        # Empty catalog values are unknown, like NaN in the fashion dataframe
+        product_group_names = np.full(num_items, None, dtype=object)
+        gender_groups = np.zeros(num_items, dtype=np.int64)
+        group_from_graph = np.ones(num_items, dtype=bool)
+        gender_from_graph = np.ones(num_items, dtype=bool)
+        if 'product_group_name' in catalog.columns:
+            product_group_names[:] = [value or None for value in catalog.take('product_group_name', rows)]
+            group_from_graph = ~found
+        if 'index_group_no' in catalog.columns:
+            gender_groups[:] = [int(float(value)) if value else 0 for value in catalog.take('index_group_no', rows)]
+            gender_from_graph = ~found
+
+        if fashion_graph is not None:
+            for idx in np.flatnonzero(group_from_graph | gender_from_graph):
+                node = fashion_graph.nodes.get(f"item_{article_ids[idx]}", {})
+                if group_from_graph[idx]:
+                    product_group_names[idx] = node.get('product_group', 'Unknown')
+                if gender_from_graph[idx]:
+                    gender_groups[idx] = node.get('gender_group', 0)
+
+        product_group_codes, product_groups = pd.factorize(pd.Series(product_group_names, dtype=object))
+        return cls(
+            article_ids=article_ids,
+            gender_groups=gender_groups,
+            product_group_codes=product_group_codes.astype(np.int32),
+            product_groups=list(product_groups)
+        )
+
+    def compatible_mask(self, item_idx):
+        """
+        Evaluate the pairing rules for one query item against every item.
+
+        Args:
+            item_idx: Node index of the query item
+
+        Returns:
+            Tuple of (boolean mask over item indices, filter statistics dict).
+            The query item itself is always excluded.
+        """
+        gender = self.gender_groups[item_idx]
+        group = self.product_group_codes[item_idx]
+
+        # Ladies and men items are never paired with each other
+        gender_ok = np.ones(len(self), dtype=bool)
+        if gender in EXCLUSIVE_GENDER_GROUPS:
+            gender_ok = (self.gender_groups == gender) | ~np.isin(self.gender_groups, EXCLUSIVE_GENDER_GROUPS)
+        gender_ok[item_idx] = False
+
+        # Incompatible product groups (unknown groups map to the last row/column)
+        incompatible = self._incompatible[group][self.product_group_codes]
+        group_ok = gender_ok & ~incompatible
+
+        # Never recommend items from the same product group
+        same_group = (self.product_group_codes == group) if group >= 0 else np.zeros(len(self), dtype=bool)
+        mask = group_ok & ~same_group
+
+        stats = {
+            'gender': int(len(self) - 1 - np.count_nonzero(gender_ok)),
+            'product_group': int(np.count_nonzero(gender_ok & incompatible)),
+            'same_group': int(np.count_nonzero(group_ok & same_group))
+        }
+        return mask, stats
+
+    def compatible(self, item_idx, candidate_indices):
+        """
+        Evaluate the pairing rules for one query item against some items only.
+
+        Args:
+            item_idx: Node index of the query item
+            candidate_indices: Array of item node indices to check
+
+        Returns:
+            Boolean array, compatible_mask(item_idx)[0][candidate_indices]
+        """
+        gender = self.gender_groups[item_idx]
+        group = self.product_group_codes[item_idx]
+        genders = self.gender_groups[candidate_indices]
+        groups = self.product_group_codes[candidate_indices]
+
+        ok = candidate_indices != item_idx
+        if gender in EXCLUSIVE_GENDER_GROUPS:
+            ok &= (genders == gender) | ~np.isin(genders, EXCLUSIVE_GENDER_GROUPS)
+        ok &= ~self._incompatible[group][groups]
+        if group >= 0:
+            ok &= groups != group
+        return ok
+
+
+def _attribute_value_name(val_node):
+    """Strip the "val_<attr>_" prefix from a value node name, as get_item_attributes does"""
+    val_parts = val_node.split('_')
+    if len(val_parts) > 2:
+        return '_'.join(val_parts[2:])
+    return val_parts[-1]
+
+
+class ItemAttributeTable:
+    """
+    Compact per-item attribute table extracted once from the fashion graph.
+
+    Single-valued attributes are stored as integer codes (-1 when missing) into
+    a per-attribute vocabulary; the multi-valued fabric attribute is stored as
+    CSR-style offsets into a flat array of fabric codes. attributes() returns
+    exactly what get_item_attributes would return for the same item, but with a
+    few array lookups instead of graph neighbor walks.
+    """
+    # Single-valued attributes, in get_item_attributes order (fabric goes after appearance)
+    CATEGORICAL = ['product_type', 'color_value', 'color_master', 'appearance', 'sleeve', 'length', 'neckline']
+
+    def __init__(self, article_ids, codes, vocab, fabric_offsets, fabric_codes, fabric_vocab, index=None):
+        self.article_ids = article_ids
+        self.codes = codes
+        self.vocab = vocab
+        self.fabric_offsets = fabric_offsets
+        self.fabric_codes = fabric_codes
+        self.fabric_vocab = fabric_vocab
+        # Any {article_id: idx} mapping with get(), e.g. a shared ArticleIndex
+        if index is None:
+            index = {int(article_id): idx for idx, article_id in enumerate(article_ids)}
+        self._index = index
+
+    def __len__(self):
+        return len(self.article_ids)
+
+    @classmethod
+    def from_graph(cls, fashion_graph, node_mapping):
+        """
+        Extract the attributes of every item in node_mapping['item'] from the graph.
+
+        The value reached through an attribute node does not depend on the item,
+        so it is resolved once per attribute node and reused.
+
+        Args:
+            fashion_graph: NetworkX graph
+            node_mapping: Mapping between node names and indices
+
+        Returns:
+            ItemAttributeTable instance
+        """
+        item_mapping = node_mapping['item']
+        num_items = len(item_mapping)
+        article_ids = np.zeros(num_items, dtype=np.int64)
+        codes = {attr: np.full(num_items, -1, dtype=np.int32) for attr in cls.CATEGORICAL}
+        vocab = {attr: [] for attr in cls.CATEGORICAL}
+        lookup = {attr: {} for attr in cls.CATEGORICAL}
+        fabric_vocab, fabric_lookup = [], {}
+        fabric_lists = [None] * num_items
+        first_value = {}
+        fabric_values = {}
+
+        def resolve_value(attr_node, attr_prefix):
+            key = (attr_node, attr_prefix)
+            if key not in first_value:
+                first_value[key] = None
+                for val_node in fashion_graph.neighbors(attr_node):
+                    if val_node.startswith(f"val_{attr_prefix}"):
+                        first_value[key] = _attribute_value_name(val_node)
+                        break
+            return first_value[key]
+
+        def resolve_fabrics(attr_node):
+            if attr_node not in fabric_values:
+                fabric_values[attr_node] = [
+                    _attribute_value_name(val_node)
+                    for val_node in fashion_graph.neighbors(attr_node)
+                    if val_node.startswith("val_fabric_")
+                ]
+            return fabric_values[attr_node]
+
+        for item_node, idx in item_mapping.items():
+            article_ids[idx] = int(item_node.split('_')[1])
+            if item_node not in fashion_graph:
+                fabric_lists[idx] = []
+                continue
+            neighbors = list(fashion_graph.neighbors(item_node))
+
+            for attr in cls.CATEGORICAL:
+                value = None
+                for neighbor in neighbors:
+                    if neighbor.startswith(f"attr_{attr}"):
+                        value = resolve_value(neighbor, attr)
+                        if value is not None:
+                            break
+                if value:
+                    if value not in lookup[attr]:
+                        lookup[attr][value] = len(vocab[attr])
+                        vocab[attr].append(value)
+                    codes[attr][idx] = lookup[attr][value]
+
+            fabrics = []
+            for neighbor in neighbors:
+                if neighbor.startswith("attr_fabric_"):
+                    for fabric in resolve_fabrics(neighbor):
+                        if fabric and fabric not in fabrics:
+                            fabrics.append(fabric)
+            for fabric in fabrics:
+                if fabric not in fabric_lookup:
+                    fabric_lookup[fabric] = len(fabric_vocab)
+                    fabric_vocab.append(fabric)
+            fabric_lists[idx] = [fabric_lookup[fabric] for fabric in fabrics]
+
+        fabric_offsets = np.zeros(num_items + 1, dtype=np.int64)
+        fabric_offsets[1:] = np.cumsum([len(fabrics) for fabrics in fabric_lists])
+        fabric_codes = np.fromiter(
+            (code for fabrics in fabric_lists for code in fabrics), dtype=np.int32, count=int(fabric_offsets[-1])
+        )
+        return cls(article_ids, codes, vocab, fabric_offsets, fabric_codes, fabric_vocab)
+
+    def attributes(self, item_idx):
+        """
+        Attributes of one item, in the format returned by get_item_attributes.
+
+        Args:
+            item_idx: Item node index
+
+        Returns:
+            Dictionary of attribute name -> value (fabric is a list); missing
+            attributes are omitted
+        """
+        attrs = {}
+        for attr in self.CATEGORICAL:
+            code = self.codes[attr][item_idx]
+            if code >= 0:
+                attrs[attr] = self.vocab[attr][code]
+            if attr == 'appearance':
+                start, end = self.fabric_offsets[item_idx], self.fabric_offsets[item_idx + 1]
+                if end > start:
+                    attrs['fabric'] = [self.fabric_vocab[code] for code in self.fabric_codes[start:end]]
+        return attrs
+
+    def get(self, article_id):
+        """Attributes of an item by article ID, or None if it is not in the table"""
+        idx = self._index.get(int(article_id))
+        if idx is None:
+            return None
+        return self.attributes(idx)
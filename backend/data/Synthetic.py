@@ -0,0 +1,433 @@
+"""
+Synthetic fashion data for benchmarks without the private model_data.
+
+generate_item_metadata builds an item_metadata.csv-like dataframe with the
+column cardinalities of the H&M catalog and skewed (Zipf-like) value
+frequencies; variants of a product share everything but their colour.
+build_fashion_graph and build_pyg_graph turn it into the networkx graph, PyG
+HeteroData and node_mapping with the node naming of the saved model directory
+(item_<article_id>, attr_<type>_<code>, val_<type>_<value>, one fabric node per
+detected_fabrics string and single sleeve/length/neckline attribute nodes).
+write_synthetic_model_dir saves everything in the layout the server expects:
+
+    <root>/data/item_metadata.csv
+    <root>/data/model_data/{gat_model.pt, pyg_graph.pt, fashion_graph.pkl, node_mapping.pkl, full_data.csv}
+
+Usage (from the project root):
+    python -m backend.data.Synthetic --items 10000 --output /tmp/synthetic
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Product group -> product types, with the group frequencies of the H&M catalog
+PRODUCT_GROUPS = {
+    "Garment Upper body": (42741, ["T-shirt", "Sweater", "Top", "Blouse", "Shirt", "Vest top", "Hoodie", "Jacket",
+                                   "Cardigan", "Blazer", "Coat", "Bodysuit", "Polo shirt", "Tailored Waistcoat"]),
+    "Garment Lower body": (19812, ["Trousers", "Shorts", "Skirt", "Leggings/Tights", "Outdoor trousers"]),
+    "Garment Full body": (13292, ["Dress", "Jumpsuit/Playsuit", "Dungarees", "Garment Set", "Outdoor overall"]),
+    "Accessories": (11158, ["Bag", "Earring", "Hat/beanie", "Necklace", "Sunglasses", "Belt", "Scarf", "Hair clip",
+                            "Gloves", "Cap/peaked", "Watch", "Ring", "Bracelet", "Hair/alice band"]),
+    "Underwear": (5490, ["Bra", "Underwear bottom", "Underwear Tights", "Underwear body", "Long John"]),
+    "Shoes": (5283, ["Sneakers", "Boots", "Sandals", "Ballerinas", "Flat shoe", "Heeled sandals", "Pumps",
+                     "Slippers", "Other shoe"]),
+    "Swimwear": (3127, ["Swimwear bottom", "Bikini top", "Swimsuit", "Swimwear set"]),
+    "Socks & Tights": (2442, ["Socks", "Leggings/Tights"]),
+    "Nightwear": (1899, ["Pyjama set", "Night gown", "Pyjama bottom", "Pyjama jumpsuit/playsuit"]),
+    "Unknown": (121, ["Unknown"]),
+}
+
+# (index_group_no, index_group_name, frequency); 1 and 2 are the exclusive
+# gender groups of the pairing rules
+INDEX_GROUPS = [(1, "Ladieswear", 26001), (2, "Menswear", 12553), (3, "Divided", 15149),
+                (4, "Baby/Children", 34711), (26, "Sport", 3392)]
+
+GARMENT_GROUPS = ["Jersey Basic", "Jersey Fancy", "Knitwear", "Trousers", "Blouses", "Shirts", "Dresses", "Skirts",
+                  "Shorts", "Outdoor", "Trousers Denim", "Under-, Nightwear", "Accessories", "Shoes", "Swimwear",
+                  "Socks and Tights", "Special Offers", "Dressed", "Woven/Jersey/Knitted mix Baby", "Unknown"]
+
+GRAPHICAL_APPEARANCES = ["Solid", "All over pattern", "Melange", "Stripe", "Denim", "Front print", "Placement print",
+                         "Check", "Other structure", "Lace", "Jacquard", "Colour blocking", "Embroidery", "Dot",
+                         "Application/3D", "Mixed solid/pattern", "Metallic", "Glittering/Metallic", "Contrast",
+                         "Treatment", "Other pattern", "Sequin", "Chambray", "Neps", "Mesh", "Hologram", "Slub",
+                         "Argyle", "Transparent", "Unknown"]
+
+COLOUR_GROUPS = ["Black", "Dark Blue", "White", "Light Pink", "Grey", "Light Beige", "Blue", "Red", "Light Blue",
+                 "Greenish Khaki", "Dark Grey", "Off White", "Beige", "Dark Red", "Dark Green", "Yellowish Brown",
+                 "Pink", "Light Grey", "Gold", "Dark Beige", "Silver", "Light Orange", "Light Turquoise",
+                 "Dark Orange", "Orange", "Greyish Beige", "Yellow", "Light Purple", "Dark Yellow", "Turquoise",
+                 "Light Green", "Dark Pink", "Purple", "Other Pink", "Green", "Light Yellow", "Dark Turquoise",
+                 "Other Yellow", "Other", "Other Orange", "Other Blue", "Other Purple", "Other Red",
+                 "Yellowish Green", "Other Green", "Other Turquoise", "Bronze/Copper", "Dark Purple",
+                 "Transparent", "Unknown"]
+
+PERCEIVED_COLOUR_VALUES = ["Dark", "Dusty Light", "Light", "Medium Dusty", "Bright", "Medium", "Undefined", "Unknown"]
+
+PERCEIVED_COLOUR_MASTERS = ["Black", "Dark Blue", "White", "Khaki green", "Beige", "Grey", "Blue", "Pink",
+                            "Lilac Purple", "Red", "Mole", "Orange", "Metal", "Brown", "Turquoise", "Yellow",
+                            "Yellowish Green", "Green", "Bluish Green", "Undefined"]
+
+FABRICS = ["jersey", "cotton", "denim", "knit", "ribbed", "stretch", "sweatshirt fabric", "brushed", "woven",
+           "chiffon", "satin", "lace", "mesh", "linen", "viscose", "polyester", "wool", "cashmere", "leather",
+           "imitation leather", "suede", "velour", "velvet", "corduroy", "twill", "poplin", "fleece", "pile", "tulle",
+           "sequins", "crepe", "silk", "canvas", "rubber", "textile", "metal", "plastic", "rib-knit", "jacquard",
+           "terry"]
+NO_FABRIC = "None detected"
+
+SLEEVES = ["sleeveless", "long_sleeve", "short_sleeve"]
+LENGTHS = ["no_dress", "mini_length", "maxi_length"]
+NECKLINES = ["no_neckline", "crew_neckline", "v_neckline"]
+
+NAME_WORDS = ["Basic", "Slim", "Relaxed", "Oversized", "Soft", "Cropped", "Wide", "Classic", "Fitted", "Long",
+              "Short", "Printed", "Striped", "Ribbed", "Knitted", "Padded", "Linen", "Denim", "Lace", "Wrap"]
+
+# (attribute node type, value node type, code column, value column); a None
+# code column means one attribute node per distinct value, an empty one a
+# single attribute node linked to every value
+ATTRIBUTE_SPECS = [
+    ("color_value", "color_value_name", "perceived_colour_value_id", "perceived_colour_value_name"),
+    ("color_master", "color_master_name", "perceived_colour_master_id", "perceived_colour_master_name"),
+    ("appearance", "appearance_value", "graphical_appearance_no", "graphical_appearance_name"),
+    ("fabric", "fabric_value", None, "detected_fabrics"),
+    ("sleeve", "sleeve_value", "", "Sleeve_prediction"),
+    ("length", "length_value", "", "Length_prediction"),
+    ("neckline", "neckline_value", "", "Neckline_prediction"),
+]
+
+# Constructor arguments the server uses for EnhancedFashionGAT
+MODEL_KWARGS = {"hidden_channels": 128, "out_channels": 64}
+
+
+def _zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _choice(rng, values, size, weights=None):
+    """Draw values (with replacement) as an object array"""
+    values = np.array(values, dtype=object)
+    return values[rng.choice(len(values), size=size, p=weights)]
+
+
+def generate_item_metadata(num_items, seed=0):
+    """
+    Generate a synthetic item catalog with the columns of item_metadata.csv.
+
+    Args:
+        num_items: Number of articles
+        seed: Random seed
+
+    Returns:
+        DataFrame with one row per article (index_group_no included)
+    """
+    rng = np.random.default_rng(seed)
+
+    # Products have 1 or more colour variants; article_id = product_code * 1000 + variant
+    variants = np.minimum(rng.geometric(0.45, size=num_items), 30)
+    variants = variants[:np.searchsorted(np.cumsum(variants), num_items) + 1]
+    variants[-1] -= variants.sum() - num_items
+    num_products = len(variants)
+    product_codes = np.sort(rng.choice(np.arange(108775, 959462), size=num_products, replace=False))
+    product_rows = np.repeat(np.arange(num_products), variants)
+    variant_numbers = np.arange(num_items) - np.repeat(np.cumsum(variants) - variants, variants) + 1
+
+    # Product-level attributes, shared by all variants
+    groups = list(PRODUCT_GROUPS)
+    group_weights = np.array([PRODUCT_GROUPS[group][0] for group in groups], dtype=float)
+    product_groups = _choice(rng, groups, num_products, group_weights / group_weights.sum())
+    product_types = np.empty(num_products, dtype=object)
+    for group in groups:
+        rows = np.flatnonzero(product_groups == group)
+        types = PRODUCT_GROUPS[group][1]
+        product_types[rows] = _choice(rng, types, len(rows), _zipf_weights(len(types)))
+    index_weights = np.array([weight for _, _, weight in INDEX_GROUPS], dtype=float)
+    index_rows = rng.choice(len(INDEX_GROUPS), size=num_products, p=index_weights / index_weights.sum())
+    appearance_codes = rng.choice(len(GRAPHICAL_APPEARANCES), size=num_products,
+                                  p=_zipf_weights(len(GRAPHICAL_APPEARANCES), 1.3))
+    garment_groups = _choice(rng, GARMENT_GROUPS, num_products, _zipf_weights(len(GARMENT_GROUPS), 0.8))
+    name_words = _choice(rng, NAME_WORDS, num_products)
+
+    full_body = product_groups == "Garment Full body"
+    sleeves = _choice(rng, SLEEVES, num_products, [0.3, 0.45, 0.25])
+    lengths = np.where(full_body, _choice(rng, LENGTHS[1:], num_products), LENGTHS[0])
+    necklines = _choice(rng, NECKLINES, num_products, [0.4, 0.4, 0.2])
+
+    fabric_weights = _zipf_weights(len(FABRICS), 1.2)
+    fabric_counts = rng.choice(4, size=num_products, p=[0.15, 0.45, 0.3, 0.1])
+    fabrics = np.array([
+        ", ".join(_choice(rng, FABRICS, count, fabric_weights).tolist()) if count else NO_FABRIC
+        for count in fabric_counts
+    ], dtype=object)
+
+    # Variant-level colours
+    colour_groups = rng.choice(len(COLOUR_GROUPS), size=num_items, p=_zipf_weights(len(COLOUR_GROUPS)))
+    colour_values = rng.choice(len(PERCEIVED_COLOUR_VALUES), size=num_items,
+                               p=_zipf_weights(len(PERCEIVED_COLOUR_VALUES), 0.8))
+    colour_masters = rng.choice(len(PERCEIVED_COLOUR_MASTERS), size=num_items,
+                                p=_zipf_weights(len(PERCEIVED_COLOUR_MASTERS)))
+
+    item_types = product_types[product_rows]
+    item_appearances = np.array(GRAPHICAL_APPEARANCES, dtype=object)[appearance_codes[product_rows]]
+    item_fabrics = fabrics[product_rows]
+    descriptions = pd.Series(item_appearances + " " + pd.Series(item_types).str.lower().to_numpy()
+                             + " in " + item_fabrics + ".", dtype=object)
+    descriptions[rng.random(num_items) < 0.005] = np.nan
+
+    return pd.DataFrame({
+        "article_id": product_codes[product_rows] * 1000 + variant_numbers,
+        "product_code": product_codes[product_rows],
+        "prod_name": name_words[product_rows] + " " + item_types,
+        "product_type_name": item_types,
+        "product_group_name": product_groups[product_rows],
+        "graphical_appearance_no": 1010001 + appearance_codes[product_rows],
+        "graphical_appearance_name": item_appearances,
+        "colour_group_code": colour_groups + 1,
+        "colour_group_name": np.array(COLOUR_GROUPS, dtype=object)[colour_groups],
+        "perceived_colour_value_id": colour_values + 1,
+        "perceived_colour_value_name": np.array(PERCEIVED_COLOUR_VALUES, dtype=object)[colour_values],
+        "perceived_colour_master_id": colour_masters + 1,
+        "perceived_colour_master_name": np.array(PERCEIVED_COLOUR_MASTERS, dtype=object)[colour_masters],
+        "index_group_no": np.array([code for code, _, _ in INDEX_GROUPS])[index_rows][product_rows],
+        "index_group_name": np.array([name for _, name, _ in INDEX_GROUPS], dtype=object)[index_rows][product_rows],
+        "garment_group_name": garment_groups[product_rows],
+        "detail_desc": descriptions,
+        "Sleeve_prediction": sleeves[product_rows],
+        "Length_prediction": lengths[product_rows],
+        "Neckline_prediction": necklines[product_rows],
+        "detected_fabrics": item_fabrics,
+    })
+
+
+def _attribute_edges(fashion_data):
+    """
+    Attribute node names of every item and the attribute -> value edges.
+
+    Yields:
+        Tuples of (attribute node type, value node type, attribute node name per
+        item, list of unique (attribute node, value node) pairs)
+    """
+    for attr_type, value_type, code_column, value_column in ATTRIBUTE_SPECS:
+        values = fashion_data[value_column].astype(str).to_numpy()
+        if code_column is None:
+            codes = pd.factorize(values)[0]
+        elif code_column == "":
+            codes = None
+        else:
+            codes = fashion_data[code_column].to_numpy()
+
+        if codes is None:
+            item_attrs = np.full(len(values), f"attr_{attr_type}", dtype=object)
+        else:
+            item_attrs = np.array([f"attr_{attr_type}_{code}" for code in codes.tolist()], dtype=object)
+        pairs = dict.fromkeys(zip(item_attrs.tolist(), [f"val_{attr_type}_{value}" for value in values.tolist()]))
+        yield attr_type, value_type, item_attrs, list(pairs)
+
+
+def build_fashion_graph(fashion_data):
+    """
+    Build the networkx item-attribute graph of a fashion dataframe.
+
+    Args:
+        fashion_data: DataFrame as returned by generate_item_metadata
+
+    Returns:
+        networkx Graph
+    """
+    import networkx as nx
+
+    graph = nx.Graph()
+    item_nodes = [f"item_{article_id}" for article_id in fashion_data["article_id"].tolist()]
+    graph.add_nodes_from(
+        (node, {"name": name, "product_group": group, "gender_group": int(gender), "gender_name": gender_name})
+        for node, name, group, gender, gender_name in zip(
+            item_nodes,
+            fashion_data["prod_name"].tolist(),
+            fashion_data["product_group_name"].tolist(),
+            fashion_data["index_group_no"].tolist(),
+            fashion_data["index_group_name"].tolist()
+        )
+    )
+    for _, _, item_attrs, pairs in _attribute_edges(fashion_data):
+        graph.add_edges_from(zip(item_nodes, item_attrs.tolist()))
+        graph.add_edges_from(pairs)
+    return graph
+
+
+def build_pyg_graph(fashion_data):
+    """
+    Build the PyG heterogeneous graph and node mapping of a fashion dataframe.
+
+    Items only have outgoing edges (item -> attribute -> value), so their
+    embeddings keep the hidden size the compatibility scorer expects.
+
+    Args:
+        fashion_data: DataFrame as returned by generate_item_metadata
+
+    Returns:
+        Tuple of (HeteroData, node_mapping of {node_type: {node_name: index}})
+    """
+    import torch
+    from torch_geometric.data import HeteroData
+
+    node_mapping = defaultdict(dict)
+    node_mapping["item"] = {
+        f"item_{article_id}": idx for idx, article_id in enumerate(fashion_data["article_id"].tolist())
+    }
+    edges = {}
+    for attr_type, value_type, item_attrs, pairs in _attribute_edges(fashion_data):
+        attr_codes, attr_names = pd.factorize(item_attrs)
+        attr_mapping = {name: idx for idx, name in enumerate(attr_names)}
+        value_mapping = {}
+        for _, value_node in pairs:
+            value_mapping.setdefault(value_node, len(value_mapping))
+        node_mapping[attr_type] = attr_mapping
+        node_mapping[value_type] = value_mapping
+
+        item_edges = np.unique(np.stack([np.arange(len(attr_codes)), attr_codes]), axis=1)
+        edges[("item", f"has_{attr_type}", attr_type)] = item_edges
+        edges[(attr_type, "has_value", value_type)] = np.array(
+            [[attr_mapping[attr] for attr, _ in pairs], [value_mapping[value] for _, value in pairs]]
+        ).reshape(2, -1)
+
+    pyg_graph = HeteroData()
+    for node_type, mapping in node_mapping.items():
+        pyg_graph[node_type].x = torch.ones(len(mapping), 1)
+    for edge_type, edge_index in edges.items():
+        pyg_graph[edge_type].edge_index = torch.from_numpy(edge_index.astype(np.int64))
+    return pyg_graph, node_mapping
+
+
+def generate_training_pairs(fashion_data, num_pairs, seed=0):
+    """
+    Scored item pairs in the format of train_gat_model.
+
+    Rule-compatible pairs that share colour or appearance get high scores,
+    pairs that break the pairing rules get low scores.
+
+    Args:
+        fashion_data: DataFrame as returned by generate_item_metadata
+        num_pairs: Number of positive and of negative pairs
+        seed: Random seed
+
+    Returns:
+        Tuple of (positive_pairs, negative_pairs) float tensors of rows [item1, item2, score]
+    """
+    import torch
+    from .Serving import EXCLUSIVE_GENDER_GROUPS, INCOMPATIBLE_GROUPS
+
+    rng = np.random.default_rng(seed)
+    num_items = len(fashion_data)
+    group_codes, groups = pd.factorize(fashion_data["product_group_name"])
+    incompatible = np.zeros((len(groups), len(groups)), dtype=bool)
+    lookup = {group: code for code, group in enumerate(groups)}
+    for group1, group2 in INCOMPATIBLE_GROUPS:
+        if group1 in lookup and group2 in lookup:
+            incompatible[lookup[group1], lookup[group2]] = True
+    gender = fashion_data["index_group_no"].to_numpy()
+    exclusive = np.isin(gender, EXCLUSIVE_GENDER_GROUPS)
+
+    def sample(positive):
+        found = []
+        count = 0
+        while count < num_pairs:
+            first = rng.integers(0, num_items, size=4 * num_pairs)
+            second = rng.integers(0, num_items, size=4 * num_pairs)
+            compatible = (
+                (first != second)
+                & (group_codes[first] != group_codes[second])
+                & ~incompatible[group_codes[first], group_codes[second]]
+                & ~(exclusive[first] & exclusive[second] & (gender[first] != gender[second]))
+            )
+            affinity = sum(
+                (fashion_data[column].to_numpy()[first] == fashion_data[column].to_numpy()[second]).astype(float)
+                for column in ("perceived_colour_master_id", "perceived_colour_value_id", "graphical_appearance_no")
+            )
+            if positive:
+                keep = compatible & (affinity > 0)
+                scores = 0.6 + 0.4 * affinity[keep] / 3
+            else:
+                keep = ~compatible & (first != second)
+                scores = 0.2 * rng.random(int(keep.sum()))
+            found.append(np.stack([first[keep], second[keep], scores], axis=1))
+            count += int(keep.sum())
+        return torch.from_numpy(np.concatenate(found)[:num_pairs].astype(np.float32))
+
+    return sample(True), sample(False)
+
+
+def write_synthetic_model_dir(root, num_items, seed=0, model_kwargs=None, train_epochs=0, num_pairs=2048,
+                              verbose=True):
+    """
+    Generate a synthetic catalog, graphs and (untrained or briefly trained)
+    model and save them in the directory layout the server reads.
+
+    Args:
+        root: Directory that receives data/item_metadata.csv and data/model_data/
+        num_items: Number of articles
+        seed: Random seed of the data and the model initialization
+        model_kwargs: EnhancedFashionGAT constructor arguments (defaults to MODEL_KWARGS)
+        train_epochs: Epochs of train_gat_model on synthetic pairs (0 keeps the random weights)
+        num_pairs: Number of positive and of negative training pairs
+        verbose: Whether to print progress
+
+    Returns:
+        Dictionary with the paths written and the dataset sizes
+    """
+    import torch
+    from .Enhancement import save_model_and_data
+    from .Recommender import EnhancedFashionGAT, train_gat_model
+
+    start_time = time.time()
+    data_dir = os.path.join(root, "data")
+    model_dir = os.path.join(data_dir, "model_data")
+    os.makedirs(model_dir, exist_ok=True)
+
+    fashion_data = generate_item_metadata(num_items, seed=seed)
+    fashion_graph = build_fashion_graph(fashion_data)
+    pyg_graph, node_mapping = build_pyg_graph(fashion_data)
+
+    torch.manual_seed(seed)
+    model = EnhancedFashionGAT(pyg_graph, **(model_kwargs or MODEL_KWARGS))
+    if train_epochs:
+        positive_pairs, negative_pairs = generate_training_pairs(fashion_data, num_pairs, seed=seed)
+        model = train_gat_model(model, pyg_graph, positive_pairs, negative_pairs, epochs=train_epochs, verbose=verbose)
+    model.eval()
+
+    save_model_and_data(model, fashion_graph, pyg_graph, node_mapping, fashion_data, model_dir)
+    catalog_path = os.path.join(data_dir, "item_metadata.csv")
+    fashion_data.to_csv(catalog_path, index=False)
+
+    info = {
+        "root": root,
+        "model_dir": model_dir,
+        "catalog_path": catalog_path,
+        "num_items": len(fashion_data),
+        "nodes": {node_type: len(mapping) for node_type, mapping in node_mapping.items()},
+        "edges": int(sum(pyg_graph[edge_type].edge_index.size(1) for edge_type in pyg_graph.edge_types)),
+        "seconds": time.time() - start_time,
+    }
+    if verbose:
+        print(f"Synthetic data with {info['num_items']} items and {info['edges']} edges written to {root} "
+              f"in {info['seconds']:.2f} seconds")
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic model directory")
+    parser.add_argument("--items", type=int, default=10000, help="Number of articles")
+    parser.add_argument("--output", required=True, help="Directory that receives data/ and data/model_data/")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--train-epochs", type=int, default=0, help="Train on synthetic pairs (default: untrained)")
+    parser.add_argument("--pairs", type=int, default=2048, help="Positive and negative training pairs")
+    args = parser.parse_args()
+
+    write_synthetic_model_dir(args.output, args.items, seed=args.seed, train_epochs=args.train_epochs,
+                              num_pairs=args.pairs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Level-gated, structured logging for the backend.
+
+Backend modules log through get_logger(__name__), which accepts structured
+fields as keyword arguments:
+
+    log.info("📦 Serving model bundle", version=bundle.version, path=path)
+
+Lines logged on every request use log.request(...): they are INFO lines
+that are additionally sampled, so their volume can be cut down under load.
+Messages are only formatted when the line is actually emitted.
+
+Configuration (read once, when the first logger is created):
+    LOG_LEVEL: Level of the backend loggers (default INFO)
+    LOG_LEVELS: Per-module levels, e.g. "repository=WARNING,sessions=DEBUG"
+    LOG_FORMAT: "text" (default) or "json" (one JSON object per line)
+    LOG_REQUEST_SAMPLE_RATE: Fraction of per-request lines kept (default 1.0)
+"""
+from datetime import datetime
+from typing import Any, Dict
+import json
+import logging
+import os
+import random
+import sys
+import threading
+
+ROOT_LOGGER = "backend"
+
+# Keyword arguments understood by logging itself; any other keyword is a field
+_LOGGING_KWARGS = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+_configured = False
+_configure_lock = threading.Lock()
+_request_sample_rate = 1.0
+
+
+def _record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return getattr(record, "fields", None) or {}
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with fields appended as key=value pairs"""
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the fields as top-level keys"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_record_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Handler writing to the current sys.stdout, so redirect_stdout applies as it did to print"""
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger adapter turning extra keyword arguments into structured fields"""
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOGGING_KWARGS}
+        if fields:
+            kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+    def request(self, msg, *args, **kwargs):
+        """Log a per-request INFO line, subject to LOG_REQUEST_SAMPLE_RATE"""
+        if not self.isEnabledFor(logging.INFO):
+            return
+        if _request_sample_rate < 1.0 and random.random() >= _request_sample_rate:
+            return
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "module=LEVEL,..." into {logger name: level}"""
+    levels = {}
+    for entry in spec.split(","):
+        if "=" not in entry:
+            continue
+        name, level = (part.strip() for part in entry.split("=", 1))
+        if name != ROOT_LOGGER and not name.startswith(f"{ROOT_LOGGER}."):
+            name = f"{ROOT_LOGGER}.{name}"
+        levels[name] = level.upper()
+    return levels
+
+
+def configure_logging(level: str = None, levels: str = None, log_format: str = None,
+                      request_sample_rate: float = None, force: bool = False) -> None:
+    """
+    Configure the backend loggers (arguments default to the environment).
+
+    Only the "backend" logger hierarchy is configured, so the server's own
+    logging setup (e.g. uvicorn's) is left alone.
+
+    Args:
+        level: Level of the backend loggers (LOG_LEVEL)
+        levels: Per-module levels as "module=LEVEL,..." (LOG_LEVELS)
+        log_format: "text" or "json" (LOG_FORMAT)
+        request_sample_rate: Fraction of per-request lines kept (LOG_REQUEST_SAMPLE_RATE)
+        force: Reconfigure even if logging was already configured
+    """
+    global _configured, _request_sample_rate
+    with _configure_lock:
+        if _configured and not force:
+            return
+
+        root = logging.getLogger(ROOT_LOGGER)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        handler = StdoutHandler()
+        log_format = (log_format or os.environ.get("LOG_FORMAT", "text")).lower()
+        handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+        root.addHandler(handler)
+        root.setLevel((level or os.environ.get("LOG_LEVEL", "INFO")).upper())
+        root.propagate = False
+
+        for name, module_level in _parse_levels(levels or os.environ.get("LOG_LEVELS", "")).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        if request_sample_rate is None:
+            request_sample_rate = float(os.environ.get("LOG_REQUEST_SAMPLE_RATE", "1.0"))
+        _request_sample_rate = min(max(request_sample_rate, 0.0), 1.0)
+        _configured = True
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """
+    Structured logger for a backend module, configuring logging on first use.
+
+    Args:
+        name: Logger name, usually the module's __name__
+
+    Returns:
+        StructuredLogger
+    """
+    configure_logging()
+    return StructuredLogger(logging.getLogger(name), {})
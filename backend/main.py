@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .controller import router
+from .metrics import MetricsMiddleware
 
 app = FastAPI()
 
@@ -13,6 +14,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts and latencies per route, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(router)
 
 if __name__ == "__main__":
@@ -1,3 +1,7 @@
 # Models package
 from .item import Item, RecItem
-from .session import Session 
\ No newline at end of file
+from .session import Session
+from .recommendation import (
+    RecommendationStatus, BatchRecommendationRequest, BatchRecommendationResult, BatchRecommendationResponse,
+    MAX_TOP_K, MAX_BATCH_ITEMS
+)
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from .item import RecItem
+import os
+
+# Longest ranking a request may ask for
+MAX_TOP_K = int(os.environ.get("REC_MAX_TOP_K", "1000"))
+# Largest number of query articles accepted by one batch request
+MAX_BATCH_ITEMS = int(os.environ.get("REC_BATCH_MAX", "256"))
+
+class RecommendationStatus(BaseModel):
+    session_id: str
+    # One of "none", "pending", "ready" or "failed"
+    status: str
+    article_id: Optional[int] = None
+    error: Optional[str] = None
+    # Number of ranked recommendations, once ready
+    total: Optional[int] = None
+
+class BatchRecommendationRequest(BaseModel):
+    article_ids: List[int] = Field(..., max_length=MAX_BATCH_ITEMS)
+    top_k: int = Field(50, ge=1, le=MAX_TOP_K)
+
+class BatchRecommendationResult(BaseModel):
+    recommendations: List[RecItem] = []
+    # Set when no recommendations could be computed for this article
+    error: Optional[str] = None
+
+class BatchRecommendationResponse(BaseModel):
+    # Keyed by query article id
+    results: Dict[int, BatchRecommendationResult]
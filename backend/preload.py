@@ -0,0 +1,47 @@
+"""
+Preloading launcher for running several uvicorn workers on one machine.
+
+The parent process makes sure a current model bundle exists (compiling it
+from the loaded model if needed, see data/Bundle.py) and then starts the
+workers, which map the bundle instead of loading their own copies of the
+model, graphs and catalog. Sessions are kept in the shared sqlite backend
+unless SESSION_BACKEND says otherwise.
+
+Usage (from the project root):
+    python -m backend.preload --workers 4
+"""
+import argparse
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the model once and serve it from several workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--bundle", default=None,
+                        help="Where to compile the model bundle (default: <model dir>/model.bundle)")
+    args = parser.parse_args()
+
+    import uvicorn
+    from . import repository
+
+    if repository.model_bundle is not None:
+        path = repository.model_bundle.path
+    else:
+        if repository.model_thread is not None:
+            repository.model_thread.join()
+        if not repository.model_loaded:
+            sys.exit("❌ Model could not be loaded, nothing to share with the workers")
+        path = repository.Repository().compile_model_bundle(args.bundle)
+
+    # Workers inherit the environment and attach to the bundle on import
+    os.environ[repository.MODEL_BUNDLE_ENV] = os.path.abspath(path)
+    os.environ.setdefault("SESSION_BACKEND", "sqlite")
+    print(f"🚀 Starting {args.workers} workers sharing {path}")
+    uvicorn.run("backend.main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
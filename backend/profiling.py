@@ -0,0 +1,220 @@
+"""
+On-demand profiling of the recommendation hot path.
+
+A capture profiles the next N query items: their ranking jobs on the worker
+pool and the recommendation pages read while the capture is running. cProfile
+profiles one section at a time; a section starting while another one is
+profiled (e.g. the other worker's job) runs unprofiled rather than waiting, so
+page reads on the event loop never wait for a job. The cProfile results of all
+profiled sections are merged and written as one pstats file (viewable with
+snakeviz, or turned into a flame graph with flameprof or gprof2dot).
+Optionally the torch profiler also records the scorer's tensor ops of each job
+into a Chrome trace.
+
+Captures are started with POST /debug/profile, which only exists with
+PROFILING_ENABLED=1, or at startup with PROFILE_NEXT_REQUESTS=N. While no
+capture is running, a profiled section costs one attribute check.
+"""
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import cProfile
+import os
+import pstats
+import threading
+
+from .log import get_logger
+
+log = get_logger(__name__)
+
+# Finished captures reported by status(); older ones are dropped
+MAX_RESULTS = 20
+
+
+class ProfileCapture:
+    """
+    Collects cProfile (and optionally torch profiler) results of the next N
+    query items and writes them to output_dir when the last one finishes.
+
+    Only one section is profiled at a time; overlapping sections are skipped
+    (and a skipped ranking job doesn't count as a captured query item).
+    """
+    def __init__(self, output_dir: str = "profiles"):
+        self.output_dir = output_dir
+        self.active = False
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+        self._remaining = 0
+        self._requested = 0
+        self._use_torch = False
+        self._stats: Optional[pstats.Stats] = None
+        self._torch_traces: List[str] = []
+        self._sections = 0
+        self._skipped = 0
+        self._started_at: Optional[datetime] = None
+        self._results: Deque[Dict[str, Any]] = deque(maxlen=MAX_RESULTS)
+
+    def start(self, num_requests: int, use_torch: bool = False) -> Dict[str, Any]:
+        """
+        Profile the next num_requests query items.
+
+        Args:
+            num_requests: Number of query items (ranking jobs) to capture
+            use_torch: Whether to also record torch profiler traces of the ranking jobs
+
+        Returns:
+            Capture status (see status)
+
+        Raises:
+            ValueError: If num_requests isn't positive
+            RuntimeError: If a capture is already running
+        """
+        if num_requests < 1:
+            raise ValueError("num_requests must be at least 1")
+        with self._lock:
+            if self.active:
+                raise RuntimeError(f"A capture is already running ({self._remaining} query items left)")
+            self._remaining = self._requested = num_requests
+            self._use_torch = use_torch
+            self._stats = None
+            self._torch_traces = []
+            self._sections = 0
+            self._skipped = 0
+            self._started_at = datetime.now()
+            self.active = True
+        log.info("🔬 Profiling the next %d query items", num_requests, torch=use_torch)
+        return self.status()
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        """Stop the running capture early and write what was collected (None if none was running)"""
+        with self._lock:
+            if not self.active:
+                return None
+            finished = self._finish()
+        return self._write(*finished)
+
+    def status(self) -> Dict[str, Any]:
+        """State of the running capture and the last MAX_RESULTS finished ones"""
+        with self._lock:
+            return {
+                "active": self.active,
+                "requested": self._requested if self.active else 0,
+                "remaining": self._remaining if self.active else 0,
+                "profiled_sections": self._sections if self.active else 0,
+                "skipped_sections": self._skipped if self.active else 0,
+                "output_dir": os.path.abspath(self.output_dir),
+                "results": list(self._results),
+            }
+
+    def section(self, name: str, counts_request: bool = False, torch_ops: bool = False):
+        """
+        Context manager profiling a section of the hot path while a capture runs.
+
+        Args:
+            name: Section name, used in the torch trace file names
+            counts_request: Whether the section completes one captured query
+                item (the ranking job) when it is profiled
+            torch_ops: Whether to record the section with the torch profiler
+                when the capture asked for it
+        """
+        if not self.active:
+            return nullcontext()
+        return self._profiled(name, counts_request, torch_ops)
+
+    @contextmanager
+    def _profiled(self, name: str, counts_request: bool, torch_ops: bool):
+        if not self._busy.acquire(blocking=False):
+            # Another section is being profiled; don't wait for it
+            with self._lock:
+                self._skipped += 1
+            yield
+            return
+        profiler = cProfile.Profile()
+        torch_profiler = None
+        try:
+            if torch_ops and self._use_torch:
+                from torch.profiler import profile, ProfilerActivity
+                torch_profiler = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+                torch_profiler.__enter__()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                if torch_profiler is not None:
+                    torch_profiler.__exit__(None, None, None)
+        finally:
+            self._busy.release()
+            self._collect(name, profiler, torch_profiler)
+            if counts_request:
+                self._count_request()
+
+    def _collect(self, name: str, profiler: cProfile.Profile, torch_profiler) -> None:
+        # Only the merge happens under the lock; the trace is written after releasing it
+        stats = pstats.Stats(profiler)
+        trace_path = None
+        with self._lock:
+            if not self.active:
+                return
+            if self._stats is None:
+                self._stats = stats
+            else:
+                self._stats.add(stats)
+            self._sections += 1
+            if torch_profiler is not None:
+                trace_path = os.path.join(self.output_dir,
+                                          f"{self._file_prefix()}-{name}-{len(self._torch_traces)}.json")
+                self._torch_traces.append(trace_path)
+        if trace_path is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            torch_profiler.export_chrome_trace(trace_path)
+
+    def _count_request(self) -> None:
+        with self._lock:
+            if not self.active:
+                return
+            self._remaining -= 1
+            if self._remaining > 0:
+                return
+            finished = self._finish()
+        self._write(*finished)
+
+    def _file_prefix(self) -> str:
+        return f"profile-{self._started_at:%Y%m%d-%H%M%S}"
+
+    def _finish(self) -> Tuple[Dict[str, Any], Optional[pstats.Stats], str]:
+        """End the capture and take its merged stats (see _write). Caller holds the lock."""
+        self.active = False
+        result = {
+            "started_at": self._started_at.isoformat(),
+            "query_items": self._requested - max(self._remaining, 0),
+            "profiled_sections": self._sections,
+            "skipped_sections": self._skipped,
+            "pstats": None,
+            "torch_traces": list(self._torch_traces),
+        }
+        stats, self._stats = self._stats, None
+        return result, stats, self._file_prefix()
+
+    def _write(self, result: Dict[str, Any], stats: Optional[pstats.Stats], file_prefix: str) -> Dict[str, Any]:
+        """Write the merged profile of a finished capture, without holding the lock"""
+        if stats is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{file_prefix}.prof")
+            stats.dump_stats(path)
+            result["pstats"] = path
+        with self._lock:
+            self._results.append(result)
+        log.info("🔬 Profile of %d query items written", result['query_items'], path=result['pstats'])
+        return result
+
+
+PROFILER = ProfileCapture(output_dir=os.environ.get("PROFILE_DIR", "profiles"))
+
+# Debug endpoints under /debug/profile are only served when enabled
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+
+if int(os.environ.get("PROFILE_NEXT_REQUESTS", "0")) > 0:
+    PROFILER.start(int(os.environ["PROFILE_NEXT_REQUESTS"]),
+                   use_torch=os.environ.get("PROFILE_TORCH", "0") == "1")
@@ -1,23 +1,38 @@
+import numpy as np
 import pandas as pd
 import torch
 from torch_geometric.data.storage import BaseStorage, NodeStorage, EdgeStorage
-from .models import Item, RecItem, Session
+from .models import Item, RecItem, Session, RecommendationStatus, BatchRecommendationResult, MAX_TOP_K, MAX_BATCH_ITEMS
+from .cache import RecommendationCache
+from .sessions import create_session_store, CompactRecommendations, ATTR_TYPES, REC_STATUS_READY
+from .data.Catalog import ItemCatalog, file_signature
+from .data.Columnar import ArticleIndex
+from .metrics import stage_timer, RECOMMENDATION_JOBS, MODEL_LOAD_DURATION, CATALOG_LOAD_DURATION
+from .profiling import PROFILER
+from .log import get_logger
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import uuid
 import os
-from typing import Dict, Optional, List
+from typing import Any, Dict, Iterator, Optional, List
 import threading
 import time
 
+log = get_logger(__name__)
+
 # Now that data is inside backend, we can use relative imports
 try:
-    from .data.Enhancement import load_model_and_data, get_enhanced_recommendations, display_recommendations
+    from .data.Enhancement import load_model_and_data
     from .data.Recommender import EnhancedFashionGAT
+    from .data.Serving import EmbeddingStore, ItemRuleArrays, ItemAttributeTable, model_bundle_version, item_article_ids, BUNDLE_FILES
+    from .data.Precompute import TopKTable, DEFAULT_TABLE_NAME
+    from .data.Enhancement import rank_compatible_items, rank_compatible_items_batch
+    from .data.Bundle import compile_bundle, load_bundle, DEFAULT_BUNDLE_NAME
+    from .data.Retrieval import build_ivf_index, recall_at_k
     data_modules_available = True
-    print("✅ Data modules imported successfully")
+    log.info("✅ Data modules imported successfully")
 except ImportError as e:
-    print(f"⚠️  Warning: Could not import data modules: {e}")
-    print("   Recommendation functionality will be disabled")
+    log.warning("⚠️  Could not import data modules, recommendation functionality will be disabled", error=str(e))
     data_modules_available = False
 
 torch.serialization.add_safe_globals([BaseStorage, NodeStorage, EdgeStorage])
@@ -27,129 +42,380 @@ model = None
 fashion_graph = None
 pyg_graph = None 
 node_mapping = None
-fashion_data = None
 model_loading = False
 model_loaded = False
+# Background model loading thread, None when the model isn't loaded in the background
+model_thread = None
+
+# Item embeddings, computed once per model bundle and shared by all requests
+embedding_store = EmbeddingStore() if data_modules_available else None
+# Integer-coded item attributes for the pairing rules, built once per model load
+item_rules = None
+# Per-item attribute table for explanations, extracted once from fashion_graph
+item_attributes = None
+# ArticleIndex of article_id -> item node index of the served model
+item_index = None
+# Precomputed top-K table (see data/Precompute.py), served without torch
+topk_table = None
+# Compiled model bundle (see data/Bundle.py); when attached, recommendations are
+# served from its mapped arrays and the model, graphs and CSVs are not loaded
+model_bundle = None
+
+# ANN index for candidate retrieval (see data/Retrieval.py), set in "ann" retrieval mode
+ann_index = None
+
+# Candidate retrieval: "exact" scores every compatible item, "ann" reranks only
+# the candidates retrieved from an IVF index over the item embeddings
+RETRIEVAL_MODE = os.environ.get("REC_RETRIEVAL", "exact")
+# Number of compatible candidates retrieved per query item in "ann" mode
+ANN_CANDIDATES = int(os.environ.get("REC_ANN_CANDIDATES", "2000"))
+
+# Path of the bundle to serve from; an empty value disables bundles
+MODEL_BUNDLE_ENV = "MODEL_BUNDLE_PATH"
+
+# Constructor arguments of the saved EnhancedFashionGAT
+MODEL_KWARGS = {"hidden_channels": 128, "out_channels": 64}
+
+# Item catalog shared by get_metadata, the pairing rules and the explanations
+catalog = None
+# CSV the catalog was loaded from
+catalog_csv_path = None
+
+# Item field -> item_metadata.csv column
+ITEM_COLUMNS = {
+    "prod_name": "prod_name",
+    "prod_type_name": "product_type_name",
+    "prod_group_name": "product_group_name",
+    "graphical_appearance_name": "graphical_appearance_name",
+    "colour_group_name": "colour_group_name",
+    "perceived_colour_value_name": "perceived_colour_value_name",
+    "perceived_colour_master_name": "perceived_colour_master_name",
+    "index_group_name": "index_group_name",
+    "garment_group_name": "garment_group_name",
+    "detail_desc": "detail_desc",
+    "sleeve_prediction": "Sleeve_prediction",
+    "length_prediction": "Length_prediction",
+    "neckline_prediction": "Neckline_prediction",
+    "detected_fabrics": "detected_fabrics",
+}
+
+# Catalog columns to load: the item fields plus the gender group used by the pairing rules
+CATALOG_COLUMNS = list(ITEM_COLUMNS.values()) + ["index_group_no"]
+
+def find_model_dir() -> Optional[str]:
+    """Find the saved model directory"""
+    model_paths = [
+        "./backend/data/model_data",  # When running from project root
+        "./data/model_data",          # When running from backend directory
+        "data/model_data"             # Alternative path
+    ]
+    
+    for path in model_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_topk_table():
+    """Open the precomputed top-K table if it matches the model bundle and catalog on disk"""
+    global topk_table
+    
+    model_path = find_model_dir()
+    table_path = os.environ.get("TOPK_TABLE_PATH")
+    if table_path is None and model_path is not None:
+        table_path = os.path.join(model_path, DEFAULT_TABLE_NAME)
+    if table_path is None or not os.path.exists(table_path):
+        return
+    
+    try:
+        table = TopKTable(table_path)
+    except Exception as e:
+        log.warning("⚠️  Could not open top-K table %s", table_path, error=str(e))
+        return
+    
+    if model_path is not None and table.bundle_version != model_bundle_version(model_path):
+        log.warning("⚠️  Top-K table %s is stale for the current model bundle, ignoring it", table_path)
+        return
+    
+    # The pairing rules come from the catalog, so a changed catalog makes the lists stale too
+    catalog_csv = find_catalog_csv()
+    if catalog_csv is not None and table.catalog_source != file_signature(catalog_csv):
+        log.warning("⚠️  Top-K table %s is stale for the current catalog, ignoring it", table_path)
+        return
+    
+    topk_table = table
+    pending = len(table.pending_items())
+    log.info("📑 Serving precomputed top-%d table from %s (%d items pending)", table.top_k, table_path, pending)
+
+def find_model_bundle() -> Optional[str]:
+    """Find the compiled model bundle to serve from"""
+    path = os.environ.get(MODEL_BUNDLE_ENV)
+    if path is not None:
+        return path or None
+    
+    model_path = find_model_dir()
+    if model_path is not None and os.path.exists(os.path.join(model_path, DEFAULT_BUNDLE_NAME)):
+        return os.path.join(model_path, DEFAULT_BUNDLE_NAME)
+    return None
+
+def attach_model_bundle(path: str) -> bool:
+    """Serve from a compiled model bundle instead of loading the model"""
+    global model_bundle, item_rules, item_attributes, item_index
+    
+    try:
+        start_time = time.time()
+        bundle = load_bundle(path, verify=os.environ.get("MODEL_BUNDLE_VERIFY") == "1")
+    except Exception as e:
+        log.error("❌ Could not open model bundle %s", path, error=str(e))
+        return False
+    
+    # A bundle shipped without the saved model files can't be checked for staleness
+    model_path = find_model_dir()
+    if model_path is not None and all(os.path.exists(os.path.join(model_path, name)) for name in BUNDLE_FILES):
+        if bundle.version != model_bundle_version(model_path):
+            log.warning("⚠️  Model bundle %s is stale for the current model files, ignoring it", path)
+            return False
+    
+    embedding_store.attach(bundle.item_embeddings, bundle.scorer, bundle.version)
+    item_rules = bundle.item_rules
+    item_attributes = bundle.item_attributes
+    item_index = bundle.item_index
+    model_bundle = bundle
+    load_time = time.time() - start_time
+    MODEL_LOAD_DURATION.set(load_time, source="bundle")
+    log.info("📦 Serving model bundle %s from %s (opened in %.2f seconds)", bundle.version, path, load_time)
+    return True
+
+def current_bundle_version() -> Optional[str]:
+    """Version of the model bundle recommendations are currently served from"""
+    if (model_loaded or model_bundle is not None) and embedding_store is not None and embedding_store.version is not None:
+        return embedding_store.version
+    if topk_table is not None:
+        return topk_table.bundle_version
+    return None
+
+def find_catalog_csv() -> Optional[str]:
+    """Find the item_metadata.csv catalog"""
+    csv_paths = [
+        "./backend/data/item_metadata.csv",  # When running from project root
+        "./data/item_metadata.csv",          # When running from backend directory  
+        "backend/data/item_metadata.csv",    # Alternative from project root
+        "data/item_metadata.csv"             # Alternative from backend
+    ]
+    
+    for path in csv_paths:
+        try:
+            if os.path.exists(path):
+                return path
+        except Exception as e:
+            log.warning("⚠️  Error checking path %s", path, error=str(e))
+            continue
+    
+    log.error("❌ CSV file not found", cwd=os.getcwd(), checked_paths=csv_paths)
+    
+    return None
+
+def load_catalog():
+    """Load the shared item catalog, from the model bundle if it was compiled from the current CSV"""
+    global catalog, catalog_csv_path
+    
+    catalog_csv_path = find_catalog_csv()
+    if model_bundle is not None and (
+            catalog_csv_path is None or model_bundle.catalog_source == file_signature(catalog_csv_path)):
+        start_time = time.time()
+        catalog = model_bundle.catalog
+        CATALOG_LOAD_DURATION.set(time.time() - start_time, source="bundle")
+        log.info("📦 Catalog served from model bundle (%d items)", len(catalog))
+        return
+    
+    catalog = ItemCatalog.empty()
+    try:
+        if catalog_csv_path is None:
+            raise FileNotFoundError("item_metadata.csv not found in any expected location")
+        
+        log.info("📊 Loading CSV from: %s", catalog_csv_path)
+        start_time = time.time()
+        
+        # Read through the CSV's columnar cache (see data/Catalog.py)
+        loaded = ItemCatalog.from_csv(catalog_csv_path, CATALOG_COLUMNS)
+        
+        load_time = time.time() - start_time
+        CATALOG_LOAD_DURATION.set(load_time, source="csv")
+        log.info("📈 Loaded %d items from CSV in %.2f seconds", loaded.num_rows, load_time)
+        
+    except Exception as e:
+        log.error("❌ Error loading CSV", error=str(e))
+        return
+    
+    catalog = loaded
+    for column in ITEM_COLUMNS.values():
+        if column not in catalog.columns and catalog.num_rows:
+            # Lookups of the affected items keep failing (as before) instead of startup
+            log.warning("⚠️  Column %s missing from item metadata", column)
+
+def link_catalog(article_ids) -> Dict[str, Any]:
+    """Index the shared catalog by item node index and report items missing on either side"""
+    report = catalog.link_graph(article_ids)
+    if report["missing_from_catalog"]:
+        log.warning("⚠️  %d of %d graph items are missing from the catalog (e.g. %s); they can't be shown as "
+                    "recommendations", report['missing_from_catalog'], report['graph_items'],
+                    report['missing_from_catalog_examples'])
+    if report["missing_from_graph"]:
+        log.warning("⚠️  %d of %d catalog items are missing from the graph (e.g. %s); they can't be used as "
+                    "query items", report['missing_from_graph'], report['catalog_items'],
+                    report['missing_from_graph_examples'])
+    if not (report["missing_from_catalog"] or report["missing_from_graph"]):
+        log.info("🔗 Catalog and graph agree on all %d items", report['graph_items'])
+    return report
+
+def load_ann_index():
+    """Set up ANN candidate retrieval in "ann" mode, from the bundle's index or a freshly built one"""
+    global ann_index
+    
+    ann_index = None
+    if RETRIEVAL_MODE != "ann":
+        return
+    
+    if model_bundle is not None and model_bundle.ann_index is not None:
+        report = model_bundle.ann_report
+        ann_index = model_bundle.ann_index
+        log.info("🧭 ANN retrieval with the bundle's index (%d lists, recall@%d %.3f at compile time)",
+                 ann_index.num_lists, report['top_k'], report['recall_at_k'])
+        return
+    
+    try:
+        index = build_ivf_index(embedding_store.scorer, verbose=False)
+        report = recall_at_k(index, item_rules, embedding_store.scorer, num_candidates=ANN_CANDIDATES)
+    except Exception as e:
+        log.error("❌ Could not build ANN index, scoring all compatible items", error=str(e))
+        return
+    
+    ann_index = index
+    log.info("🧭 ANN retrieval with %d candidates: recall@%d %.3f (%.1f ms vs %.1f ms exact per query)",
+             ANN_CANDIDATES, report['top_k'], report['recall_at_k'], report['ann_ms_per_query'],
+             report['exact_ms_per_query'], lists=index.num_lists)
 
 def load_model_async():
     """Load model asynchronously to avoid blocking server startup"""
-    global model, fashion_graph, pyg_graph, node_mapping, fashion_data, model_loading, model_loaded
+    global model, fashion_graph, pyg_graph, node_mapping, item_rules, item_attributes, item_index, ann_index
+    global model_loading, model_loaded
     
     if not data_modules_available:
-        print("⚠️  Data modules not available, skipping model loading")
+        log.warning("⚠️  Data modules not available, skipping model loading")
         return
     
     model_loading = True
-    print("🤖 Starting async model loading...")
+    log.info("🤖 Starting async model loading...")
     
     try:
         # Try to find model directory
-        model_paths = [
-            "./backend/data/model_data",  # When running from project root
-            "./data/model_data",          # When running from backend directory
-            "data/model_data"             # Alternative path
-        ]
-        
-        model_path = None
-        for path in model_paths:
-            if os.path.exists(path):
-                model_path = path
-                break
+        model_path = find_model_dir()
         
         if model_path is None:
-            print("⚠️  Model directory not found, skipping model loading")
+            log.warning("⚠️  Model directory not found, skipping model loading")
             model_loading = False
             return
             
-        print(f"📂 Loading model from: {model_path}")
+        log.info("📂 Loading model from: %s", model_path)
         
         # Add timeout to prevent hanging
         start_time = time.time()
-        model, fashion_graph, pyg_graph, node_mapping, fashion_data = load_model_and_data(
-            EnhancedFashionGAT, model_path,
-            hidden_channels=128,
-            out_channels=64
+        # Item details come from the shared catalog, so full_data.csv isn't loaded
+        model, fashion_graph, pyg_graph, node_mapping, _ = load_model_and_data(
+            EnhancedFashionGAT, model_path, load_data=False, **MODEL_KWARGS
         )
         
+        # Run the GAT forward pass once; recommendation calls reuse the result
+        bundle_version = model_bundle_version(model_path)
+        if embedding_store.refresh(model, pyg_graph, bundle_version):
+            log.info("🧮 Cached item embeddings for bundle %s", bundle_version)
+        link_catalog(item_article_ids(node_mapping))
+        if "index_group_no" not in catalog.columns:
+            log.warning("⚠️  Catalog has no index_group_no column, gender rules use the graph's gender groups")
+        item_rules = ItemRuleArrays.from_catalog(node_mapping, catalog, fashion_graph)
+        item_attributes = ItemAttributeTable.from_graph(fashion_graph, node_mapping)
+        item_index = ArticleIndex.from_ids(item_rules.article_ids)
+        load_ann_index()
+        
         load_time = time.time() - start_time
-        print(f"✅ Model loaded successfully in {load_time:.2f} seconds!")
+        MODEL_LOAD_DURATION.set(load_time, source="model")
+        log.info("✅ Model loaded successfully in %.2f seconds!", load_time)
         model_loaded = True
         
     except Exception as e:
-        print(f"❌ Error loading model: {e}")
+        log.error("❌ Error loading model", error=str(e))
         model = None
         fashion_graph = None
         pyg_graph = None 
         node_mapping = None
-        fashion_data = None
+        item_rules = None
+        item_attributes = None
+        item_index = None
+        ann_index = None
+        embedding_store.invalidate()
         model_loaded = False
     finally:
         model_loading = False
 
-# Start model loading in background thread (non-blocking)
+# Attach a compiled model bundle if there is one, then load the catalog (which
+# the bundle may provide)
+if data_modules_available:
+    load_topk_table()
+    bundle_path = find_model_bundle()
+    if bundle_path:
+        attach_model_bundle(bundle_path)
+load_catalog()
+
+# Start model loading in background thread (non-blocking), unless the bundle
+# is served instead
 if data_modules_available:
-    print("🚀 Starting background model loading...")
-    model_thread = threading.Thread(target=load_model_async, daemon=True)
-    model_thread.start()
+    if model_bundle is not None:
+        link_catalog(item_rules.article_ids)
+        load_ann_index()
+    else:
+        log.info("🚀 Starting background model loading...")
+        model_thread = threading.Thread(target=load_model_async, daemon=True)
+        model_thread.start()
 else:
-    print("⚠️  Skipping model loading - data modules not available")
+    log.warning("⚠️  Skipping model loading - data modules not available")
 
 class Repository:
+    # Item field -> item_metadata.csv column
+    ITEM_COLUMNS = ITEM_COLUMNS
+
     def __init__(self):
-        print("🏗️  Initializing Repository...")
+        log.info("🏗️  Initializing Repository...")
         
-        # Quick CSV loading with timeout protection
-        try:
-            csv_path = self._find_csv_file()
-            if csv_path is None:
-                raise FileNotFoundError("item_metadata.csv not found in any expected location")
-            
-            print(f"📊 Loading CSV from: {csv_path}")
-            start_time = time.time()
-            
-            # Load with chunksize to prevent memory issues
-            self._df = pd.read_csv(csv_path)
-            
-            load_time = time.time() - start_time
-            print(f"📈 Loaded {len(self._df)} items from CSV in {load_time:.2f} seconds")
-            
-        except Exception as e:
-            print(f"❌ Error loading CSV: {e}")
-            # Create empty dataframe as fallback
-            self._df = pd.DataFrame()
-        
-        # Initialize session storage
-        self._sessions: Dict[str, Session] = {}
-        self._session_query_items: Dict[str, Item] = {}
-        self._session_recommendations: Dict[str, List[RecItem]] = {}
-        self._session_rec_generated: Dict[str, bool] = {}
-        
-        print("✅ Repository initialized successfully")
-    
-    def _find_csv_file(self) -> Optional[str]:
-        """Find CSV file with timeout protection"""
-        csv_paths = [
-            "./backend/data/item_metadata.csv",  # When running from project root
-            "./data/item_metadata.csv",          # When running from backend directory  
-            "backend/data/item_metadata.csv",    # Alternative from project root
-            "data/item_metadata.csv"             # Alternative from backend
-        ]
-        
-        for path in csv_paths:
-            try:
-                if os.path.exists(path):
-                    return path
-            except Exception as e:
-                print(f"⚠️  Error checking path {path}: {e}")
-                continue
-        
-        print(f"❌ CSV file not found. Current dir: {os.getcwd()}")
-        print("Checked paths:")
-        for path in csv_paths:
-            print(f"  - {path}: {os.path.exists(path) if path else 'Invalid path'}")
-        
-        return None
-
+        # Initialize session storage (bounded, idle sessions expire). The sqlite
+        # backend lets several worker processes share the same sessions.
+        self._sessions = create_session_store(
+            os.environ.get("SESSION_BACKEND", "memory"),
+            path=os.environ.get("SESSION_DB_PATH", "sessions.db"),
+            ttl_seconds=float(os.environ.get("SESSION_TTL", "3600")) or None,
+            max_sessions=int(os.environ.get("SESSION_MAX", "10000")),
+            sweep_interval=float(os.environ.get("SESSION_SWEEP_INTERVAL", "60"))
+        )
+        
+        # Recommendations are generated off the request path on a bounded pool
+        self._rec_executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("REC_WORKERS", "2")),
+            thread_name_prefix="rec-worker"
+        )
+        self._rec_queue_slots = threading.BoundedSemaphore(int(os.environ.get("REC_MAX_PENDING", "256")))
+        
+        # Results depend only on the query item and the model, so they are shared across sessions
+        self._rec_cache = RecommendationCache(
+            max_entries=int(os.environ.get("REC_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.environ.get("REC_CACHE_TTL", "0"))
+        )
+        
+        # Length of the ranking computed per query item; pages are served from it
+        self._rank_depth = int(os.environ.get("REC_RANK_DEPTH", "50"))
+        
+        # Largest number of query articles accepted by one batch request (REC_BATCH_MAX)
+        self._batch_max_items = MAX_BATCH_ITEMS
+        
+        log.info("✅ Repository initialized successfully")
+    
     def create_session(self) -> Session:
         session = Session(
             session_id=str(uuid.uuid4()),
@@ -157,11 +423,9 @@ class Repository:
             is_active=True,
         )
         # Store session by its ID
-        self._sessions[session.session_id] = session
-        # Initialize recommendation tracking
-        self._session_rec_generated[session.session_id] = False
+        self._sessions.create(session)
         
-        print(f"📱 Session {session.session_id} created (model ready: {model is not None})")
+        log.request("📱 Session created", session_id=session.session_id, model_ready=model is not None)
         return session
     
     def get_session(self, session_id: str) -> Optional[Session]:
@@ -170,171 +434,425 @@ class Repository:
     
     def update_session(self, session: Session) -> None:
         """Update an existing session"""
-        self._sessions[session.session_id] = session
+        self._sessions.update(session)
     
     def delete_session(self, session_id: str) -> bool:
-        """Delete a session by ID"""
-        if session_id in self._sessions:
-            del self._sessions[session_id]
-            # Also clean up related data
-            self._session_query_items.pop(session_id, None)
-            self._session_recommendations.pop(session_id, None)
-            self._session_rec_generated.pop(session_id, None)
-            print(f"🗑️  Session {session_id} deleted and cleaned up")
+        """Delete a session by ID (including its query item and recommendations)"""
+        if self._sessions.delete(session_id):
+            log.request("🗑️  Session deleted", session_id=session_id)
             return True
         return False
     
     def get_active_sessions(self) -> list[Session]:
         """Get all active sessions"""
-        return [session for session in self._sessions.values() if session.is_active]
+        return [session for session in self._sessions.list_sessions() if session.is_active]
     
-    def put_query_item(self, session_id: str, article_id: int) -> bool:
-        """Add query item to a specific session and prepare recommendations"""
+    def put_query_item(self, session_id: str, article_id: int, top_k: Optional[int] = None) -> bool:
+        """
+        Add query item to a specific session and start ranking recommendations.
+        
+        Args:
+            session_id: Session ID
+            article_id: Query article ID
+            top_k: Length of the ranking to compute (defaults to REC_RANK_DEPTH)
+        """
         session = self.get_session(session_id)
         if session:
             item = self.get_metadata(article_id)
             if item:
-                self._session_query_items[session_id] = item
-                
-                # Generate recommendations immediately when query item is set
-                # This ensures the user won't have to wait later
-                self._generate_recommendations_for_session(session_id, article_id)
+                # Generate recommendations in the background so the request returns
+                # immediately; progress is reported by get_recommendation_status
+                job_id = self._sessions.start_job(session_id, article_id)
+                if job_id is None:
+                    return False
+                self._submit_recommendation_job(session_id, article_id, job_id, top_k or self._rank_depth)
                 
-                print(f"🎯 Query item set for session {session_id}: {article_id}")
+                log.request("🎯 Query item set", session_id=session_id, article_id=article_id)
                 return True
         return False
     
-    def _generate_recommendations_for_session(self, session_id: str, article_id: int) -> None:
-        """Generate recommendations for a session based on the query item"""
-        global model_loaded, model_loading
+    def _submit_recommendation_job(self, session_id: str, article_id: int, job_id: str, top_k: int) -> None:
+        """Queue recommendation generation for a session's current job"""
+        if not self._rec_queue_slots.acquire(blocking=False):
+            log.warning("⚠️  Recommendation queue full, rejecting job", session_id=session_id)
+            self._sessions.finish_job(session_id, job_id, None, error="Recommendation queue is full")
+            return
+        
+        def run_job():
+            try:
+                with PROFILER.section("ranking_job", counts_request=True, torch_ops=True):
+                    self._generate_recommendations_for_session(session_id, article_id, job_id, top_k)
+            finally:
+                self._rec_queue_slots.release()
+        
+        self._rec_executor.submit(run_job)
+    
+    def _generate_recommendations_for_session(self, session_id: str, article_id: int, job_id: Optional[str] = None,
+                                              top_k: int = 50) -> None:
+        """Rank recommendations for a session based on the query item (details are built per page when read)"""
+        timer = stage_timer("session_job")
+        try:
+            with timer("total"):
+                recommendations = self._compute_recommendations(article_id, top_k=top_k, timer=timer)
+        except Exception as e:
+            log.error("❌ Error generating recommendations", session_id=session_id, error=str(e))
+            self._sessions.finish_job(session_id, job_id, None, error=str(e))
+            RECOMMENDATION_JOBS.inc(outcome="failed")
+            return
+        
+        # Results of superseded jobs or deleted sessions are dropped by the store
+        with timer("store"):
+            stored = self._sessions.finish_job(session_id, job_id, recommendations)
+        RECOMMENDATION_JOBS.inc(outcome="ready" if stored else "superseded")
+        if stored:
+            log.request("✅ Generated recommendations", session_id=session_id, count=len(recommendations))
+    
+    def _compute_recommendations(self, article_id: int, top_k: int = 50, timer=None) -> CompactRecommendations:
+        """Get recommendations for a query item from the shared cache, computing them on a miss"""
+        key = (article_id, top_k, current_bundle_version())
+        return self._rec_cache.get_or_compute(key, lambda: self._build_recommendations(article_id, top_k, timer))
+    
+    def _build_recommendations(self, article_id: int, top_k: int, timer=None) -> CompactRecommendations:
+        """Compute recommendations for a query item; raises RuntimeError if the model is unavailable"""
+        timer = timer or stage_timer("session_job")
+        
+        # Serve from the precomputed top-K table when it covers this item
+        if topk_table is not None:
+            with timer("topk_table"):
+                recommendations = self._recommendations_from_topk_table(article_id, top_k)
+            if recommendations is not None:
+                return recommendations
         
         # Check if model is available
         if not data_modules_available:
-            print(f"⚠️  Cannot generate recommendations: data modules unavailable")
-            self._session_recommendations[session_id] = []
-            self._session_rec_generated[session_id] = False
-            return
-            
-        if model_loading:
-            print(f"⏳ Model still loading, recommendations will be empty for now")
-            self._session_recommendations[session_id] = []
-            self._session_rec_generated[session_id] = False
-            return
-            
-        if not model_loaded or model is None or node_mapping is None:
-            print(f"⚠️  Cannot generate recommendations: model not loaded")
-            self._session_recommendations[session_id] = []
-            self._session_rec_generated[session_id] = False
-            return
+            raise RuntimeError("Data modules unavailable")
+        
+        # A compiled bundle is ranked without the model
+        if model_bundle is None:
+            if model_loading:
+                raise RuntimeError("Model still loading")
             
-        try:
-            print(f"🔄 Generating recommendations for session {session_id}...")
+            if not model_loaded or model is None or node_mapping is None:
+                raise RuntimeError("Model not loaded")
+        
+        item_idx = item_index.get(article_id)
+        if item_idx is None:
+            raise ValueError(f"Item ID {article_id} not found in the graph")
+        
+        # Only the ranking: importance is computed for the rows that are read
+        log.debug("🔄 Generating recommendations", article_id=article_id)
+        return self._compact_ranking(*rank_compatible_items(
+            item_idx, item_rules, embedding_store.scorer, top_k, with_importance=False,
+            ann_index=ann_index, num_candidates=ANN_CANDIDATES, timer=timer
+        ))
+    
+    def _recommendations_from_topk_table(self, article_id: int, top_k: int) -> Optional[CompactRecommendations]:
+        """Read recommendations from the precomputed top-K table, or None if it doesn't cover the item"""
+        result = topk_table.lookup(article_id, top_k)
+        if result is None:
+            return None
+        
+        item_ids, scores, importance = result
+        return CompactRecommendations(item_ids, scores, importance[:, self._importance_columns(topk_table.attr_types)])
+    
+    def _compact_ranking(self, indices, scores, importance=None) -> CompactRecommendations:
+        """CompactRecommendations from ranked item node indices, scores and (optional) scorer importance"""
+        if importance is not None:
+            importance = importance[:, self._importance_columns(embedding_store.scorer.attr_types)]
+        return CompactRecommendations(item_rules.article_ids[indices], scores, importance)
+    
+    def _importance_columns(self, attr_types: List[str]) -> List[int]:
+        """Positions of ATTR_TYPES in attr_types"""
+        return [attr_types.index(attr) for attr in ATTR_TYPES]
+    
+    def _page_importance(self, query_article_id: int, article_ids) -> Any:
+        """Attribute importance (in ATTR_TYPES order) between a query item and some ranked items"""
+        scorer = embedding_store.scorer if embedding_store is not None else None
+        query_idx = item_index.get(query_article_id) if item_index is not None else None
+        if scorer is None or query_idx is None:
+            # Model unloaded since ranking: importance falls back to the RecItem defaults
+            return np.zeros((len(article_ids), len(ATTR_TYPES)), dtype=np.float32)
+        
+        candidates = item_index.get_many(article_ids)
+        with torch.no_grad():
+            importance = scorer.attribute_importance(query_idx, torch.from_numpy(np.maximum(candidates, 0))).numpy()
+        importance[candidates < 0] = 0.0
+        return importance[:, self._importance_columns(scorer.attr_types)]
+    
+    def get_batch_recommendations(self, article_ids: List[int], top_k: int = 50) -> Dict[int, BatchRecommendationResult]:
+        """
+        Recommendations for many query articles at once, without sessions.
+        
+        Articles already in the recommendation cache or the precomputed top-K
+        table are served from there; all others are scored together as one
+        matrix (see rank_compatible_items_batch). Failures are reported per
+        article instead of failing the whole batch.
+        
+        Args:
+            article_ids: Query article ids (duplicates are answered once)
+            top_k: Number of recommendations per article
             
-            # Get enhanced recommendations using your model
-            recommendations = get_enhanced_recommendations(
-                model=model,
-                fashion_graph=fashion_graph,
-                pyg_graph=pyg_graph,
-                node_mapping=node_mapping,
-                fashion_data=fashion_data,
-                item_id=article_id,
-                top_k=50  # Generate top 50 recommendations
-            )
+        Returns:
+            Dictionary of {article_id: BatchRecommendationResult}
+        """
+        article_ids = list(dict.fromkeys(int(article_id) for article_id in article_ids))
+        if len(article_ids) > self._batch_max_items:
+            raise ValueError(f"At most {self._batch_max_items} articles per batch")
+        if not 1 <= top_k <= MAX_TOP_K:
+            raise ValueError(f"top_k must be between 1 and {MAX_TOP_K}")
+        
+        results = {}
+        version = current_bundle_version()
+        keys = {}
+        for article_id in article_ids:
+            # Same check as put_query_item: unknown articles can't be query items
+            if self.get_metadata(article_id) is None:
+                results[article_id] = BatchRecommendationResult(error=f"Item ID {article_id} not found")
+            else:
+                keys[(article_id, top_k, version)] = article_id
+        
+        def compute_many(missing_keys):
+            computed = self._build_recommendations_batch([keys[key] for key in missing_keys], top_k)
+            return {key: computed[keys[key]] for key in missing_keys}
+        
+        start_time = time.time()
+        values = self._rec_cache.get_or_compute_many(list(keys), compute_many) if keys else {}
+        for key, article_id in keys.items():
+            value = values[key]
+            if isinstance(value, Exception):
+                results[article_id] = BatchRecommendationResult(error=str(value))
+            else:
+                results[article_id] = BatchRecommendationResult(
+                    recommendations=self._materialize_recommendations(article_id, value)
+                )
+        
+        log.request("📦 Batch answered", articles=len(article_ids), seconds=round(time.time() - start_time, 3))
+        return {article_id: results[article_id] for article_id in article_ids}
+    
+    def _build_recommendations_batch(self, article_ids: List[int], top_k: int) -> Dict[int, Any]:
+        """Compute recommendations for several query items; values are CompactRecommendations or exceptions"""
+        results = {}
+        remaining = []
+        for article_id in article_ids:
+            if topk_table is not None:
+                recommendations = self._recommendations_from_topk_table(article_id, top_k)
+                if recommendations is not None:
+                    results[article_id] = recommendations
+                    continue
+            remaining.append(article_id)
+        if not remaining:
+            return results
+        
+        # Both the bundle and the loaded model rank with the cached scorer and rule arrays
+        error = None
+        if not data_modules_available:
+            error = RuntimeError("Data modules unavailable")
+        elif model_bundle is None and model_loading:
+            error = RuntimeError("Model still loading")
+        elif model_bundle is None and (not model_loaded or node_mapping is None):
+            error = RuntimeError("Model not loaded")
+        if error is not None:
+            results.update((article_id, error) for article_id in remaining)
+            return results
+        
+        item_indices = {}
+        for article_id in remaining:
+            item_idx = item_index.get(article_id)
+            if item_idx is None:
+                results[article_id] = ValueError(f"Item ID {article_id} not found in the graph")
+            else:
+                item_indices[article_id] = item_idx
+        
+        if item_indices:
+            log.debug("🔄 Generating recommendations in one batch", items=len(item_indices))
+            with stage_timer("batch")("ranking"):
+                ranked = rank_compatible_items_batch(
+                    list(item_indices.values()), item_rules, embedding_store.scorer, top_k,
+                    ann_index=ann_index, num_candidates=ANN_CANDIDATES
+                )
+            for article_id, ranking in zip(item_indices, ranked):
+                results[article_id] = self._compact_ranking(*ranking)
+        return results
+    
+    def compile_model_bundle(self, output_path: Optional[str] = None, with_ann_index: bool = True) -> str:
+        """
+        Compile the loaded model, serving arrays and catalog into a model bundle.
+        
+        Args:
+            output_path: Bundle file to write (defaults to model.bundle in the model directory)
+            with_ann_index: Whether to build an ANN index and its recall check into the bundle
             
-            # Convert to RecItem objects
-            rec_items = []
-            for i in range(min(50, len(recommendations))):  # Use min to avoid index errors
-                item_id = recommendations[i][2]['item2']['id']  # First element is the item_id (integer)
-                compatibility_score = recommendations[i][2]['score']  # Second element is the score (float)
-                attribute_importance = recommendations[i][2]['attribute_importance']
-                
-                rec_metadata = self.get_metadata(item_id)
-                if rec_metadata:
-                    rec_item = RecItem(
-                        **rec_metadata.dict(),
-                        compatibility_score=compatibility_score,
-                        color_importance=attribute_importance.get('color_master', 0.0),
-                        luminance_importance=attribute_importance.get('color_value', 0.0),
-                        appearance_importance=attribute_importance.get('appearance', 0.0),
-                        fabric_importance=attribute_importance.get('fabric', 0.0),
-                        neckline_importance=attribute_importance.get('neckline', 0.0),
-                        sleeve_importance=attribute_importance.get('sleeve', 0.0),
-                        length_importance=attribute_importance.get('length', 0.0)
-                    )
+        Returns:
+            Path of the written bundle
+        """
+        if not model_loaded or item_rules is None or item_attributes is None:
+            raise RuntimeError("Model not loaded")
+        
+        index = report = None
+        if with_ann_index:
+            index = ann_index or build_ivf_index(embedding_store.scorer, verbose=False)
+            report = recall_at_k(index, item_rules, embedding_store.scorer, num_candidates=ANN_CANDIDATES)
+            log.info("🧭 ANN index recall@%d with %d candidates: %.3f", report['top_k'], ANN_CANDIDATES,
+                     report['recall_at_k'])
+        
+        output_path = output_path or os.path.join(find_model_dir(), DEFAULT_BUNDLE_NAME)
+        return compile_bundle(
+            output_path, embedding_store.version, model, pyg_graph, node_mapping,
+            embedding_store.item_embeddings, embedding_store.scorer, item_rules, item_attributes,
+            catalog,
+            model_kwargs=MODEL_KWARGS,
+            catalog_source=file_signature(catalog_csv_path) if catalog_csv_path else None,
+            ann_index=index,
+            ann_report=report
+        )
+    
+    def _materialize_recommendations(self, query_article_id: int, recommendations: CompactRecommendations,
+                                     start: int = 0, stop: Optional[int] = None) -> List[RecItem]:
+        """Build RecItems (with item metadata and attribute importance) for a slice of compact recommendations"""
+        with PROFILER.section("page"):
+            return self._build_page(query_article_id, recommendations, start, stop)
+    
+    def _build_page(self, query_article_id: int, recommendations: CompactRecommendations,
+                    start: int, stop: Optional[int]) -> List[RecItem]:
+        """Look up attribute importance and metadata of one page (see _materialize_recommendations)"""
+        timer = stage_timer("page")
+        page = recommendations.slice(start, stop)
+        if page.importance is None:
+            with timer("attribute_importance"):
+                page.importance = self._page_importance(query_article_id, page.article_ids)
+        
+        rec_items = []
+        with timer("rec_items"):
+            for item_id, score, attribute_importance in page.rows():
+                rec_item = self._build_rec_item(item_id, score, attribute_importance)
+                if rec_item:
                     rec_items.append(rec_item)
-            
-            # Store recommendations for the session
-            self._session_recommendations[session_id] = rec_items
-            self._session_rec_generated[session_id] = True
-            
-            print(f"✅ Generated {len(rec_items)} recommendations for session {session_id}")
-            
-        except Exception as e:
-            print(f"❌ Error generating recommendations for session {session_id}: {e}")
-            # Store empty list as fallback
-            self._session_recommendations[session_id] = []
-            self._session_rec_generated[session_id] = False
+        return rec_items
+    
+    def _build_rec_item(self, item_id: int, compatibility_score: float, attribute_importance: Dict[str, float]) -> Optional[RecItem]:
+        """Combine item metadata with a compatibility score and attribute importance"""
+        rec_metadata = self.get_metadata(item_id)
+        if rec_metadata is None:
+            return None
+        return RecItem(
+            **rec_metadata.dict(),
+            compatibility_score=compatibility_score,
+            color_importance=attribute_importance.get('color_master', 0.0),
+            luminance_importance=attribute_importance.get('color_value', 0.0),
+            appearance_importance=attribute_importance.get('appearance', 0.0),
+            fabric_importance=attribute_importance.get('fabric', 0.0),
+            neckline_importance=attribute_importance.get('neckline', 0.0),
+            sleeve_importance=attribute_importance.get('sleeve', 0.0),
+            length_importance=attribute_importance.get('length', 0.0)
+        )
     
     def get_query_item(self, session_id: str) -> Optional[Item]:
         """Get the query item for a session"""
-        return self._session_query_items.get(session_id)
-    
-    def _handle_nan_value(self, value, default=""):
-        """Convert NaN values to appropriate defaults"""
-        import pandas as pd
-        if pd.isna(value):
-            return default
-        return value
+        state = self._sessions.get_recommendation_state(session_id)
+        if state is None or state[2] is None:
+            return None
+        return self.get_metadata(state[2])
     
     def get_metadata(self, article_id: int) -> Optional[Item]:
         try:
-            # Quick check if dataframe is empty
-            if self._df.empty:
-                print(f"⚠️  CSV data not loaded, cannot find article {article_id}")
+            # Quick check if the catalog is empty
+            if catalog is None or not catalog.columns:
+                log.warning("⚠️  CSV data not loaded, cannot find article", article_id=article_id)
                 return None
                 
-            item = self._df[self._df["article_id"] == article_id]
+            row = catalog.row(article_id)
             
             # Check if item exists
-            if item.empty:
-                # Only print this occasionally to avoid spam
-                if article_id % 1000 == 0:  # Only for round numbers
-                    print(f"❌ Article {article_id} not found in CSV")
+            if row is None:
+                log.debug("❌ Article not found in CSV", article_id=article_id)
                 return None
             
+            # Columns missing from the CSV fail validation, as before
+            columns = catalog.columns
             return Item(
-                article_id=item["article_id"].values[0],
-                prod_name=self._handle_nan_value(item["prod_name"].values[0]),
-                prod_type_name=self._handle_nan_value(item["product_type_name"].values[0]),
-                prod_group_name=self._handle_nan_value(item["product_group_name"].values[0]),
-                graphical_appearance_name=self._handle_nan_value(item["graphical_appearance_name"].values[0]),
-                colour_group_name=self._handle_nan_value(item["colour_group_name"].values[0]),
-                perceived_colour_value_name=self._handle_nan_value(item["perceived_colour_value_name"].values[0]),
-                perceived_colour_master_name=self._handle_nan_value(item["perceived_colour_master_name"].values[0]),
-                index_group_name=self._handle_nan_value(item["index_group_name"].values[0]),
-                garment_group_name=self._handle_nan_value(item["garment_group_name"].values[0]),
-                detail_desc=self._handle_nan_value(item["detail_desc"].values[0]),
-                sleeve_prediction=self._handle_nan_value(item["Sleeve_prediction"].values[0]),
-                length_prediction=self._handle_nan_value(item["Length_prediction"].values[0]),
-                neckline_prediction=self._handle_nan_value(item["Neckline_prediction"].values[0]),
-                detected_fabrics=self._handle_nan_value(item["detected_fabrics"].values[0])
+                article_id=article_id,
+                **{field: columns[column][row] if column in columns else None
+                   for field, column in self.ITEM_COLUMNS.items()}
             )
         except Exception as e:
-            print(f"❌ Error in get_metadata for article {article_id}: {e}")
+            log.error("❌ Error in get_metadata", article_id=article_id, error=str(e))
             return None
 
-    def get_recommendations(self, session_id: str) -> List[RecItem]:
-        """Get recommendations for a specific session"""
+    def get_recommendations(self, session_id: str, top_k: Optional[int] = None, offset: int = 0,
+                            limit: Optional[int] = None) -> List[RecItem]:
+        """
+        Get a page of recommendations for a specific session.
+        
+        Metadata and attribute importance are only looked up for the page.
+        
+        Args:
+            session_id: Session ID
+            top_k: Only consider the top_k ranked recommendations (default: all computed)
+            offset: Position of the first recommendation to return
+            limit: Maximum number of recommendations to return (default: up to top_k)
+        """
         # Check if session exists
-        if session_id not in self._sessions:
+        state = self._sessions.get_recommendation_state(session_id)
+        if state is None:
             return []
         
         # Check if recommendations have been generated
-        if not self._session_rec_generated.get(session_id, False):
-            print(f"ℹ️  No recommendations generated yet for session {session_id}")
+        status, _, _, recommendations = state
+        if status != REC_STATUS_READY or recommendations is None:
+            log.debug("ℹ️  Recommendations not ready", session_id=session_id, status=status)
             return []
         
-        recommendations = self._session_recommendations.get(session_id, [])
-        print(f"📋 Returning {len(recommendations)} recommendations for session {session_id}")
-        return recommendations
-    
\ No newline at end of file
+        start, stop = self._page_bounds(len(recommendations), top_k, offset, limit)
+        rec_items = self._materialize_recommendations(state[2], recommendations, start, stop)
+        log.request("📋 Returning recommendations", session_id=session_id, count=len(rec_items), offset=offset)
+        return rec_items
+    
+    def iter_recommendations(self, session_id: str, top_k: Optional[int] = None, offset: int = 0,
+                             limit: Optional[int] = None, chunk_size: int = 10) -> Iterator[List[RecItem]]:
+        """
+        Yield a page of recommendations (as in get_recommendations) in chunks.
+        
+        Each chunk's metadata and attribute importance are built just before it
+        is yielded, so the first chunk is available as soon as the ranking is.
+        Nothing is yielded if the recommendations aren't ready.
+        """
+        state = self._sessions.get_recommendation_state(session_id)
+        if state is None or state[0] != REC_STATUS_READY or state[3] is None:
+            return
+        
+        _, _, query_article_id, recommendations = state
+        start, stop = self._page_bounds(len(recommendations), top_k, offset, limit)
+        for chunk_start in range(start, stop, max(1, chunk_size)):
+            yield self._materialize_recommendations(
+                query_article_id, recommendations, chunk_start, min(chunk_start + chunk_size, stop)
+            )
+    
+    def _page_bounds(self, count: int, top_k: Optional[int], offset: int, limit: Optional[int]) -> tuple:
+        """(start, stop) of the page offset..offset+limit within the top_k of count ranked items"""
+        stop = count if top_k is None else min(top_k, count)
+        if limit is not None:
+            stop = min(stop, offset + limit)
+        return offset, max(offset, stop)
+    
+    def get_recommendation_status(self, session_id: str) -> Optional[RecommendationStatus]:
+        """Get the state of the recommendation job for a session"""
+        state = self._sessions.get_recommendation_state(session_id)
+        if state is None:
+            return None
+        
+        status, error, article_id, recommendations = state
+        return RecommendationStatus(
+            session_id=session_id,
+            status=status,
+            article_id=article_id,
+            error=error,
+            total=len(recommendations) if recommendations is not None else None
+        )
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Counters of the cross-session recommendation cache"""
+        return self._rec_cache.stats()
+    
+    def get_session_stats(self) -> Dict[str, Any]:
+        """Live session count, approximate bytes held and eviction counters"""
+        return self._sessions.stats()
@@ -1,6 +1,6 @@
 from .repository import Repository
-from .models import Session, Item, RecItem
-from typing import Optional, Dict, Any
+from .models import Session, Item, RecItem, RecommendationStatus, BatchRecommendationResponse, MAX_TOP_K
+from typing import Optional, Dict, Any, Iterator, List
 
 class Service:
     def __init__(self, repository: Repository):
@@ -37,14 +37,38 @@ class Service:
         """Get item metadata (no session required)"""
         return self._repository.get_metadata(article_id)
     
-    def set_query_item(self, session_id: str, article_id: int) -> bool:
-        """Set the query item for a session"""
-        return self._repository.put_query_item(session_id, article_id)
+    def set_query_item(self, session_id: str, article_id: int, top_k: Optional[int] = None) -> bool:
+        """Set the query item for a session; top_k is capped at REC_MAX_TOP_K"""
+        if top_k is not None:
+            top_k = min(top_k, MAX_TOP_K)
+        return self._repository.put_query_item(session_id, article_id, top_k)
     
     def get_query_item(self, session_id: str) -> Optional[Item]:
         """Get the query item for a session"""
         return self._repository.get_query_item(session_id)
     
-    def get_recommendations(self, session_id: str) -> list[RecItem]:
-        """Get recommendations for a session"""
-        return self._repository.get_recommendations(session_id)
+    def get_recommendations(self, session_id: str, top_k: Optional[int] = None, offset: int = 0,
+                            limit: Optional[int] = None) -> list[RecItem]:
+        """Get a page of recommendations for a session"""
+        return self._repository.get_recommendations(session_id, top_k, offset, limit)
+    
+    def iter_recommendations(self, session_id: str, top_k: Optional[int] = None, offset: int = 0,
+                             limit: Optional[int] = None, chunk_size: int = 10) -> Iterator[list[RecItem]]:
+        """Iterate over a page of recommendations in chunks, built as they are consumed"""
+        return self._repository.iter_recommendations(session_id, top_k, offset, limit, chunk_size)
+    
+    def get_recommendation_status(self, session_id: str) -> Optional[RecommendationStatus]:
+        """Get the recommendation job status for a session"""
+        return self._repository.get_recommendation_status(session_id)
+    
+    def get_batch_recommendations(self, article_ids: List[int], top_k: int) -> BatchRecommendationResponse:
+        """Get recommendations for many query articles, keyed by article id"""
+        return BatchRecommendationResponse(results=self._repository.get_batch_recommendations(article_ids, top_k))
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get recommendation cache counters"""
+        return self._repository.get_cache_stats()
+    
+    def get_session_stats(self) -> Dict[str, Any]:
+        """Get live session count and memory usage"""
+        return self._repository.get_session_stats()
@@ -0,0 +1,548 @@
+from .models import Session
+from .log import get_logger
+from .data.Precompute import ATTR_TYPES
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import sqlite3
+import threading
+import time
+import uuid
+
+log = get_logger(__name__)
+
+# Recommendation job states reported by get_recommendation_status
+REC_STATUS_NONE = "none"
+REC_STATUS_PENDING = "pending"
+REC_STATUS_READY = "ready"
+REC_STATUS_FAILED = "failed"
+
+class CompactRecommendations:
+    """
+    Ranked recommendations stored as arrays instead of RecItem objects.
+
+    Holds article ids, compatibility scores and an (N, len(ATTR_TYPES))
+    attribute-importance matrix; RecItems are only built when they are read.
+    The importance matrix may be None when only the ranking was computed, in
+    which case readers compute it for the rows they return.
+    """
+    __slots__ = ("article_ids", "scores", "importance")
+
+    # Prefix of payloads without importance. Read as an int64 it is negative, so
+    # it can't be the first article id of a payload with importance.
+    RANKING_ONLY_MARKER = b"FPRANK\x01\xff"
+
+    def __init__(self, article_ids, scores, importance=None):
+        self.article_ids = np.ascontiguousarray(article_ids, dtype=np.int64)
+        self.scores = np.ascontiguousarray(scores, dtype=np.float32)
+        if importance is not None:
+            importance = np.ascontiguousarray(importance, dtype=np.float32).reshape(len(self.article_ids), len(ATTR_TYPES))
+        self.importance = importance
+
+    @classmethod
+    def empty(cls) -> "CompactRecommendations":
+        return cls(np.zeros(0), np.zeros(0), np.zeros((0, len(ATTR_TYPES))))
+
+    def __len__(self) -> int:
+        return len(self.article_ids)
+
+    @property
+    def nbytes(self) -> int:
+        size = self.article_ids.nbytes + self.scores.nbytes
+        if self.importance is not None:
+            size += self.importance.nbytes
+        return size
+
+    def slice(self, start: int = 0, stop: Optional[int] = None) -> "CompactRecommendations":
+        """Part of the ranking (arrays are views)"""
+        importance = self.importance[start:stop] if self.importance is not None else None
+        return CompactRecommendations(self.article_ids[start:stop], self.scores[start:stop], importance)
+
+    def to_bytes(self) -> bytes:
+        """Serialize as ids (int64), scores (float32) and importance (float32) back to back"""
+        if self.importance is None:
+            return self.RANKING_ONLY_MARKER + self.article_ids.tobytes() + self.scores.tobytes()
+        return self.article_ids.tobytes() + self.scores.tobytes() + self.importance.tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "CompactRecommendations":
+        if payload.startswith(cls.RANKING_ONLY_MARKER):
+            # 8 bytes id + 4 bytes score
+            start = len(cls.RANKING_ONLY_MARKER)
+            count = (len(payload) - start) // 12
+            return cls(
+                np.frombuffer(payload, dtype=np.int64, count=count, offset=start),
+                np.frombuffer(payload, dtype=np.float32, count=count, offset=start + count * 8)
+            )
+        # 8 bytes id + 4 bytes score + 4 bytes per importance column
+        count = len(payload) // (8 + 4 + 4 * len(ATTR_TYPES))
+        ids_end = count * 8
+        scores_end = ids_end + count * 4
+        return cls(
+            np.frombuffer(payload, dtype=np.int64, count=count),
+            np.frombuffer(payload, dtype=np.float32, count=count, offset=ids_end),
+            np.frombuffer(payload, dtype=np.float32, offset=scores_end)
+        )
+
+    def rows(self, start: int = 0, stop: Optional[int] = None):
+        """Yield (article_id, score, {attr_type: importance}) for a slice of the ranking (requires importance)"""
+        for article_id, score, importance in zip(
+            self.article_ids[start:stop].tolist(),
+            self.scores[start:stop].tolist(),
+            self.importance[start:stop].tolist()
+        ):
+            yield article_id, score, dict(zip(ATTR_TYPES, importance))
+
+class SessionRecord:
+    """Everything stored for one session"""
+    __slots__ = ("session", "query_article_id", "rec_status", "rec_error", "rec_job_id", "recommendations", "last_access")
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.query_article_id: Optional[int] = None
+        self.rec_status = REC_STATUS_NONE
+        self.rec_error: Optional[str] = None
+        self.rec_job_id: Optional[str] = None
+        self.recommendations: Optional[CompactRecommendations] = None
+        self.last_access = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the record"""
+        size = 512 + len(self.session.model_dump_json())
+        if self.recommendations is not None:
+            size += self.recommendations.nbytes
+        return size
+
+class SessionStore(ABC):
+    """
+    Interface of a session backend.
+
+    A store holds each session together with its query item and the state and
+    result of its latest recommendation job. Idle sessions are expired after a
+    TTL and the least recently used ones are evicted beyond max_sessions.
+    """
+    @abstractmethod
+    def create(self, session: Session) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Session]:
+        ...
+
+    @abstractmethod
+    def update(self, session: Session) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def list_sessions(self) -> List[Session]:
+        ...
+
+    @abstractmethod
+    def start_job(self, session_id: str, article_id: int) -> Optional[str]:
+        """
+        Set the query item and mark a new recommendation job as pending.
+
+        Returns:
+            The new job id, or None if the session does not exist
+        """
+
+    @abstractmethod
+    def finish_job(self, session_id: str, job_id: Optional[str],
+                   recommendations: Optional[CompactRecommendations], error: Optional[str] = None) -> bool:
+        """
+        Store a job's result unless the session was removed or got a newer job.
+
+        Returns:
+            True if the result was stored
+        """
+
+    @abstractmethod
+    def get_recommendation_state(self, session_id: str) -> Optional[Tuple[str, Optional[str], Optional[int], Optional[CompactRecommendations]]]:
+        """
+        Returns:
+            (status, error, query article id, recommendations) or None if the session does not exist
+        """
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove sessions idle for longer than the TTL; returns the number removed"""
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Live session count, approximate bytes held and eviction counters"""
+        ...
+
+    def close(self) -> None:
+        pass
+
+def _validate_limits(ttl_seconds: Optional[float], max_sessions: int) -> Optional[float]:
+    """Check the store limits; returns the TTL (None: sessions never expire)"""
+    if max_sessions < 1:
+        raise ValueError(f"max_sessions must be at least 1, got {max_sessions}")
+    if ttl_seconds is not None and ttl_seconds <= 0:
+        raise ValueError(f"ttl_seconds must be positive (or None to never expire), got {ttl_seconds}")
+    return ttl_seconds
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local session store with idle-TTL and max-count eviction.
+
+    Sessions idle for longer than ttl_seconds are removed by a background
+    sweeper thread; when max_sessions is reached the least recently used
+    session is evicted to make room for a new one.
+    """
+    def __init__(self, ttl_seconds: float = 3600, max_sessions: int = 10000, sweep_interval: float = 60):
+        self._ttl_seconds = _validate_limits(ttl_seconds, max_sessions)
+        self._max_sessions = max_sessions
+        self._records: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+
+        self._stop = threading.Event()
+        self._sweeper = None
+        if self._ttl_seconds and sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,), daemon=True, name="session-sweeper")
+            self._sweeper.start()
+
+    def _sweep_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            removed = self.sweep()
+            if removed:
+                log.info("🧹 Expired %d idle sessions", removed)
+
+    def close(self) -> None:
+        """Stop the background sweeper"""
+        self._stop.set()
+
+    def sweep(self) -> int:
+        if not self._ttl_seconds:
+            return 0
+        deadline = time.monotonic() - self._ttl_seconds
+        removed = 0
+        with self._lock:
+            # Records are kept in access order, so expired ones are at the front
+            while self._records:
+                session_id, record = next(iter(self._records.items()))
+                if record.last_access > deadline:
+                    break
+                del self._records[session_id]
+                removed += 1
+            self.evicted_idle += removed
+        return removed
+
+    def _touch(self, session_id: str) -> Optional[SessionRecord]:
+        record = self._records.get(session_id)
+        if record is not None:
+            record.last_access = time.monotonic()
+            self._records.move_to_end(session_id)
+        return record
+
+    def create(self, session: Session) -> None:
+        with self._lock:
+            while len(self._records) >= self._max_sessions:
+                self._records.popitem(last=False)
+                self.evicted_capacity += 1
+            self._records[session.session_id] = SessionRecord(session)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            record = self._touch(session_id)
+            return record.session if record else None
+
+    def update(self, session: Session) -> None:
+        with self._lock:
+            record = self._touch(session.session_id)
+            if record is not None:
+                record.session = session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._records.pop(session_id, None) is not None
+
+    def list_sessions(self) -> List[Session]:
+        with self._lock:
+            return [record.session for record in self._records.values()]
+
+    def start_job(self, session_id: str, article_id: int) -> Optional[str]:
+        with self._lock:
+            record = self._touch(session_id)
+            if record is None:
+                return None
+            record.query_article_id = article_id
+            record.rec_job_id = uuid.uuid4().hex
+            record.rec_status = REC_STATUS_PENDING
+            record.rec_error = None
+            record.recommendations = None
+            return record.rec_job_id
+
+    def finish_job(self, session_id: str, job_id: Optional[str],
+                   recommendations: Optional[CompactRecommendations], error: Optional[str] = None) -> bool:
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None or (job_id is not None and record.rec_job_id != job_id):
+                return False
+            record.recommendations = recommendations if error is None else None
+            record.rec_status = REC_STATUS_READY if error is None else REC_STATUS_FAILED
+            record.rec_error = error
+            return True
+
+    def get_recommendation_state(self, session_id: str) -> Optional[Tuple[str, Optional[str], Optional[int], Optional[CompactRecommendations]]]:
+        with self._lock:
+            record = self._touch(session_id)
+            if record is None:
+                return None
+            return record.rec_status, record.rec_error, record.query_article_id, record.recommendations
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._records),
+                "bytes": sum(record.nbytes for record in self._records.values()),
+                "max_sessions": self._max_sessions,
+                "ttl_seconds": self._ttl_seconds,
+                "evicted_idle": self.evicted_idle,
+                "evicted_capacity": self.evicted_capacity,
+            }
+
+class SqliteSessionStore(SessionStore):
+    """
+    Session store backed by a SQLite database in WAL mode.
+
+    Several processes (e.g. uvicorn workers) can open the same database file
+    and serve each other's sessions. Every thread reuses its own connection.
+    State changes are committed immediately, while last-access updates from
+    reads are buffered and written in batches.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            query_article_id INTEGER,
+            rec_status TEXT NOT NULL,
+            rec_error TEXT,
+            rec_job_id TEXT,
+            recommendations BLOB,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 3600, max_sessions: int = 10000,
+                 sweep_interval: float = 60, flush_interval: float = 1.0, flush_batch_size: int = 256):
+        self._path = path
+        self._ttl_seconds = _validate_limits(ttl_seconds, max_sessions)
+        self._max_sessions = max_sessions
+        self._flush_batch_size = flush_batch_size
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        # Buffered last-access times, session_id -> wall-clock time
+        self._touches: Dict[str, float] = {}
+        self._touches_lock = threading.Lock()
+
+        # Counters (for this process)
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+
+        self._connection().executescript(self.SCHEMA)
+
+        self._stop = threading.Event()
+        self._worker = threading.Thread(
+            target=self._background_loop, args=(flush_interval, sweep_interval), daemon=True, name="session-sqlite"
+        )
+        self._worker.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _background_loop(self, flush_interval: float, sweep_interval: float) -> None:
+        last_sweep = time.monotonic()
+        while not self._stop.wait(flush_interval):
+            self.flush()
+            if self._ttl_seconds and sweep_interval > 0 and time.monotonic() - last_sweep >= sweep_interval:
+                last_sweep = time.monotonic()
+                removed = self.sweep()
+                if removed:
+                    log.info("🧹 Expired %d idle sessions", removed)
+
+    def close(self) -> None:
+        """Flush buffered writes and close all connections"""
+        self._stop.set()
+        self.flush()
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Connections can only be closed from their own thread
+                    pass
+            self._connections.clear()
+
+    def _touch(self, session_id: str) -> None:
+        with self._touches_lock:
+            self._touches[session_id] = time.time()
+            should_flush = len(self._touches) >= self._flush_batch_size
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered last-access times in a single transaction"""
+        with self._touches_lock:
+            if not self._touches:
+                return
+            touches, self._touches = self._touches, {}
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE sessions SET last_access = MAX(last_access, ?) WHERE session_id = ?",
+                [(last_access, session_id) for session_id, last_access in touches.items()]
+            )
+
+    def create(self, session: Session) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            overflow = count - self._max_sessions + 1
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM sessions WHERE session_id IN "
+                    "(SELECT session_id FROM sessions ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self.evicted_capacity += overflow
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, rec_status, last_access) VALUES (?, ?, ?, ?)",
+                (session.session_id, session.model_dump_json(), REC_STATUS_NONE, time.time())
+            )
+
+    def get(self, session_id: str) -> Optional[Session]:
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._touch(session_id)
+        return Session.model_validate_json(row[0])
+
+    def update(self, session: Session) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE sessions SET data = ?, last_access = ? WHERE session_id = ?",
+                (session.model_dump_json(), time.time(), session.session_id)
+            )
+
+    def delete(self, session_id: str) -> bool:
+        conn = self._connection()
+        with conn:
+            return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def list_sessions(self) -> List[Session]:
+        rows = self._connection().execute("SELECT data FROM sessions ORDER BY last_access").fetchall()
+        return [Session.model_validate_json(row[0]) for row in rows]
+
+    def start_job(self, session_id: str, article_id: int) -> Optional[str]:
+        job_id = uuid.uuid4().hex
+        conn = self._connection()
+        with conn:
+            updated = conn.execute(
+                "UPDATE sessions SET query_article_id = ?, rec_job_id = ?, rec_status = ?, rec_error = NULL, "
+                "recommendations = NULL, last_access = ? WHERE session_id = ?",
+                (article_id, job_id, REC_STATUS_PENDING, time.time(), session_id)
+            ).rowcount
+        return job_id if updated else None
+
+    def finish_job(self, session_id: str, job_id: Optional[str],
+                   recommendations: Optional[CompactRecommendations], error: Optional[str] = None) -> bool:
+        if error is None:
+            status, payload = REC_STATUS_READY, recommendations.to_bytes()
+        else:
+            status, payload = REC_STATUS_FAILED, None
+        query = "UPDATE sessions SET rec_status = ?, rec_error = ?, recommendations = ? WHERE session_id = ?"
+        params = [status, error, payload, session_id]
+        if job_id is not None:
+            query += " AND rec_job_id = ?"
+            params.append(job_id)
+        conn = self._connection()
+        with conn:
+            return conn.execute(query, params).rowcount > 0
+
+    def get_recommendation_state(self, session_id: str) -> Optional[Tuple[str, Optional[str], Optional[int], Optional[CompactRecommendations]]]:
+        row = self._connection().execute(
+            "SELECT rec_status, rec_error, query_article_id, recommendations FROM sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._touch(session_id)
+        status, error, article_id, payload = row
+        recommendations = CompactRecommendations.from_bytes(payload) if payload is not None else None
+        return status, error, article_id, recommendations
+
+    def sweep(self) -> int:
+        if not self._ttl_seconds:
+            return 0
+        self.flush()
+        conn = self._connection()
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM sessions WHERE last_access < ?", (time.time() - self._ttl_seconds,)
+            ).rowcount
+        self.evicted_idle += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        count, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data) + COALESCE(LENGTH(recommendations), 0)), 0) FROM sessions"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self._path,
+            "sessions": count,
+            "bytes": size,
+            "max_sessions": self._max_sessions,
+            "ttl_seconds": self._ttl_seconds,
+            "evicted_idle": self.evicted_idle,
+            "evicted_capacity": self.evicted_capacity,
+        }
+
+def create_session_store(backend: str = "memory", path: Optional[str] = None, **kwargs) -> SessionStore:
+    """
+    Create a session store.
+
+    Args:
+        backend: "memory" (process-local) or "sqlite" (shared between processes)
+        path: Database file for the sqlite backend
+        **kwargs: ttl_seconds, max_sessions, sweep_interval
+
+    Returns:
+        The session store
+    """
+    if backend == "memory":
+        return InMemorySessionStore(**kwargs)
+    if backend == "sqlite":
+        return SqliteSessionStore(path or "sessions.db", **kwargs)
+    raise ValueError(f"Unknown session backend: {backend}")